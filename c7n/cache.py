@@ -5,10 +5,15 @@ multiple policies on the same resource type.
 """
 import pickle  # nosec nosemgrep
 
+from collections import Counter
+from copy import deepcopy
 from datetime import datetime, timedelta
+import json
 import os
 import logging
 import sqlite3
+import threading
+import time
 
 log = logging.getLogger('custodian.cache')
 
@@ -49,6 +54,30 @@ class Cache:
     def save(self, key, data):
         pass
 
+    def get_resources(self, key, ids, id_key):
+        """Return the cached resources of a resource set with the given ids.
+
+        Returns None if the resource set is not cached.
+        """
+        resources = self.get(key)
+        if resources is None:
+            return None
+        id_set = set(ids)
+        return [r for r in resources if r.get(id_key) in id_set]
+
+    def save_resources(self, key, resources, id_key):
+        self.save(key, resources)
+
+    def update_resources(self, key, resources, id_key):
+        """Refresh a subset of a cached resource set."""
+        cached = self.get(key)
+        if cached is None:
+            return
+        updates = {r[id_key]: r for r in resources}
+        cached = [updates.pop(r[id_key], r) for r in cached]
+        cached.extend(updates.values())
+        self.save(key, cached)
+
     def size(self):
         return 0
 
@@ -89,10 +118,173 @@ class InMemoryCache(Cache):
         return sum(map(len, self.data.values()))
 
 
+class FetchPlan:
+    """Share fetched resources across the policies of a single run.
+
+    Policies are grouped by provider, resource type, region, source and
+    query. The first policy of a group to execute fetches and augments
+    its resources as normal, subsequent policies in the group are served
+    a copy of that population from memory, which is released once the
+    last policy of the group has executed.
+
+    Only groups with more than one pull mode policy are planned.
+    """
+
+    def __init__(self, policies):
+        self.groups = {}
+        self.pending = Counter()
+        self.stores = {}
+
+        for p in policies:
+            key = self.get_group_key(p)
+            if key is None:
+                continue
+            self.groups.setdefault(key, []).append(p)
+
+        for key, members in list(self.groups.items()):
+            if len(members) < 2:
+                self.groups.pop(key)
+                continue
+            self.pending[key] = len(members)
+            self.stores[key] = {}
+            for p in members:
+                p.resource_manager._cache = PlanCache(
+                    p.resource_manager._cache, self.stores[key])
+        if self.groups:
+            log.debug(
+                "fetch plan shares %d resource groups across %d policies",
+                len(self.groups), sum(self.pending.values()))
+
+    @staticmethod
+    def get_group_key(policy):
+        if policy.execution_mode != 'pull':
+            return None
+        return (
+            policy.provider_name,
+            policy.resource_type,
+            policy.options.account_id,
+            policy.options.region,
+            policy.data.get('source'),
+            json.dumps(policy.data.get('query'), sort_keys=True, default=str))
+
+    def release(self, policy):
+        """Mark a policy as executed, freeing its group's resources when done."""
+        key = self.get_group_key(policy)
+        if key not in self.pending:
+            return
+        self.pending[key] -= 1
+        if self.pending[key] <= 0:
+            self.pending.pop(key)
+            self.stores.pop(key).clear()
+
+
+class PlanCache(Cache):
+    """Cache wrapper serving a fetch plan group's shared resources.
+
+    Lookups and saves fall through to the configured cache, while
+    saved populations are also retained in memory for the group.
+    Callers always receive a copy, as filters and actions annotate
+    resources in place.
+    """
+
+    def __init__(self, cache, store):
+        super().__init__(cache.config)
+        self.cache = cache
+        self.store = store
+
+    def load(self):
+        return self.cache.load()
+
+    def get(self, key):
+        value = self.store.get(encode(key))
+        if value is not None:
+            return deepcopy(value)
+        return self.cache.get(key)
+
+    def save(self, key, data):
+        self.store[encode(key)] = deepcopy(data)
+        self.cache.save(key, data)
+
+    def get_resources(self, key, ids, id_key):
+        if encode(key) in self.store:
+            return super().get_resources(key, ids, id_key)
+        return self.cache.get_resources(key, ids, id_key)
+
+    def save_resources(self, key, resources, id_key):
+        self.store[encode(key)] = deepcopy(resources)
+        self.cache.save_resources(key, resources, id_key)
+
+    def update_resources(self, key, resources, id_key):
+        self.store.pop(encode(key), None)
+        self.cache.update_resources(key, resources, id_key)
+
+    def size(self):
+        return self.cache.size()
+
+    def close(self):
+        self.cache.close()
+
+
 def encode(key):
     return pickle.dumps(key, protocol=pickle.HIGHEST_PROTOCOL)  # nosemgrep
 
 
+class RunIndex:
+    """Values shared across the policies of a run, kept with the resource cache.
+
+    Entries are only kept when caching is enabled, and expire with the
+    cache period. Expired entries are pruned on each access, long lived
+    processes running several units of work (ie. c7n-org workers) clear
+    the index between units. Concurrent builds of the same entry are
+    serialized so each is built once.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get_key(self, manager, *parts):
+        """Return the entry key for a manager, or None if caching is disabled."""
+        config = manager.config
+        if not config.cache or not config.cache_period or not hasattr(manager, 'get_cache_key'):
+            return None
+        return encode((manager.get_cache_key(None),) + parts)
+
+    def get_entry(self, manager, key, build=None):
+        """Return the entry for key, building it if missing or expired.
+
+        Returns None if there is no current entry and build is None.
+        """
+        with self.lock:
+            self.prune()
+            expires, value = self.entries.get(key, (None, None))
+            if value is not None or build is None:
+                return value
+            key_lock = self.locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            expires, value = self.entries.get(key, (None, None))
+            if value is None or expires < time.time():
+                value = build()
+                with self.lock:
+                    self.entries[key] = (
+                        time.time() + manager.config.cache_period * 60, value)
+        return value
+
+    def prune(self):
+        # callers hold the index lock
+        now = time.time()
+        for key in [k for k, (expires, _) in self.entries.items() if expires < now]:
+            self.entries.pop(key)
+            self.locks.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.locks.clear()
+
+
 def resolve_path(path):
     return os.path.abspath(
         os.path.expanduser(
@@ -100,6 +292,16 @@ def resolve_path(path):
 
 
 class SqlKvCache(Cache):
+    """Sqlite backed cache.
+
+    Arbitrary values are stored pickled by key. Resource sets are stored
+    a row per resource indexed by resource id, so id lookups only
+    deserialize the matching resources, and subsets of a resource set
+    can be refreshed in place.
+
+    The database uses write ahead logging to allow concurrent readers
+    across processes, with a connection per process.
+    """
 
     create_table = """
     create table if not exists c7n_cache (
@@ -109,11 +311,36 @@ class SqlKvCache(Cache):
     )
     """
 
+    create_resource_tables = (
+        """
+        create table if not exists c7n_resource_set (
+            key blob primary key,
+            create_date timestamp
+        )
+        """,
+        """
+        create table if not exists c7n_resource (
+            key blob,
+            idx integer,
+            resource_id text,
+            value blob,
+            primary key (key, idx)
+        )
+        """,
+        """
+        create index if not exists c7n_resource_id on c7n_resource (key, resource_id)
+        """,
+    )
+
+    # sqlite's default limit on host parameters is 999
+    batch_size = 500
+
     def __init__(self, config):
         super().__init__(config)
         self.cache_period = config.cache_period
         self.cache_path = resolve_path(config.cache)
         self.conn = None
+        self.pid = None
 
     def init(self):
         # migration from pickle cache file
@@ -127,19 +354,35 @@ class SqlKvCache(Cache):
             # parent directory creation
             os.makedirs(os.path.dirname(self.cache_path))
         self.conn = sqlite3.connect(self.cache_path)
+        self.pid = os.getpid()
+        self.conn.execute('pragma journal_mode=wal')
         self.conn.execute(self.create_table)
+        for ddl in self.create_resource_tables:
+            self.conn.execute(ddl)
+        expiry = datetime.utcnow() - timedelta(minutes=self.cache_period)
         with self.conn as cursor:
             result = cursor.execute(
-                'delete from c7n_cache where create_date < ?',
-                [datetime.utcnow() - timedelta(minutes=self.cache_period)])
+                'delete from c7n_cache where create_date < ?', [expiry])
             if result.rowcount:
                 log.debug('expired %d stale cache entries', result.rowcount)
+            cursor.execute(
+                'delete from c7n_resource where key in '
+                '(select key from c7n_resource_set where create_date < ?)', [expiry])
+            result = cursor.execute(
+                'delete from c7n_resource_set where create_date < ?', [expiry])
+            if result.rowcount:
+                log.debug('expired %d stale cache resource sets', result.rowcount)
 
     def load(self):
-        if not self.conn:
+        # connections aren't shared with forked worker processes.
+        if not self.conn or self.pid != os.getpid():
             self.init()
         return True
 
+    def is_expired(self, create_date):
+        create_date = sqlite3.converters['TIMESTAMP'](create_date.encode('utf8'))
+        return (datetime.utcnow() - create_date).total_seconds() / 60.0 > self.cache_period
+
     def get(self, key):
         with self.conn as cursor:
             r = cursor.execute(
@@ -148,13 +391,41 @@ class SqlKvCache(Cache):
             )
             row = r.fetchone()
             if row is None:
-                return None
+                return self.get_resource_set(cursor, key)
             value, create_date = row
-            create_date = sqlite3.converters['TIMESTAMP'](create_date.encode('utf8'))
-            if (datetime.utcnow() - create_date).total_seconds() / 60.0 > self.cache_period:
+            if self.is_expired(create_date):
                 return None
             return pickle.loads(value)  # nosec nosemgrep
 
+    def get_resource_set(self, cursor, key, ids=None):
+        ekey = sqlite3.Binary(encode(key))
+        row = cursor.execute(
+            'select create_date from c7n_resource_set where key = ?', [ekey]).fetchone()
+        if row is None or self.is_expired(row[0]):
+            return None
+        if ids is None:
+            rows = cursor.execute(
+                'select idx, value from c7n_resource where key = ? order by idx', [ekey])
+            return [pickle.loads(value) for _, value in rows]  # nosec nosemgrep
+
+        ids = list({str(i) for i in ids})
+        rows = []
+        for idx in range(0, len(ids), self.batch_size):
+            batch = ids[idx:idx + self.batch_size]
+            rows.extend(cursor.execute(
+                'select idx, value from c7n_resource where key = ? and resource_id in (%s)' % (
+                    ', '.join('?' * len(batch))), [ekey, *batch]))
+        rows.sort(key=lambda row: row[0])
+        return [pickle.loads(value) for _, value in rows]  # nosec nosemgrep
+
+    def get_resources(self, key, ids, id_key):
+        with self.conn as cursor:
+            if cursor.execute(
+                    'select 1 from c7n_cache where key = ?',
+                    [sqlite3.Binary(encode(key))]).fetchone():
+                return super().get_resources(key, ids, id_key)
+            return self.get_resource_set(cursor, key, ids)
+
     def save(self, key, data, timestamp=None):
         with self.conn as cursor:
             timestamp = timestamp or datetime.utcnow()
@@ -162,6 +433,61 @@ class SqlKvCache(Cache):
                 'replace into c7n_cache (key, value, create_date) values (?, ?, ?)',
                 (sqlite3.Binary(encode(key)), sqlite3.Binary(encode(data)), timestamp))
 
+    def save_resources(self, key, resources, id_key, timestamp=None):
+        if not all(id_key in r for r in resources):
+            return self.save(key, resources, timestamp)
+        ekey = sqlite3.Binary(encode(key))
+        with self.conn as cursor:
+            cursor.execute('delete from c7n_cache where key = ?', [ekey])
+            cursor.execute('delete from c7n_resource where key = ?', [ekey])
+            cursor.execute(
+                'replace into c7n_resource_set (key, create_date) values (?, ?)',
+                (ekey, timestamp or datetime.utcnow()))
+            cursor.executemany(
+                'insert into c7n_resource (key, idx, resource_id, value) values (?, ?, ?, ?)',
+                [(ekey, idx, str(r[id_key]), sqlite3.Binary(encode(r)))
+                 for idx, r in enumerate(resources)])
+
+    def update_resources(self, key, resources, id_key):
+        ekey = sqlite3.Binary(encode(key))
+        with self.conn as cursor:
+            row = cursor.execute(
+                'select create_date from c7n_resource_set where key = ?', [ekey]).fetchone()
+            if row is None:
+                return super().update_resources(key, resources, id_key)
+            if not all(id_key in r for r in resources):
+                # resources we can't address by id, drop the stale set.
+                cursor.execute('delete from c7n_resource_set where key = ?', [ekey])
+                cursor.execute('delete from c7n_resource where key = ?', [ekey])
+                return
+            # refreshed resources retain their position in the set, new ones
+            # are appended.
+            last = cursor.execute(
+                'select coalesce(max(idx), -1) from c7n_resource where key = ?',
+                [ekey]).fetchone()[0]
+            rids = list({str(r[id_key]) for r in resources})
+            positions = {}
+            for idx in range(0, len(rids), self.batch_size):
+                batch = rids[idx:idx + self.batch_size]
+                params = [ekey, *batch]
+                placeholders = ', '.join('?' * len(batch))
+                positions.update(cursor.execute(
+                    'select resource_id, min(idx) from c7n_resource where key = ? '
+                    'and resource_id in (%s) group by resource_id' % placeholders, params))
+                cursor.execute(
+                    'delete from c7n_resource where key = ? and resource_id in (%s)' % (
+                        placeholders), params)
+            rows = []
+            for r in resources:
+                rid = str(r[id_key])
+                if rid not in positions:
+                    last += 1
+                    positions[rid] = last
+                rows.append((ekey, positions[rid], rid, sqlite3.Binary(encode(r))))
+            cursor.executemany(
+                'replace into c7n_resource (key, idx, resource_id, value) values (?, ?, ?, ?)',
+                rows)
+
     def size(self):
         return os.path.exists(self.cache_path) and os.path.getsize(self.cache_path) or 0
 
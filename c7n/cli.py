@@ -24,6 +24,7 @@ except ImportError:
 
 from c7n import deprecated
 from c7n.config import Config
+from c7n.credentials import ApiRateLimiter
 
 DEFAULT_REGION = 'us-east-1'
 
@@ -197,6 +198,18 @@ def _key_val_pair(value):
     return value
 
 
+def _api_rate(value):
+    """
+    Type checker to ensure that --api-rate values are a list of rates
+    """
+    try:
+        ApiRateLimiter.parse_budgets(value)
+    except ValueError:
+        msg = 'values must be of the form `20,ec2=10,s3=50` with positive rates'
+        raise argparse.ArgumentTypeError(msg)
+    return value
+
+
 def setup_parser():
     c7n_desc = "Cloud Custodian - Cloud fleet management"
     parser = argparse.ArgumentParser(description=c7n_desc)
@@ -245,6 +258,37 @@ def setup_parser():
         dest="tracer",
         help="Tracing integration",
         default=None, nargs="?", const="default")
+    run.add_argument(
+        "--profile-execution", dest="profiler", choices=("spans", "stacks"),
+        default=None, nargs="?", const="spans",
+        help=("Write a chrome trace of policy execution spans to profile.json in the "
+              "policy output directory, 'stacks' additionally samples python stacks "
+              "to profile-stacks.txt in flamegraph folded format"))
+    run.add_argument(
+        "--reorder-filters", action="store_true",
+        help=("Run in memory filters ahead of api backed filters within and blocks, "
+              "ordered by their observed selectivity"))
+    run.add_argument(
+        "--filter-stats", default=None,
+        help=("File to record filter selectivity in when reordering filters "
+              "(default ~/.cache/cloud-custodian-filter-stats.json)"))
+    run.add_argument(
+        "--bulk-tags", action="store_true",
+        help=("Prefetch resource tags for all of the run's resource types once per "
+              "account and region, rather than by arn for each policy"))
+    run.add_argument(
+        "--workers", type=int, default=1,
+        help="Number of policies to execute concurrently (default %(default)i)")
+    run.add_argument(
+        "--worker-mode", choices=("thread", "process"), default="thread",
+        help="Execute concurrent policies in threads or processes (default %(default)s)")
+    run.add_argument(
+        "--api-concurrency", type=int, default=None,
+        help="Maximum concurrent api calls per service within a process (aws only)")
+    run.add_argument(
+        "--api-rate", type=_api_rate, default=None,
+        help=("Api calls per second per account, region and service, adapted down on "
+              "throttling, ie. '20,ec2=10,s3=50' (aws only)"))
 
     schema_desc = ("Browse the available vocabularies (resources, filters, modes, and "
                    "actions) for policy construction. The selector "
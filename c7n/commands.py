@@ -1,6 +1,7 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 from collections import Counter, defaultdict
+from concurrent.futures import as_completed
 from datetime import timedelta, datetime
 from functools import wraps
 import json
@@ -15,7 +16,9 @@ import yaml
 from yaml.constructor import ConstructorError
 
 from c7n import deprecated
-from c7n.exceptions import ClientError, PolicyValidationError
+from c7n.cache import FetchPlan
+from c7n.executor import ProcessPoolExecutor, ThreadPoolExecutor
+from c7n.exceptions import ClientError, PolicyExecutionError, PolicyValidationError
 from c7n.loader import SourceLocator
 from c7n.provider import clouds
 from c7n.policy import Policy, PolicyCollection, load as policy_load
@@ -302,22 +305,113 @@ def run(options, policies: List[Policy]) -> None:
             log.exception("Unable to assume role %s", options.assume_role)
             sys.exit(1)
 
-    errored_policies: List[str] = []
+    workers = options.get('workers') or 1
+    if workers > 1:
+        errors = run_parallel(options, policies, workers)
+    else:
+        errors = run_serial(options, policies)
+
+    # report errors in policy order, regardless of completion order.
+    errored_policies: List[str] = [
+        p.name for p in policies if _policy_key(p) in errors]
+    if errored_policies:
+        exit_code = 2
+    if exit_code != 0:
+        log.error("The following policies had errors while executing\n - %s" % (
+            "\n - ".join(errored_policies)))
+        sys.exit(exit_code)
+
+
+def _policy_key(policy):
+    return (policy.name, policy.options.region)
+
+
+def run_serial(options, policies):
+    errors = {}
+    plan = FetchPlan(policies)
     for policy in policies:
         try:
             policy()
-        except Exception:
-            exit_code = 2
-            errored_policies.append(policy.name)
+        except Exception as e:
+            errors[_policy_key(policy)] = e
             if options.debug:
                 raise
             log.exception(
                 "Error while executing policy %s, continuing" % (
                     policy.name))
-    if exit_code != 0:
-        log.error("The following policies had errors while executing\n - %s" % (
-            "\n - ".join(errored_policies)))
-        sys.exit(exit_code)
+        finally:
+            plan.release(policy)
+    return errors
+
+
+def get_run_units(policies):
+    """Partition policies into units of work for concurrent execution.
+
+    Policies sharing a fetch plan group are kept together in a unit and
+    executed serially, so their resources are only fetched once.
+    """
+    units = {}
+    for idx, p in enumerate(policies):
+        key = FetchPlan.get_group_key(p) or idx
+        units.setdefault(key, []).append(p)
+    return list(units.values())
+
+
+def run_parallel(options, policies, workers):
+    """Execute policies concurrently on a bounded worker pool.
+
+    In the default thread mode, each policy's execution context keeps its
+    output and log files isolated. The process mode rebuilds policies
+    from their (variable expanded) data within the worker processes.
+    """
+    process_mode = options.get('worker_mode') == 'process'
+    units = get_run_units(policies)
+    log.info(
+        "Executing %d policies across %d %s workers",
+        len(policies), min(workers, len(units)), process_mode and 'process' or 'thread')
+
+    errors = {}
+    executor_factory = process_mode and ProcessPoolExecutor or ThreadPoolExecutor
+    with executor_factory(max_workers=workers) as w:
+        futures = {}
+        for unit in units:
+            if process_mode:
+                f = w.submit(_run_policy_data, [(p.data, p.options) for p in unit])
+            else:
+                f = w.submit(run_serial, options, unit)
+            futures[f] = unit
+        for f in as_completed(futures):
+            # with debug, a thread unit's first policy error is reraised.
+            if f.exception():
+                errors.update({_policy_key(p): f.exception() for p in futures[f]})
+            else:
+                errors.update(f.result())
+
+    if options.debug and errors:
+        error = [errors[_policy_key(p)] for p in policies if _policy_key(p) in errors][0]
+        if isinstance(error, str):
+            error = PolicyExecutionError(error)
+        raise error
+    return errors
+
+
+def _run_policy_data(unit):
+    """Process pool worker executing a unit of policies from their data."""
+    policies = []
+    for data, options in unit:
+        load_resources(StructureParser().get_resource_types({'policies': [data]}))
+        policy = Policy(data, options)
+        # provider initialization is idempotent on already initialized options.
+        clouds[policy.provider_name]().initialize(options)
+        policy.validate()
+        policies.append(policy)
+    try:
+        errors = run_serial(policies[0].options, policies)
+    except Exception as e:
+        # with debug, the unit's first policy error is reraised.
+        errors = {_policy_key(p): e for p in policies}
+    # exceptions may not be picklable, return their representation.
+    return {k: repr(e) for k, e in errors.items()}
 
 
 @policy_command
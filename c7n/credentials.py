@@ -3,18 +3,26 @@
 """
 Authentication utilities
 """
+import datetime
+import functools
+import hashlib
+import logging
 import threading
+import time
 import os
 
 from botocore.credentials import RefreshableCredentials
+from botocore.loaders import create_loader
 from botocore.session import get_session
 from boto3 import Session
 import json
 
 from c7n.version import version
-from c7n.utils import get_retry
+from c7n.utils import file_lock, get_retry, parse_date
 
 
+log = logging.getLogger('custodian.credentials')
+
 # we still have some issues (see #5023) to work through to switch to
 # default regional endpoints, for now its opt-in.
 USE_STS_REGIONAL = os.environ.get(
@@ -62,6 +70,211 @@ class CustodianSession(Session):
             cls._clients = {}
 
 
+class ApiConcurrency:
+    """Bound the number of in flight api calls per service.
+
+    The limit is shared by all threads within a process, ie. policies
+    executing concurrently via `custodian run --workers`.
+    """
+
+    context_key = 'c7n-api-slot'
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def register(self, session):
+        if not self.limit:
+            return
+        session.events.register(
+            'before-call.*.*', self._acquire, unique_id='c7n-api-concurrency')
+        for event in ('after-call.*.*', 'after-call-error.*.*'):
+            session.events.register(
+                event, self._release, unique_id='c7n-api-concurrency-%s' % event)
+
+    def get_semaphore(self, service):
+        with self.lock:
+            if service not in self.semaphores:
+                self.semaphores[service] = threading.BoundedSemaphore(self.limit)
+            return self.semaphores[service]
+
+    def _acquire(self, model, context, **kwargs):
+        slot = self.get_semaphore(model.service_model.service_name)
+        slot.acquire()
+        context[self.context_key] = slot
+
+    def _release(self, context, **kwargs):
+        # other before-call handlers (ie. stubs) may have short circuited
+        # the call without us acquiring a slot.
+        slot = context.pop(self.context_key, None)
+        if slot is not None:
+            slot.release()
+
+
+api_concurrency = ApiConcurrency()
+
+
+class TokenBucket:
+    """Token bucket with an additive increase, multiplicative decrease rate."""
+
+    # minimum seconds between rate decreases, so a burst of throttled
+    # in flight calls only backs off once.
+    decrease_interval = 1.0
+    decrease_factor = 0.5
+    min_rate = 0.5
+
+    def __init__(self, rate):
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = max(rate, 1.0)
+        self.last_fill = time.monotonic()
+        self.last_decrease = 0
+        self.lock = threading.Lock()
+
+    def _fill(self, now):
+        self.tokens = min(
+            max(self.rate, 1.0), self.tokens + (now - self.last_fill) * self.rate)
+        self.last_fill = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._fill(time.monotonic())
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            # approximately one call per second increase, per second
+            self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+    def on_throttle(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.last_decrease < self.decrease_interval:
+                return
+            self.last_decrease = now
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+
+
+class ApiRateLimiter:
+    """Rate limit api calls per account, region and service.
+
+    Each account, region and service has a token bucket whose rate
+    starts at the configured budget (calls per second), halves when the
+    service throttles and recovers additively on successful calls. The
+    buckets are shared by all threads within a process.
+
+    Budgets are configured as a comma separated list of a default rate
+    and service specific rates, ie. `20,ec2=10,s3=50`.
+    """
+
+    throttle_codes = frozenset((
+        'Throttling', 'ThrottlingException', 'ThrottledException',
+        'RequestThrottledException', 'TooManyRequestsException',
+        'RequestLimitExceeded', 'RequestThrottled', 'SlowDown',
+        'ProvisionedThroughputExceededException', 'BandwidthLimitExceeded'))
+
+    def __init__(self, budgets=None):
+        self.budgets = {}
+        self.buckets = {}
+        self.lock = threading.Lock()
+        if budgets:
+            self.configure(budgets)
+
+    def configure(self, budgets):
+        if isinstance(budgets, str):
+            budgets = self.parse_budgets(budgets)
+        self.budgets = dict(budgets)
+        with self.lock:
+            self.buckets = {}
+
+    @staticmethod
+    def parse_budgets(value):
+        budgets = {}
+        for item in value.split(','):
+            item = item.strip()
+            if not item:
+                continue
+            service, _, rate = item.rpartition('=')
+            rate = float(rate)
+            if rate <= 0:
+                raise ValueError("api rate must be positive: %s" % item)
+            budgets[service or None] = rate
+        return budgets
+
+    def register(self, session, account=None):
+        if not self.budgets:
+            return
+        session.events.register(
+            'before-call.*.*', functools.partial(self._acquire, account),
+            unique_id='c7n-api-rate')
+        session.events.register(
+            'needs-retry.*.*', functools.partial(self._observe, account),
+            unique_id='c7n-api-rate-observe')
+
+    def get_bucket(self, account, region, service):
+        key = (account, region, service)
+        with self.lock:
+            if key not in self.buckets:
+                rate = self.budgets.get(service, self.budgets.get(None))
+                self.buckets[key] = rate and TokenBucket(rate) or None
+            return self.buckets[key]
+
+    def _acquire(self, account, model, context, **kwargs):
+        bucket = self.get_bucket(
+            account, context.get('client_region'), model.service_model.service_name)
+        if bucket is not None:
+            bucket.acquire()
+
+    def _observe(self, account, operation, request_dict, response=None, **kwargs):
+        bucket = self.get_bucket(
+            account, request_dict.get('context', {}).get('client_region'),
+            operation.service_model.service_name)
+        if bucket is None or response is None:
+            return
+        http_response, parsed = response
+        code = parsed.get('Error', {}).get('Code')
+        if code in self.throttle_codes or http_response.status_code == 429:
+            bucket.on_throttle()
+        elif http_response.status_code < 400:
+            bucket.on_success()
+
+
+api_rate_limiter = ApiRateLimiter()
+
+
+class SharedDataLoader:
+    """Share botocore's data loader across sessions within a process.
+
+    Each botocore session otherwise creates its own loader and re-reads
+    service models and endpoint data from disk, when enabled the first
+    session's parsed data is reused by all subsequent sessions.
+    """
+
+    def __init__(self):
+        self.loader = None
+        self.lock = threading.Lock()
+
+    def enable(self):
+        with self.lock:
+            if self.loader is None:
+                self.loader = create_loader()
+        return self.loader
+
+    def register(self, session):
+        if self.loader is None:
+            return
+        session._session.register_component('data_loader', self.loader)
+
+
+shared_data_loader = SharedDataLoader()
+
+
 class SessionFactory:
 
     def __init__(
@@ -86,6 +299,7 @@ class SessionFactory:
     def __call__(self, assume=True, region=None):
         if self.assume_role and assume:
             session = Session(profile_name=self.profile)
+            shared_data_loader.register(session)
             session = assumed_session(
                 self.assume_role, self.session_name, self.session_policy, session,
                 region or self.region, self.external_id)
@@ -101,6 +315,11 @@ class SessionFactory:
         if self._policy_name:
             session._session.user_agent_extra = f"c7n/policy#{self._policy_name}"
 
+        shared_data_loader.register(session)
+        # rate limit before taking a concurrency slot, so calls waiting on
+        # their rate don't hold a slot.
+        api_rate_limiter.register(session, self.assume_role or self.profile)
+        api_concurrency.register(session)
         for s in self._subscribers:
             s(session)
 
@@ -110,6 +329,73 @@ class SessionFactory:
         self._subscribers = subscribers
 
 
+class CredentialCache:
+    """Cache assumed role credentials on disk, shared across processes.
+
+    Enabled by setting a cache directory, either via configure or the
+    C7N_CREDENTIAL_CACHE environment variable. Credentials are keyed
+    by role, session name, external id, session policy and region, and
+    are only served while they have more than `expiry_margin` remaining,
+    ahead of botocore's own refresh window, so a refresh from any
+    process assumes the role anew. Where supported, a lock file per key
+    serializes concurrent assumes of the same role.
+    """
+
+    expiry_margin = datetime.timedelta(minutes=20)
+
+    def __init__(self, path=None):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, path):
+        self.path = path
+
+    def get_key(self, *params):
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.path, '%s.json' % key)) as fh:
+                credentials = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        expiry = parse_date(credentials['expiry_time'])
+        if expiry - self.expiry_margin < datetime.datetime.now(tz=expiry.tzinfo):
+            return None
+        return credentials
+
+    def save(self, key, credentials):
+        cache_path = os.path.join(self.path, '%s.json' % key)
+        fd = os.open(cache_path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(credentials, fh)
+        os.replace(cache_path + '.tmp', cache_path)
+
+    def get_credentials(self, key_params, fetch):
+        """Return cached credentials for the key, else fetch and cache."""
+        if not self.path:
+            return fetch()
+        os.makedirs(self.path, mode=0o700, exist_ok=True)
+        key = self.get_key(*key_params)
+        with file_lock(os.path.join(self.path, '%s.lock' % key)):
+            credentials = self.get(key)
+            if credentials is not None:
+                self.hits += 1
+                return credentials
+            self.misses += 1
+            credentials = fetch()
+            self.save(key, credentials)
+            return credentials
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+credential_cache = CredentialCache(os.environ.get('C7N_CREDENTIAL_CACHE'))
+
+
 def assumed_session(
         role_arn, session_name, session_policy=None, session=None, region=None, external_id=None):
     """STS Role assume a boto3.Session
@@ -131,7 +417,7 @@ def assumed_session(
 
     retry = get_retry(('Throttling',))
 
-    def refresh():
+    def assume():
 
         parameters = {"RoleArn": role_arn, "RoleSessionName": session_name}
         if session_policy is not None:
@@ -150,6 +436,10 @@ def assumed_session(
             # Silly that we basically stringify so it can be parsed again
             expiry_time=credentials['Expiration'].isoformat())
 
+    def refresh():
+        return credential_cache.get_credentials(
+            (role_arn, session_name, external_id, session_policy, region), assume)
+
     session_credentials = RefreshableCredentials.create_from_metadata(
         metadata=refresh(),
         refresh_using=refresh,
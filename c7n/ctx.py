@@ -5,7 +5,10 @@ import uuid
 import os
 
 
+from c7n.filters.ordering import DEFAULT_FILTER_STATS, filter_stats
 from c7n.output import (
+    PhaseTimer,
+    SpanProfiler,
     api_stats_outputs,
     blob_outputs,
     log_outputs,
@@ -41,8 +44,19 @@ class ExecutionContext:
         self.metrics = metrics_outputs.select(metrics, self)
 
         # Tracer is wired into core filtering code / which is getting
-        # invoked sans execution context entry in tests
-        self.tracer = tracer_outputs.select(self.options.tracer, self)
+        # invoked sans execution context entry in tests, its subsegments
+        # are timed to provide a per phase breakdown of execution time.
+        self.profiler = None
+        if self.options.get('profiler'):
+            self.profiler = SpanProfiler(sample_stacks=self.options.profiler == 'stacks')
+        self.tracer = PhaseTimer(
+            tracer_outputs.select(self.options.tracer, self), self.profiler)
+
+        # Filter selectivity, for cost based ordering of filters.
+        self.filter_stats = None
+        if self.options.get('reorder_filters'):
+            self.filter_stats = filter_stats.configure(
+                self.options.get('filter_stats') or DEFAULT_FILTER_STATS)
 
     def initialize(self):
         self.output = blob_outputs.select(self.options.output_dir, self)
@@ -80,6 +94,8 @@ class ExecutionContext:
             self.output_logs.__enter__()
 
         self.api_stats.__enter__()
+        if self.profiler:
+            self.profiler.__enter__()
         self.tracer.__enter__()
 
         # Api stats and user agent modification by policy require updating
@@ -93,7 +109,14 @@ class ExecutionContext:
         if exc_type is not None and self.metrics:
             self.metrics.put_metric('PolicyException', 1, "Count")
         self.output.write_file('metadata.json', dumps(self.get_metadata(), indent=2))
+        if self.profiler:
+            self.profiler.__exit__()
+            self.output.write_file('profile.json', dumps(self.profiler.get_trace()))
+            if self.profiler.sample_stacks:
+                self.output.write_file('profile-stacks.txt', self.profiler.get_folded_stacks())
         self.api_stats.__exit__(exc_type, exc_value, exc_traceback)
+        if self.filter_stats:
+            self.filter_stats.flush()
 
         with self.tracer.subsegment('output'):
             self.metrics.flush()
@@ -112,7 +135,7 @@ class ExecutionContext:
         if os.environ.get('C7N_TEST_RUN'):
             reset_session_cache()
 
-    def get_metadata(self, include=('sys-stats', 'api-stats', 'metrics')):
+    def get_metadata(self, include=('sys-stats', 'api-stats', 'metrics', 'timings')):
         t = time.time()
         md = {
             'policy': self.policy.data,
@@ -130,6 +153,9 @@ class ExecutionContext:
             md['sys-stats'] = self.sys_stats.get_metadata()
         if 'api-stats' in include and self.api_stats:
             md['api-stats'] = self.api_stats.get_metadata()
+            md['api-detail'] = self.api_stats.get_detail()
         if 'metrics' in include and self.metrics:
             md['metrics'] = self.metrics.get_metadata()
+        if 'timings' in include:
+            md['timings'] = self.tracer.get_metadata()
         return md
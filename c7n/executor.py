@@ -18,6 +18,8 @@ class MainThreadExecutor:
     def __init__(self, *args, **kw):
         self.args = args
         self.kw = kw
+        if kw.get('initializer'):
+            kw['initializer'](*kw.get('initargs', ()))
 
     def map(self, func, iterable):
         for args in iterable:
@@ -204,6 +204,15 @@ class Filter(Element):
         """ Bulk process resources and return filtered set."""
         return list(filter(self, resources))
 
+    def compile(self):
+        """Compile the filter into a specialized resource matcher.
+
+        The matcher returns None for resources that don't match, else a
+        tuple of keys to annotate onto the resource. Returns None if the
+        filter does not support compilation.
+        """
+        return None
+
     def get_block_operator(self):
         """Determine the immediate parent boolean operator for a filter"""
         # Top level operator is `and`
@@ -314,6 +323,19 @@ def union_list(a, b):
     return res
 
 
+def filter_compiled(matcher, resources):
+    """Filter resources in a single pass with a compiled matcher."""
+    results = []
+    for r in resources:
+        keys = matcher(r)
+        if keys is None:
+            continue
+        for k in keys:
+            set_annotation(r, ANNOTATION_KEY, k)
+        results.append(r)
+    return results
+
+
 class BooleanGroupFilter(Filter):
 
     def __init__(self, data, registry, manager):
@@ -322,6 +344,16 @@ class BooleanGroupFilter(Filter):
         self.filters = registry.parse(list(self.data.values())[0], manager)
         self.manager = manager
 
+    def compile(self):
+        matchers = [isinstance(f, Filter) and f.compile() or None for f in self.filters]
+        if None in matchers:
+            return None
+        return self.compile_block(matchers)
+
+    def compile_block(self, matchers):
+        """Combine the block's compiled filter matchers, None if unsupported."""
+        return None
+
     def validate(self):
         for f in self.filters:
             f.validate()
@@ -331,6 +363,25 @@ class BooleanGroupFilter(Filter):
         resource_type = self.manager.get_model()
         return resource_type.id
 
+    def get_profiler(self):
+        return getattr(getattr(self.manager, 'ctx', None), 'profiler', None)
+
+    def process_filter(self, f, resources, event=None):
+        """Process resources with a nested filter, within a span when profiling."""
+        profiler = self.get_profiler()
+        if not profiler:
+            return f.process(resources, event)
+        with profiler.span("filter:%s" % f.type, input=len(resources)) as args:
+            resources = f.process(resources, event)
+            args['output'] = len(resources)
+        return resources
+
+    def process_compiled(self, matcher, resources):
+        profiler = self.get_profiler()
+        if profiler:
+            profiler.annotate(compiled=True)
+        return filter_compiled(matcher, resources)
+
     def __len__(self):
         return len(self.filters)
 
@@ -348,10 +399,24 @@ class BooleanGroupFilter(Filter):
 class Or(BooleanGroupFilter):
 
     def process(self, resources, event=None):
+        matcher = self.compile()
+        if matcher is not None:
+            return self.process_compiled(matcher, resources)
         if self.manager:
             return self.process_set(resources, event)
         return super(Or, self).process(resources, event)
 
+    def compile_block(self, matchers):
+        def match_any(r):
+            # all branches are evaluated for their annotations.
+            keys = None
+            for m in matchers:
+                mkeys = m(r)
+                if mkeys is not None:
+                    keys = (keys or ()) + mkeys
+            return keys
+        return match_any
+
     def __call__(self, r):
         """Fallback for older unit tests that don't utilize a query manager"""
         for f in self.filters:
@@ -371,21 +436,34 @@ class Or(BooleanGroupFilter):
         for f in self.filters:
             if compiled:
                 results = results.union([
-                    compiled.search(r) for r in f.process(resources, event)])
+                    compiled.search(r) for r in self.process_filter(f, resources, event)])
             else:
                 results = results.union([
-                    r[rtype_id] for r in f.process(resources, event)])
+                    r[rtype_id] for r in self.process_filter(f, resources, event)])
         return [resource_map[r_id] for r_id in results]
 
 
 class And(BooleanGroupFilter):
 
     def process(self, resources, events=None):
+        matcher = self.compile()
+        if matcher is not None:
+            return self.process_compiled(matcher, resources)
         if self.manager:
             sweeper = AnnotationSweeper(self.get_resource_type_id(), resources)
 
-        for f in self.filters:
-            resources = f.process(resources, events)
+        filters = self.filters
+        stats = getattr(getattr(self.manager, 'ctx', None), 'filter_stats', None)
+        if stats is not None:
+            # Lazy for non circular
+            from c7n.filters.ordering import order_filters
+            filters = order_filters(self.manager, filters, stats, resources)
+
+        for f in filters:
+            rcount = len(resources)
+            resources = self.process_filter(f, resources, events)
+            if stats is not None:
+                stats.record(stats.get_key(self.manager, f), rcount, len(resources))
             if not resources:
                 break
 
@@ -394,14 +472,42 @@ class And(BooleanGroupFilter):
 
         return resources
 
+    def compile_block(self, matchers):
+        return match_all(matchers)
+
+
+def match_all(matchers):
+    def match(r):
+        keys = ()
+        for m in matchers:
+            mkeys = m(r)
+            if mkeys is None:
+                return None
+            keys += mkeys
+        return keys
+    return match
+
 
 class Not(BooleanGroupFilter):
 
     def process(self, resources, event=None):
+        matcher = self.compile()
+        if matcher is not None:
+            return self.process_compiled(matcher, resources)
         if self.manager:
             return self.process_set(resources, event)
         return super(Not, self).process(resources, event)
 
+    def compile_block(self, matchers):
+        matcher = match_all(matchers)
+
+        def match_none(r):
+            # annotations within a not block are always swept.
+            if matcher(r) is None:
+                return ()
+            return None
+        return match_none
+
     def __call__(self, r):
         """Fallback for older unit tests that don't utilize a query manager"""
 
@@ -423,7 +529,7 @@ class Not(BooleanGroupFilter):
         sweeper = AnnotationSweeper(rtype_id, resources)
 
         for f in self.filters:
-            resources = f.process(resources, event)
+            resources = self.process_filter(f, resources, event)
             if not resources:
                 break
 
@@ -513,6 +619,7 @@ class ValueFilter(BaseValueFilter):
     schema_alias = True
     annotate = True
     required_keys = {'value', 'key'}
+    _cidr_sentinel = None
 
     def _validate_resource_count(self):
         """ Specific validation for `resource_count` type
@@ -597,8 +704,127 @@ class ValueFilter(BaseValueFilter):
                 return resources
             return []
 
+        matcher = self.compile()
+        if matcher is not None:
+            return filter_compiled(matcher, resources)
         return super(ValueFilter, self).process(resources, event)
 
+    def compile(self):
+        """Compile to a matcher with key access, value and operator resolved once.
+
+        Subclasses customizing matching or value extraction, and value_path
+        and resource_count filters which depend on the resource set, are not
+        compiled.
+        """
+        if not self.is_compilable():
+            return None
+
+        self.initialize_content()
+        get_value = self.compile_resource_value(self.k)
+        compare = self.compile_compare()
+        process_value_type = self.process_value_type
+        vtype, sentinel = self.vtype, self.v
+        empty_in = self.op in ('in', 'not-in')
+        keys = self.annotate and (self.k,) or ()
+
+        def match(i):
+            r = get_value(i)
+            if empty_in and r is None:
+                r = ()
+            if vtype is not None:
+                v, r = process_value_type(sentinel, r, i)
+            else:
+                v = sentinel
+            if compare(r, v):
+                return keys
+            return None
+        return match
+
+    def is_compilable(self):
+        """Whether the filter compiles, decided from its type and data alone."""
+        if 'value_path' in self.data or self.data.get('value_type') == 'resource_count':
+            return False
+        for m in ('__call__', 'process', 'match', 'get_resource_value', 'process_value_type'):
+            if getattr(type(self), m) is not getattr(ValueFilter, m):
+                return False
+        return True
+
+    def compile_resource_value(self, k):
+        if k.startswith('tag:'):
+            tk = k.split(':', 1)[1]
+
+            def get_value(i):
+                if 'Tags' in i:
+                    for t in i['Tags'] or ():
+                        if t.get('Key') == tk:
+                            return t.get('Value')
+                    return None
+                elif 'labels' in i:
+                    return i.get('labels', {}).get(tk)
+                elif 'tags' in i:
+                    return (i.get('tags', {}) or {}).get(tk)
+                return None
+        else:
+            expr = None
+
+            def get_value(i):
+                nonlocal expr
+                if k in i:
+                    return i[k]
+                if expr is None:
+                    expr = jmespath_compile(k)
+                return expr.search(i)
+
+        if self.data.get('value_regex'):
+            regex = ValueRegex(self.data['value_regex'])
+            return lambda i: regex.get_resource_value(get_value(i))
+        return get_value
+
+    def compile_compare(self):
+        op = self.op and OPERATORS[self.op] or None
+
+        def compare_op(r, v):
+            if op:
+                try:
+                    return op(r, v)
+                except TypeError:
+                    return False
+            return r == v
+
+        def compare(r, v):
+            if r is None and v == 'absent':
+                return True
+            elif r is not None and v == 'present':
+                return True
+            elif v == 'not-null' and r:
+                return True
+            elif v == 'empty' and not r:
+                return True
+            return compare_op(r, v)
+
+        # without a value type the sentinel is constant, skip the special
+        # values checks if it isn't one.
+        if self.vtype is None and not (
+                isinstance(self.v, str) and self.v in ('absent', 'present', 'not-null', 'empty')):
+            return compare_op
+        return compare
+
+    def initialize_content(self, i=None):
+        if self.v is None and len(self.data) == 1:
+            [(self.k, self.v)] = self.data.items()
+        elif self.v is None and not hasattr(self, 'content_initialized'):
+            self.k = self.data.get('key')
+            self.op = self.data.get('op')
+            if 'value_from' in self.data:
+                values = ValuesFrom(self.data['value_from'], self.manager)
+                self.v = values.get_values()
+            elif 'value_path' in self.data:
+                self.v = self.get_path_value(i)
+            else:
+                self.v = self.data.get('value')
+            self.content_initialized = True
+            self.vtype = self.data.get('value_type')
+
     def get_resource_value(self, k, i):
         return super(ValueFilter, self).get_resource_value(k, i, self.data.get('value_regex'))
 
@@ -629,20 +855,7 @@ class ValueFilter(BaseValueFilter):
         return jmespath_search(self.data.get('value_path'), i)
 
     def match(self, i):
-        if self.v is None and len(self.data) == 1:
-            [(self.k, self.v)] = self.data.items()
-        elif self.v is None and not hasattr(self, 'content_initialized'):
-            self.k = self.data.get('key')
-            self.op = self.data.get('op')
-            if 'value_from' in self.data:
-                values = ValuesFrom(self.data['value_from'], self.manager)
-                self.v = values.get_values()
-            elif 'value_path' in self.data:
-                self.v = self.get_path_value(i)
-            else:
-                self.v = self.data.get('value')
-            self.content_initialized = True
-            self.vtype = self.data.get('value_type')
+        self.initialize_content(i)
 
         if i is None:
             return False
@@ -722,7 +935,12 @@ class ValueFilter(BaseValueFilter):
             # comparisons is intuitively wrong.
             return value, sentinel
         elif self.vtype == 'cidr':
-            s = parse_cidr(sentinel)
+            # the sentinel is constant, ie. a large value_from list of
+            # cidrs, parse it and build its prefix index once.
+            cached = self._cidr_sentinel
+            if cached is None or cached[0] is not sentinel:
+                cached = self._cidr_sentinel = (sentinel, parse_cidr(sentinel))
+            s = cached[1]
             v = parse_cidr(value)
             if (isinstance(s, ipaddress._BaseAddress) and isinstance(v, ipaddress._BaseNetwork)):
                 return v, s
@@ -4,6 +4,7 @@
 CloudWatch Metrics suppport for resources
 """
 import re
+import threading
 
 from collections import namedtuple
 from concurrent.futures import as_completed
@@ -67,6 +68,25 @@ class MetricsFilter(Filter):
     policy to treat their request counts as 0.
 
     Note the default statistic for metrics is Average.
+
+    The "batch" key retrieves metrics with GetMetricData, querying up to
+    500 resources per api call. Metrics retrieved this way are shared
+    with other policies in the same run querying the same metric,
+    statistic, period and dimensions.
+
+    .. code-block:: yaml
+
+      - name: lambda-unused
+        resource: lambda
+        filters:
+          - type: metrics
+            name: Invocations
+            statistics: Sum
+            days: 30
+            value: 0
+            missing-value: 0
+            op: eq
+            batch: true
     """
 
     schema = type_schema(
@@ -86,12 +106,15 @@ class MetricsFilter(Filter):
            'attr-multiplier': {'type': 'number'},
            'percent-attr': {'type': 'string'},
            'missing-value': {'type': 'number'},
+           'batch': {'type': 'boolean'},
            'required': ('value', 'name')})
     schema_alias = True
     permissions = ("cloudwatch:GetMetricStatistics",)
 
     MAX_QUERY_POINTS = 50850
     MAX_RESULT_POINTS = 1440
+    # GetMetricData limit on queries per call
+    MAX_METRIC_DATA_QUERIES = 500
 
     # Default per service, for overloaded services like ec2
     # we do type specific default namespace annotation
@@ -143,6 +166,11 @@ class MetricsFilter(Filter):
             raise PolicyValidationError(
                 "metrics filter days value (%s) cannot exceed 455" % self.days)
 
+    def get_permissions(self):
+        if self.data.get('batch'):
+            return ("cloudwatch:GetMetricData",)
+        return self.permissions
+
     def get_metric_window(self):
         """Determine start and end times for the CloudWatch metric window
 
@@ -193,6 +221,9 @@ class MetricsFilter(Filter):
         self.namespace = ns
 
         self.log.debug("Querying metrics for %d", len(resources))
+        if self.data.get('batch'):
+            return self.process_batched(resources)
+
         matched = []
         with self.executor_factory(max_workers=3) as w:
             futures = []
@@ -234,11 +265,7 @@ class MetricsFilter(Filter):
             dimensions.extend(self.get_user_dimensions())
 
             collected_metrics = r.setdefault('c7n.metrics', {})
-            # Note this annotation cache is policy scoped, not across
-            # policies, still the lack of full qualification on the key
-            # means multiple filters within a policy using the same metric
-            # across different periods or dimensions would be problematic.
-            key = "%s.%s.%s.%s" % (self.namespace, self.metric, self.statistics, str(self.days))
+            key = self.get_metric_key()
 
             params = dict(
                 Namespace=self.namespace,
@@ -257,41 +284,154 @@ class MetricsFilter(Filter):
                 collected_metrics[key] = client.get_metric_statistics(
                     **params)['Datapoints']
 
-            # In certain cases CloudWatch reports no data for a metric.
-            # If the policy specifies a fill value for missing data, add
-            # that here before testing for matches. Otherwise, skip
-            # matching entirely.
-            if len(collected_metrics[key]) == 0:
-                if 'missing-value' not in self.data:
-                    continue
-                collected_metrics[key].append({
-                    'Timestamp': self.start,
-                    self.statistics: self.data['missing-value'],
-                    'c7n:detail': 'Fill value for missing data'
-                })
-
-            if self.data.get('percent-attr'):
-                rvalue = r[self.data.get('percent-attr')]
-                if self.data.get('attr-multiplier'):
-                    rvalue = rvalue * self.data['attr-multiplier']
-                all_meet_condition = True
-                for data_point in collected_metrics[key]:
-                    percent = (data_point[self.statistics] / rvalue * 100)
-                    if not self.op(percent, self.value):
-                        all_meet_condition = False
-                        break
-                if all_meet_condition:
-                    matched.append(r)
-            else:
-                all_meet_condition = True
-                for data_point in collected_metrics[key]:
-                    if not self.op(data_point[self.statistics], self.value):
-                        all_meet_condition = False
-                        break
-                if all_meet_condition:
-                    matched.append(r)
+            if self.match_resource(r, key):
+                matched.append(r)
         return matched
 
+    def get_metric_key(self):
+        # Note this annotation cache is policy scoped, not across
+        # policies, still the lack of full qualification on the key
+        # means multiple filters within a policy using the same metric
+        # across different periods or dimensions would be problematic.
+        return "%s.%s.%s.%s" % (self.namespace, self.metric, self.statistics, str(self.days))
+
+    def match_resource(self, r, key):
+        collected_metrics = r['c7n.metrics']
+
+        # In certain cases CloudWatch reports no data for a metric.
+        # If the policy specifies a fill value for missing data, add
+        # that here before testing for matches. Otherwise, skip
+        # matching entirely.
+        if len(collected_metrics[key]) == 0:
+            if 'missing-value' not in self.data:
+                return False
+            collected_metrics[key].append({
+                'Timestamp': self.start,
+                self.statistics: self.data['missing-value'],
+                'c7n:detail': 'Fill value for missing data'
+            })
+
+        if self.data.get('percent-attr'):
+            rvalue = r[self.data.get('percent-attr')]
+            if self.data.get('attr-multiplier'):
+                rvalue = rvalue * self.data['attr-multiplier']
+            for data_point in collected_metrics[key]:
+                percent = (data_point[self.statistics] / rvalue * 100)
+                if not self.op(percent, self.value):
+                    return False
+            return True
+
+        for data_point in collected_metrics[key]:
+            if not self.op(data_point[self.statistics], self.value):
+                return False
+        return True
+
+    def process_batched(self, resources):
+        key = self.get_metric_key()
+        pending = {}
+        for r in resources:
+            collected_metrics = r.setdefault('c7n.metrics', {})
+            if key in collected_metrics:
+                continue
+            dimensions = self.get_dimensions(r)
+            dimensions.extend(self.get_user_dimensions())
+            query_key = self.get_query_key(dimensions)
+            datapoints = metric_data.get(query_key)
+            if datapoints is not None:
+                collected_metrics[key] = list(datapoints)
+                continue
+            pending.setdefault(query_key, []).append(r)
+
+        with self.executor_factory(max_workers=3) as w:
+            futures = []
+            for query_set in chunks(pending, self.MAX_METRIC_DATA_QUERIES):
+                futures.append(w.submit(self.get_metric_data, query_set))
+
+            for f in as_completed(futures):
+                if f.exception():
+                    self.log.warning(
+                        "CW Retrieval error: %s" % f.exception())
+                    continue
+                for query_key, datapoints in f.result().items():
+                    metric_data.save(query_key, datapoints)
+                    for r in pending[query_key]:
+                        r['c7n.metrics'][key] = list(datapoints)
+
+        return [r for r in resources
+                if key in r['c7n.metrics'] and self.match_resource(r, key)]
+
+    def get_query_key(self, dimensions):
+        return (
+            self.manager.config.account_id,
+            self.manager.config.region,
+            self.namespace,
+            self.metric,
+            self.statistics,
+            self.period,
+            self.start,
+            self.end,
+            tuple((d['Name'], d['Value']) for d in dimensions))
+
+    def get_metric_data(self, query_set):
+        client = local_session(
+            self.manager.session_factory).client('cloudwatch')
+        queries = []
+        for idx, query_key in enumerate(query_set):
+            queries.append({
+                'Id': 'm%d' % idx,
+                'MetricStat': {
+                    'Metric': {
+                        'Namespace': self.namespace,
+                        'MetricName': self.metric,
+                        'Dimensions': [
+                            {'Name': n, 'Value': v} for n, v in query_key[-1]]},
+                    'Period': self.period,
+                    'Stat': self.statistics},
+                'ReturnData': True})
+
+        results = {query_key: [] for query_key in query_set}
+        paginator = client.get_paginator('get_metric_data')
+        for page in paginator.paginate(
+                MetricDataQueries=queries,
+                StartTime=self.start,
+                EndTime=self.end,
+                ScanBy='TimestampAscending'):
+            for result in page['MetricDataResults']:
+                datapoints = results[query_set[int(result['Id'][1:])]]
+                for timestamp, value in zip(result['Timestamps'], result['Values']):
+                    datapoints.append({'Timestamp': timestamp, self.statistics: value})
+        return results
+
+
+class MetricDataStore:
+    """Metric datapoints retrieved via GetMetricData, shared across the
+    policies of a run.
+
+    Keys include the metric window, so entries naturally age out of use.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.data.get(key)
+
+    def save(self, key, datapoints):
+        with self.lock:
+            if len(self.data) >= self.max_size:
+                self.data.clear()
+            self.data[key] = datapoints
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+metric_data = MetricDataStore()
+
 
 class ShieldMetrics(MetricsFilter):
     """Specialized metrics filter for shield
@@ -0,0 +1,185 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Cost based ordering of the filters within an and block.
+
+Filters execute in the order written, so a policy which places an api
+backed filter (metrics, cross-account, etc) ahead of an in memory
+check does api work on resources the in memory check would discard.
+
+When enabled, in memory value filters are run ahead of the rest of
+their block, the most selective first, per the selectivity observed
+across previous runs. Api backed filters keep their relative order.
+
+Any filter which isn't in memory may write annotations onto resources,
+under names of its own choosing. So an in memory filter only moves when
+every key it reads is already on the resources entering the block, and
+isn't the matched filters annotation its siblings write. Other in memory
+filters, and filters operating on the resource set as a whole (reduce,
+resource counts), are barriers that nothing is moved across.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from c7n.filters.core import ANNOTATION_KEY, BooleanGroupFilter, Filter, ValueFilter
+from c7n.manager import iter_filters
+from c7n.utils import file_lock
+
+log = logging.getLogger('custodian.filters.ordering')
+
+DEFAULT_FILTER_STATS = "~/.cache/cloud-custodian-filter-stats.json"
+
+# the leading field of a jmespath expression, quoted or not
+KEY_FIELD = re.compile(r'^(?:"([^"]+)"|([A-Za-z_][A-Za-z0-9_]*))(?=$|[.\[])')
+
+
+class FilterStats:
+    """Resource counts in to and out of filters, accumulated across runs.
+
+    Counts are kept in a json file, new observations are merged into
+    the file on flush, so multiple processes may share it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.stats = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def configure(self, path):
+        path = os.path.expanduser(path)
+        with self.lock:
+            if path == self.path:
+                return self
+            self.path = path
+            self.stats = self.read()
+            self.pending = {}
+        return self
+
+    def get_key(self, manager, f):
+        return hashlib.sha256(json.dumps(
+            [getattr(manager, 'type', None), f.data],
+            sort_keys=True, default=str).encode('utf8')).hexdigest()[:24]
+
+    def record(self, key, count_in, count_out):
+        with self.lock:
+            for counts in (self.stats, self.pending):
+                c = counts.setdefault(key, [0, 0])
+                c[0] += count_in
+                c[1] += count_out
+
+    def selectivity(self, key):
+        """Ratio of resources matched by a filter, 1.0 if never observed."""
+        counts = self.stats.get(key)
+        if not counts or not counts[0]:
+            return 1.0
+        return counts[1] / counts[0]
+
+    def read(self):
+        try:
+            with open(self.path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def flush(self):
+        with self.lock:
+            if not self.path or not self.pending:
+                return
+            pending, self.pending = self.pending, {}
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with file_lock(self.path + '.lock'):
+                stats = self.read()
+                for k, (count_in, count_out) in pending.items():
+                    c = stats.setdefault(k, [0, 0])
+                    c[0] += count_in
+                    c[1] += count_out
+                with open(self.path + '.tmp', 'w') as fh:
+                    json.dump(stats, fh)
+                os.replace(self.path + '.tmp', self.path)
+        except OSError as e:
+            log.warning("unable to save filter stats %s: %s", self.path, e)
+            return
+        with self.lock:
+            self.stats.update(stats)
+
+
+filter_stats = FilterStats()
+
+
+def is_barrier(f):
+    """Filters operating on the resource set, which nothing is moved across."""
+    for sf in iter_filters([f]):
+        if sf.type == 'reduce' or sf.data.get('value_type') == 'resource_count':
+            return True
+    return False
+
+
+def is_in_memory(f):
+    """Filters which evaluate without api calls, decided from their type and data."""
+    if isinstance(f, BooleanGroupFilter):
+        return all(isinstance(sf, Filter) and is_in_memory(sf) for sf in f.filters)
+    return isinstance(f, ValueFilter) and f.is_compilable()
+
+
+def get_filter_key(f):
+    if len(f.data) == 1:
+        return next(iter(f.data))
+    return f.data.get('key')
+
+
+def has_key(k, resources):
+    """Whether any resource has the top level field a filter key reads."""
+    if k.startswith('tag:'):
+        fields = ('Tags', 'labels', 'tags')
+    else:
+        m = KEY_FIELD.match(k)
+        fields = m and (k, m.group(1) or m.group(2)) or (k,)
+    if ANNOTATION_KEY in fields:
+        return False
+    return any(fk in r for r in resources for fk in fields)
+
+
+def reads_resources(f, resources):
+    """In memory filters reading only keys present on the resources.
+
+    Keys missing from the resources may be annotations written by
+    preceding filters.
+    """
+    for sf in iter_filters([f]):
+        if isinstance(sf, BooleanGroupFilter):
+            continue
+        k = get_filter_key(sf)
+        if not k or not has_key(k, resources):
+            return False
+    return True
+
+
+def order_filters(manager, filters, stats, resources):
+    """Order the filters of an and block, in memory and selective first."""
+    ordered, in_memory, api = [], [], []
+
+    def flush():
+        in_memory.sort(key=lambda f: stats.selectivity(stats.get_key(manager, f)))
+        ordered.extend(in_memory)
+        ordered.extend(api)
+        in_memory.clear()
+        api.clear()
+
+    for f in filters:
+        if is_barrier(f):
+            flush()
+            ordered.append(f)
+        elif not is_in_memory(f):
+            api.append(f)
+        elif reads_resources(f, resources):
+            in_memory.append(f)
+        else:
+            flush()
+            ordered.append(f)
+    flush()
+    return ordered
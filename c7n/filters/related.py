@@ -1,13 +1,125 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 import importlib
+import threading
+from concurrent.futures import as_completed
 from functools import lru_cache
 
-from .core import ValueFilter, OPERATORS
+from .core import Filter, ValueFilter, OPERATORS
+from c7n.cache import RunIndex
 from c7n.query import ChildResourceQuery
 from c7n.utils import jmespath_search
 
 
+class ResourceIndex:
+    """An index of a related resource population by id, with secondary
+    indexes built on demand by jmespath expression.
+    """
+
+    def __init__(self, resources, id_key):
+        self.resources = resources
+        self.ids = {r[id_key]: r for r in resources}
+        self.secondary = {}
+        self.lock = threading.Lock()
+
+    def get(self, ids):
+        return {rid: self.ids[rid] for rid in ids if rid in self.ids}
+
+    def get_secondary(self, expr):
+        """Return a mapping of expression value to resources.
+
+        Expressions returning a list index the resource under each value.
+        """
+        with self.lock:
+            if expr in self.secondary:
+                return self.secondary[expr]
+            index = {}
+            for r in self.resources:
+                values = jmespath_search(expr, r)
+                if values is None:
+                    continue
+                if not isinstance(values, list):
+                    values = [values]
+                for v in values:
+                    index.setdefault(v, []).append(r)
+            self.secondary[expr] = index
+            return index
+
+
+class RelatedIndex(RunIndex):
+    """Run scoped indexes of related resource populations by type, account, region and source."""
+
+    def get(self, manager, build=True):
+        """Get the index for a resource manager's population.
+
+        Returns None if indexing is disabled, or the index has not been
+        built and build is false.
+        """
+        key = self.get_key(manager)
+        if key is None:
+            return None
+
+        def build_index():
+            return ResourceIndex(manager.resources(), manager.get_model().id)
+        return self.get_entry(manager, key, build and build_index or None)
+
+
+related_index = RelatedIndex()
+
+
+class UsageIndex(RunIndex):
+    """Run scoped usage scanner results, ie. the security groups used by enis."""
+
+    def get(self, manager, kind, scan):
+        """Get a scanner's mapping of referenced id to its references."""
+        key = self.get_key(manager, kind)
+        if key is None:
+            return scan()
+        return self.get_entry(manager, key, scan)
+
+    def update(self, entry, refs):
+        """Merge references into an entry, which other threads may be reading."""
+        with self.lock:
+            entry.update(refs)
+
+
+usage_index = UsageIndex()
+
+
+class UsageFilter(Filter):
+    """Filter resources by their usage, ie. references from other resources.
+
+    Subclasses provide named scanners, each returning a mapping of a
+    referenced resource id to the resources, or resource ids, referencing it.
+    Scanners run concurrently, with results shared via the usage index.
+    """
+
+    def get_scanners(self):
+        """Return a sequence of (kind, scanner) pairs."""
+        return ()
+
+    def get_usage(self):
+        """Return a mapping of referenced id to referencing ids by scanner kind."""
+        scanners = self.get_scanners()
+        results = {}
+        with self.executor_factory(max_workers=max(len(scanners), 1)) as w:
+            futures = {
+                w.submit(usage_index.get, self.manager, kind, scanner): kind
+                for kind, scanner in scanners}
+            for f in as_completed(futures):
+                results[futures[f]] = f.result()
+
+        usage = {}
+        for kind, _ in scanners:
+            new_refs = set(results[kind]).difference(usage)
+            for rid, ref_ids in results[kind].items():
+                usage.setdefault(rid, {})[kind] = ref_ids
+            self.log.debug(
+                "%s using %d, new refs %d total %d",
+                kind, len(results[kind]), len(new_refs), len(usage))
+        return usage
+
+
 class RelatedResourceFilter(ValueFilter):
 
     schema_alias = False
@@ -42,6 +154,11 @@ class RelatedResourceFilter(ValueFilter):
         resource_manager = self.get_resource_manager()
         related_ids = self.get_related_ids(resources)
         model = resource_manager.get_model()
+        index = related_index.get(
+            resource_manager, build=len(related_ids) >= self.FetchThreshold)
+        if index is not None:
+            return index.get(related_ids)
+
         if len(related_ids) < self.FetchThreshold:
             related = resource_manager.get_resources(list(related_ids))
         else:
@@ -126,6 +243,12 @@ class RelatedResourceByIdFilter(RelatedResourceFilter):
         resource_manager = self.get_resource_manager()
         related_ids = self.get_related_ids(resources)
 
+        index = related_index.get(resource_manager)
+        if index is not None:
+            related = index.get_secondary(
+                self.RelatedResourceByIdExpression or self.RelatedIdsExpression)
+            return {rid: related[rid] for rid in related_ids if rid in related}
+
         related = {}
         for r in resource_manager.resources():
             matched_vpc = self.get_related_by_ids(r) & related_ids
@@ -98,18 +98,30 @@ class ResourceManager:
             return klass(self.ctx, {'source': self.source_type})
         return klass(self.ctx, data or {})
 
-    def filter_resources(self, resources, event=None):
+    def filter_resources(self, resources, event=None, filters=None):
         original = len(resources)
         if event and event.get('debug', False):
             self.log.info(
                 "Filtering resources using %d filters", len(self.filters))
-        for idx, f in enumerate(self.filters, start=1):
+        profiler = getattr(self.ctx, 'profiler', None)
+        stats = getattr(self.ctx, 'filter_stats', None)
+        if filters is None:
+            filters = self.filters
+        if stats is not None:
+            # Lazy for non circular
+            from c7n.filters.ordering import order_filters
+            filters = order_filters(self, filters, stats, resources)
+        for idx, f in enumerate(filters, start=1):
             if not resources:
                 break
             rcount = len(resources)
 
             with self.ctx.tracer.subsegment("filter:%s" % f.type):
                 resources = f.process(resources, event)
+                if profiler:
+                    profiler.annotate(input=rcount, output=len(resources))
+            if stats is not None:
+                stats.record(stats.get_key(self, f), rcount, len(resources))
 
             if event and event.get('debug', False):
                 self.log.debug(
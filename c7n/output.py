@@ -7,13 +7,16 @@ a variety of sinks.
 See docs/usage/outputs.rst
 
 """
+from collections import Counter
 import contextlib
 import datetime
 import gzip
 import logging
 import os
 import shutil
+import sys
 import tempfile
+import threading
 import time
 import uuid
 
@@ -109,6 +112,146 @@ class NullTracer:
         """
 
 
+class PhaseTimer:
+    """Accumulate wall time spent in each tracer subsegment of a policy execution.
+
+    Subsegments name the phases of execution (resource-fetch,
+    resource-augment, filter, filter:<type>, action:<type>), times are
+    inclusive of nested subsegments, ie. a related resource fetch
+    within a filter. Wraps the configured tracer, and when profiling
+    records each subsegment as a profiler span.
+    """
+
+    def __init__(self, tracer, profiler=None):
+        self.tracer = tracer
+        self.profiler = profiler
+        self.timings = Counter()
+        self.lock = threading.Lock()
+
+    def __getattr__(self, k):
+        return getattr(self.tracer, k)
+
+    @contextlib.contextmanager
+    def subsegment(self, name):
+        start = time.time()
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.profiler:
+                    stack.enter_context(self.profiler.span(name))
+                yield stack.enter_context(self.tracer.subsegment(name))
+        finally:
+            with self.lock:
+                self.timings[name] += time.time() - start
+
+    def get_metadata(self):
+        with self.lock:
+            return {k: round(v, 4) for k, v in self.timings.items()}
+
+    def __enter__(self):
+        self.timings.clear()
+        return self.tracer.__enter__()
+
+    def __exit__(self, exc_type=None, exc_value=None, exc_traceback=None):
+        return self.tracer.__exit__(exc_type, exc_value, exc_traceback)
+
+
+class SpanProfiler:
+    """Record a tree of timed spans for a policy execution.
+
+    Spans cover resource fetch, augment chunks, each filter in the
+    filter tree (with resource input and output counts) and each
+    action. They're written in chrome trace event format, viewable
+    via chrome://tracing, perfetto or speedscope.
+
+    Optionally python stacks of all threads in the process are
+    periodically sampled and aggregated in the folded format used by
+    flamegraph.pl and speedscope.
+    """
+
+    sample_interval = 0.01
+
+    def __init__(self, sample_stacks=False):
+        self.sample_stacks = sample_stacks
+        self.events = []
+        self.samples = Counter()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.sampler = None
+        self.start = time.perf_counter()
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Time a named span, yields a dictionary of span arguments to annotate.
+        """
+        stack = self.local.__dict__.setdefault('stack', [])
+        stack.append(args)
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            stack.pop()
+            with self.lock:
+                self.events.append({
+                    'name': name,
+                    'ph': 'X',
+                    'ts': round((start - self.start) * 1e6, 1),
+                    'dur': round((end - start) * 1e6, 1),
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': args})
+
+    def annotate(self, **args):
+        """Add arguments to the current thread's innermost open span."""
+        stack = getattr(self.local, 'stack', None)
+        if stack:
+            stack[-1].update(args)
+
+    def get_trace(self):
+        with self.lock:
+            events = sorted(self.events, key=lambda e: (e['tid'], e['ts']))
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def get_folded_stacks(self):
+        with self.lock:
+            return "".join(
+                "%s %d\n" % (stack, count) for stack, count in self.samples.most_common())
+
+    def sample(self):
+        sampler = self.sampler and self.sampler.ident
+        for tid, frame in sys._current_frames().items():
+            if tid == sampler:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("%s (%s:%d)" % (
+                    code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+                frame = frame.f_back
+            with self.lock:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def run_sampler(self):
+        while not self.stopped.wait(self.sample_interval):
+            self.sample()
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        if self.sample_stacks:
+            self.stopped.clear()
+            self.sampler = threading.Thread(
+                target=self.run_sampler, name='c7n-profiler', daemon=True)
+            self.sampler.start()
+        return self
+
+    def __exit__(self, exc_type=None, exc_value=None, exc_traceback=None):
+        if self.sampler:
+            self.stopped.set()
+            self.sampler.join()
+            self.sampler = None
+
+
 class DeltaStats:
     """Capture stats (dictionary of string->integer) as a stack.
 
@@ -168,6 +311,11 @@ class NullStats:
         """
         return {}
 
+    def get_detail(self):
+        """Return detailed statistics, ie. per api operation latency histograms.
+        """
+        return {}
+
     def __enter__(self):
         """Push a snapshot
         """
@@ -314,6 +462,40 @@ class LogMetrics(Metrics):
         return res
 
 
+class PolicyLogFilter(logging.Filter):
+    """Isolate a policy's log output when policies execute concurrently.
+
+    Accepts records from the thread executing the policy. Records from
+    threads not executing any policy (ie. executor pools used by
+    filters/actions) can't be attributed when several policies are
+    executing, and are left to the run log rather than written to
+    every policy's log.
+    """
+
+    active = Counter()
+    lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__()
+        self.thread = threading.get_ident()
+
+    def __enter__(self):
+        with self.lock:
+            self.active[self.thread] += 1
+        return self
+
+    def __exit__(self, exc_type=None, exc_value=None, exc_traceback=None):
+        with self.lock:
+            self.active[self.thread] -= 1
+            if self.active[self.thread] <= 0:
+                self.active.pop(self.thread)
+
+    def filter(self, record):
+        if record.thread == self.thread:
+            return True
+        return record.thread not in self.active and len(self.active) == 1
+
+
 class LogOutput:
 
     log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
@@ -322,6 +504,7 @@ class LogOutput:
         self.ctx = ctx
         self.config = config or {}
         self.handler = None
+        self.log_filter = None
 
     def get_handler(self):
         raise NotImplementedError()
@@ -342,6 +525,8 @@ class LogOutput:
             return
         self.handler.setLevel(logging.DEBUG)
         self.handler.setFormatter(logging.Formatter(self.log_format))
+        self.log_filter = PolicyLogFilter().__enter__()
+        self.handler.addFilter(self.log_filter)
         mlog = logging.getLogger('custodian')
         mlog.addHandler(self.handler)
 
@@ -350,6 +535,7 @@ class LogOutput:
             return
         mlog = logging.getLogger('custodian')
         mlog.removeHandler(self.handler)
+        self.log_filter.__exit__()
         self.handler.flush()
         self.handler.close()
 
@@ -361,6 +361,8 @@ class PullMode(PolicyExecutionMode):
             for a in self.policy.resource_manager.actions:
                 s = time.time()
                 with ctx.tracer.subsegment('action:%s' % a.type):
+                    if ctx.profiler:
+                        ctx.profiler.annotate(input=len(resources))
                     results = a.process(resources)
                 self.policy.log.info(
                     "policy:%s action:%s"
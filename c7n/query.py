@@ -5,22 +5,26 @@ Query capability built on skew metamodel
 
 tags_spec -> s3, elb, rds
 """
-from concurrent.futures import as_completed
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import functools
 import itertools
 import json
 from typing import List
 
 import os
+import time
 
 from c7n.actions import ActionRegistry
-from c7n.exceptions import ClientError, ResourceLimitExceeded, PolicyExecutionError
+from c7n.cache import NullCache, RunIndex
+from c7n.exceptions import (
+    ClientError, ResourceLimitExceeded, PolicyExecutionError, PolicyValidationError)
 from c7n.filters import FilterRegistry, MetricsFilter
 from c7n.manager import ResourceManager
 from c7n.registry import PluginRegistry
 from c7n.tags import register_ec2_tags, register_universal_tags, universal_augment
 from c7n.utils import (
-    local_session, generate_arn, get_retry, chunks, camelResource, jmespath_compile, get_path)
+    local_session, generate_arn, get_retry, chunks, camelResource, jmespath_compile, get_path,
+    backoff_delays)
 
 try:
     from botocore.paginate import PageIterator, Paginator
@@ -53,6 +57,8 @@ class ResourceQuery:
                 p.PAGE_ITERATOR_CLS = RetryPageIterator
             results = p.paginate(**params)
             data = results.build_full_result()
+        elif retry:
+            data = retry(getattr(client, enum_op), **params)
         else:
             op = getattr(client, enum_op)
             data = op(**params)
@@ -110,67 +116,132 @@ class ResourceQuery:
         return resources
 
 
+class ParentIdIndex(RunIndex):
+    """Run scoped parent resource ids, shared by the child queries of a run."""
+
+    def get(self, manager, scan):
+        """Get the ids of a parent manager's resources."""
+        key = self.get_key(manager)
+        if key is None:
+            return scan()
+        return self.get_entry(manager, key, scan)
+
+
+parent_id_index = ParentIdIndex()
+
+
 class ChildResourceQuery(ResourceQuery):
     """A resource query for resources that must be queried with parent information.
 
     Several resource types can only be queried in the context of their
     parents identifiers. ie. efs mount targets (parent efs), route53 resource
     records (parent hosted zone), ecs services (ecs cluster).
+
+    Parents are queried concurrently, with children assembled in parent
+    order. A parent removed since being listed contributes no children.
     """
 
     capture_parent_id = False
     parent_key = 'c7n:parent-id'
 
+    executor_factory = ThreadPoolExecutor
+    max_workers = 4
+
     def __init__(self, session_factory, manager):
         self.session_factory = session_factory
         self.manager = manager
 
+    def get_client(self, resource_manager):
+        if resource_manager.get_client:
+            return resource_manager.get_client()
+        m = self.resolve(resource_manager.resource_type)
+        return local_session(self.session_factory).client(m.service)
+
     def filter(self, resource_manager, parent_ids=None, **params):
         """Query a set of resources."""
         m = self.resolve(resource_manager.resource_type)
-        if resource_manager.get_client:
-            client = resource_manager.get_client()
-        else:
-            client = local_session(self.session_factory).client(m.service)
-
         enum_op, path, extra_args = m.enum_spec
         if extra_args:
             params.update(extra_args)
 
-        parent_type, parent_key, annotate_parent = m.parent_spec
-        parents = self.manager.get_resource_manager(parent_type)
+        # Handle a query with parent id
+        parent_type, parent_key, _ = m.parent_spec
+        if parent_key in params:
+            return self._invoke_client_enum(
+                self.get_client(resource_manager), enum_op, params, path)
+
         if not parent_ids:
-            parent_ids = []
-            for p in parents.resources(augment=False):
-                if isinstance(p, str):
-                    parent_ids.append(p)
-                else:
-                    parent_ids.append(p[parents.resource_type.id])
+            parent_ids = self.get_parent_ids(parent_type)
 
         # Bail out with no parent ids...
-        existing_param = parent_key in params
-        if not existing_param and len(parent_ids) == 0:
+        if len(parent_ids) == 0:
             return []
 
-        # Handle a query with parent id
-        if existing_param:
-            return self._invoke_client_enum(client, enum_op, params, path)
-
         # Have to query separately for each parent's children.
+        children = self.get_children_by_parent(resource_manager, parent_ids, params)
         results = []
         for parent_id in parent_ids:
-            merged_params = self.get_parent_parameters(params, parent_id, parent_key)
-            subset = self._invoke_client_enum(
-                client, enum_op, merged_params, path, retry=self.manager.retry)
-            if annotate_parent:
-                for r in subset:
-                    r[self.parent_key] = parent_id
-            if subset and self.capture_parent_id:
-                results.extend([(parent_id, s) for s in subset])
-            elif subset:
-                results.extend(subset)
+            results.extend(children[parent_id])
         return results
 
+    def get_parent_ids(self, parent_type):
+        """Get the parent resource ids.
+
+        Parent ids are shared across the child queries of a run, reusing
+        a related resource index of the parents if one was built.
+        """
+        # Lazy for non circular
+        from c7n.filters.related import related_index
+
+        parents = self.manager.get_resource_manager(parent_type)
+
+        def scan():
+            index = related_index.get(parents, build=False)
+            resources = index and index.resources or parents.resources(augment=False)
+            return [p if isinstance(p, str) else p[parents.resource_type.id]
+                    for p in resources]
+
+        return parent_id_index.get(parents, scan)
+
+    def get_children_by_parent(self, resource_manager, parent_ids, params):
+        """Query the parents concurrently, returning a mapping of parent id to children."""
+        m = self.resolve(resource_manager.resource_type)
+        client = self.get_client(resource_manager)
+        children = {}
+        with self.executor_factory(max_workers=self.max_workers) as w:
+            futures = {
+                w.submit(self.get_children, client, m, params, parent_id): parent_id
+                for parent_id in parent_ids}
+            for f in as_completed(futures):
+                if f.exception():
+                    for pending in futures:
+                        pending.cancel()
+                    raise f.exception()
+                children[futures[f]] = f.result()
+        return children
+
+    def get_children(self, client, model, params, parent_id):
+        enum_op, path, _ = model.enum_spec
+        _, parent_key, annotate_parent = model.parent_spec
+        merged_params = self.get_parent_parameters(params, parent_id, parent_key)
+        try:
+            subset = self._invoke_client_enum(
+                client, enum_op, merged_params, path, retry=self.manager.retry) or []
+        except ClientError as e:
+            code = e.response['Error']['Code']
+            if 'NotFound' not in code and not code.startswith('NoSuch'):
+                raise
+            self.manager.log.warning(
+                "%s parent:%s not found, skipping children",
+                self.manager.type, parent_id)
+            return []
+        if annotate_parent:
+            for r in subset:
+                r[self.parent_key] = parent_id
+        if self.capture_parent_id:
+            return [(parent_id, s) for s in subset]
+        return subset
+
     def get_parent_parameters(self, params, parent_id, parent_key):
         return dict(params, **{parent_key: parent_id})
 
@@ -271,6 +342,9 @@ class DescribeSource:
                 model.service, region_name=self.manager.config.region)
         _augment = functools.partial(
             _augment, self.manager, model, detail_spec, client)
+        profiler = getattr(self.manager.ctx, 'profiler', None)
+        if profiler:
+            _augment = functools.partial(_profile_augment, profiler, _augment)
         with self.manager.executor_factory(
                 max_workers=self.manager.max_workers) as w:
             results = list(w.map(
@@ -298,30 +372,115 @@ class ChildDescribeSource(DescribeSource):
 class ConfigSource:
 
     retry = staticmethod(get_retry(('ThrottlingException',)))
+    batch_size = 100
 
     def __init__(self, manager):
         self.manager = manager
         self.titleCase = self.manager.resource_type.id[0].isupper()
 
     def get_permissions(self):
-        return ["config:GetResourceConfigHistory",
-                "config:ListDiscoveredResources"]
+        perms = ["config:GetResourceConfigHistory",
+                 "config:ListDiscoveredResources",
+                 "config:BatchGetResourceConfig"]
+        if self.is_taggable():
+            perms.append("tag:GetResources")
+        return perms
+
+    def is_taggable(self):
+        return self.manager.action_registry.get('tag') is not None
 
     def get_resources(self, ids, cache=True):
         client = local_session(self.manager.session_factory).client('config')
         results = []
-        m = self.manager.get_model()
-        for i in ids:
-            revisions = self.retry(
-                client.get_resource_config_history,
-                resourceId=i,
-                resourceType=m.config_type,
-                limit=1).get('configurationItems')
-            if not revisions:
-                continue
-            results.append(self.load_resource(revisions[0]))
+        with self.manager.executor_factory(max_workers=self.manager.max_workers) as w:
+            futures = [
+                w.submit(self.get_resource_set, client, id_set)
+                for id_set in chunks(ids, self.batch_size)]
+            errors = []
+            for f in as_completed(futures):
+                if f.exception():
+                    self.manager.log.error(
+                        "Exception getting resources from config \n %s" % (
+                            f.exception()))
+                    errors.append(f.exception())
+                    continue
+                results.extend(f.result())
+        # a partial inventory would silently skip resources, so raise once
+        # all the batches have been collected.
+        if errors:
+            raise errors[0]
         return list(filter(None, results))
 
+    def get_resource_set(self, client, ids):
+        m = self.manager.get_model()
+        try:
+            items = list(self.get_config_items(client, m, ids))
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AccessDeniedException':
+                raise
+            # deployments granted only config:GetResourceConfigHistory keep
+            # working, one history call per resource.
+            self.manager.log.warning(
+                "config:BatchGetResourceConfig denied, loading %d %s resources from history",
+                len(ids), self.manager.__class__.__name__.lower())
+            return [self.get_history_resource(client, m, i) for i in ids]
+
+        results = [self.load_resource(item) for item in items]
+        if self.is_taggable():
+            results = self.get_missing_tags(client, m, items, results)
+        return results
+
+    def get_missing_tags(self, client, model, items, resources):
+        """Fill in tags for taggable resources without tags in their configuration.
+
+        Batch gets return base configuration items, which don't include the
+        item's tags. Tags are fetched in bulk from the tagging api, or loaded
+        from each resource's latest history item when that is denied.
+        """
+        untagged = [
+            (item, r) for item, r in zip(items, resources)
+            if r is not None and 'Tags' not in r]
+        if not untagged:
+            return resources
+        try:
+            universal_augment(self.manager, [r for _, r in untagged])
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'AccessDeniedException':
+                raise
+            self.manager.log.warning(
+                "tag:GetResources denied, loading tags of %d %s resources from history",
+                len(untagged), self.manager.__class__.__name__.lower())
+            resources = [
+                self.get_history_resource(client, model, item['resourceId'])
+                if r is not None and 'Tags' not in r else r
+                for item, r in zip(items, resources)]
+        return resources
+
+    def get_config_items(self, client, model, ids):
+        keys = [{'resourceType': model.config_type, 'resourceId': i} for i in ids]
+        # config returns keys it didn't get to as unprocessed
+        for delay in backoff_delays(1, 8, jitter=True):
+            response = self.retry(client.batch_get_resource_config, resourceKeys=keys)
+            yield from response.get('baseConfigurationItems', ())
+            keys = response.get('unprocessedResourceKeys')
+            if not keys:
+                break
+            time.sleep(delay)
+        if keys:
+            self.manager.log.warning(
+                "config resources not retrieved: %s",
+                ", ".join(k['resourceId'] for k in keys))
+
+    def get_history_resource(self, client, model, resource_id):
+        revisions = self.retry(
+            client.get_resource_config_history,
+            resourceId=resource_id,
+            resourceType=model.config_type,
+            limit=1).get('configurationItems')
+        if not revisions:
+            return None
+        return self.load_resource(revisions[0])
+
     def get_query_params(self, query):
         """Parse config select expression from policy and parameter.
 
@@ -400,31 +559,18 @@ class ConfigSource:
         paginator.PAGE_ITERATOR_CLS = RetryPageIterator
         pages = paginator.paginate(
             resourceType=self.manager.get_model().config_type)
-        results = []
 
-        with self.manager.executor_factory(max_workers=2) as w:
-            ridents = pages.build_full_result()
-            resource_ids = [
-                r['resourceId'] for r in ridents.get('resourceIdentifiers', ())]
-            self.manager.log.debug(
-                "querying %d %s resources",
-                len(resource_ids),
-                self.manager.__class__.__name__.lower())
-
-            for resource_set in chunks(resource_ids, 50):
-                futures = []
-                futures.append(w.submit(self.get_resources, resource_set))
-                for f in as_completed(futures):
-                    if f.exception():
-                        self.manager.log.error(
-                            "Exception getting resources from config \n %s" % (
-                                f.exception()))
-                    results.extend(f.result())
-        return results
-
-    def resources(self, query=None):
-        client = local_session(self.manager.session_factory).client('config')
-        query = self.get_query_params(query)
+        ridents = pages.build_full_result()
+        resource_ids = [
+            r['resourceId'] for r in ridents.get('resourceIdentifiers', ())]
+        self.manager.log.debug(
+            "querying %d %s resources",
+            len(resource_ids),
+            self.manager.__class__.__name__.lower())
+        return self.get_resources(resource_ids)
+
+    def iter_resources(self, client, query):
+        """Yield resources as each page of select results is decoded."""
         pager = Paginator(
             client.select_resource_config,
             {'input_token': 'NextToken', 'output_token': 'NextToken',
@@ -432,18 +578,140 @@ class ConfigSource:
             client.meta.service_model.operation_model('SelectResourceConfig'))
         pager.PAGE_ITERATOR_CLS = RetryPageIterator
 
-        results = []
         for page in pager.paginate(Expression=query['expr']):
-            results.extend([
-                self.load_resource(json.loads(r)) for r in page['Results']])
+            for r in page['Results']:
+                yield self.load_resource(json.loads(r))
+
+    def resources(self, query=None):
+        """Stream the resources of a select query.
+
+        The resource manager filters the stream as it arrives when it can,
+        so a large population needn't be held in memory at once.
+        """
+        client = local_session(self.manager.session_factory).client('config')
+        return self.stream_resources(client, self.get_query_params(query))
+
+    def stream_resources(self, client, query):
+        found = False
+        for resource in self.iter_resources(client, query):
+            found = True
+            yield resource
 
         # Config arbitrarily breaks which resource types its supports for query/select
         # on any given day, if we don't have a user defined query, then fallback
         # to iteration mode.
-        if not results and query == self.get_query_params({}):
-            results = self.get_listed_resources(client)
+        if not found and query == self.get_query_params({}):
+            yield from self.get_listed_resources(client)
+
+    def augment(self, resources):
+        return resources
+
+
+@sources.register('config-aggregator')
+class ConfigAggregatorSource:
+    """Query a resource type across the accounts and regions of a config aggregator.
+
+    The aggregator is named in the policy's query, optionally with a
+    clause to add to the select expression. Resources are loaded as with
+    the resource type's config source, and annotated with their account
+    and region. Only read only policies are supported.
+
+    .. code-block:: yaml
+
+       policies:
+         - name: ec2-public-ip-all-accounts
+           resource: aws.ec2
+           source: config-aggregator
+           query:
+             - aggregator: org-aggregator
+             - clause: "configuration.publicIpAddress LIKE '%'"
+    """
+
+    retry = staticmethod(get_retry(('ThrottlingException',)))
+    batch_size = 100
+    # select expressions are limited to 4096 characters
+    expression_size = 4096
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.config_source = manager.get_source('config')
+
+    def get_permissions(self):
+        return ["config:SelectAggregateResourceConfig"]
+
+    def validate(self):
+        if not self.get_aggregator():
+            raise PolicyValidationError(
+                "policy:%s config-aggregator source requires an aggregator query" % (
+                    self.manager.ctx.policy.name))
+        if self.manager.data.get('actions'):
+            raise PolicyValidationError(
+                "policy:%s config-aggregator source does not support actions" % (
+                    self.manager.ctx.policy.name))
+
+    def get_aggregator(self):
+        for q in self.manager.data.get('query', ()):
+            if 'aggregator' in q:
+                return q['aggregator']
+
+    def get_query_params(self, query):
+        # the aggregator is part of the params, and so of the resource cache key.
+        if query:
+            return dict(query, aggregator=query.get('aggregator') or self.get_aggregator())
+        clauses = [q['clause'] for q in self.manager.data.get('query', ()) if 'clause' in q]
+        s = ("select resourceId, accountId, awsRegion, configuration, supplementaryConfiguration "
+             "where resourceType = '{}'").format(self.manager.resource_type.config_type)
+        if clauses:
+            s += " AND {}".format(clauses.pop())
+        return {'expr': s, 'aggregator': self.get_aggregator()}
+
+    def get_resources(self, ids, cache=True):
+        results = []
+        query = self.get_query_params(None)
+        for id_expr in self.get_id_expressions(query['expr'], ids):
+            results.extend(self.resources(dict(query, expr=id_expr)))
         return results
 
+    def get_id_expressions(self, expr, ids):
+        """Yield select expressions matching batches of ids, within the expression size limit."""
+        prefix = "%s AND resourceId IN (" % expr
+        id_set, size = [], len(prefix) + 1
+        for i in ids:
+            quoted = "'%s'" % i
+            if id_set and (len(id_set) == self.batch_size or
+                           size + len(quoted) + 2 > self.expression_size):
+                yield "%s%s)" % (prefix, ", ".join(id_set))
+                id_set, size = [], len(prefix) + 1
+            size += len(quoted) + (id_set and 2 or 0)
+            id_set.append(quoted)
+        if id_set:
+            yield "%s%s)" % (prefix, ", ".join(id_set))
+
+    def resources(self, query=None):
+        client = local_session(self.manager.session_factory).client('config')
+        return self.iter_resources(client, self.get_query_params(query))
+
+    def iter_resources(self, client, query):
+        """Yield resources as each page of select results is decoded."""
+        pager = Paginator(
+            client.select_aggregate_resource_config,
+            {'input_token': 'NextToken', 'output_token': 'NextToken',
+             'result_key': 'Results'},
+            client.meta.service_model.operation_model('SelectAggregateResourceConfig'))
+        pager.PAGE_ITERATOR_CLS = RetryPageIterator
+
+        for page in pager.paginate(
+                Expression=query['expr'],
+                ConfigurationAggregatorName=query['aggregator']):
+            for r in page['Results']:
+                item = json.loads(r)
+                resource = self.config_source.load_resource(item)
+                if not resource:
+                    continue
+                resource['c7n:account-id'] = item.get('accountId')
+                resource['c7n:region'] = item.get('awsRegion')
+                yield resource
+
     def augment(self, resources):
         return resources
 
@@ -455,6 +723,8 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
     # TODO Check if we can move to describe source
     max_workers = 3
     chunk_size = 20
+    # resources per chunk when filtering a streamed population
+    stream_chunk_size = 1000
 
     _generate_arn = None
 
@@ -478,6 +748,10 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
     def source_type(self):
         return self.data.get('source', 'describe')
 
+    def validate(self):
+        if hasattr(self.source, 'validate'):
+            self.source.validate()
+
     def get_source(self, source_type):
         if source_type in self.source_mapping:
             return self.source_mapping.get(source_type)(self)
@@ -534,26 +808,71 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
                     "%s.%s" % (self.__class__.__module__, self.__class__.__name__),
                     len(resources)))
 
+            resource_count = None
+            filters = None
             if resources is None:
                 if query is None:
                     query = {}
+                stream_filters = self.get_stream_filters()
                 with self.ctx.tracer.subsegment('resource-fetch'):
                     resources = self.source.resources(query)
-                if augment:
+                    if not isinstance(resources, list) and stream_filters:
+                        resources, resource_count = self.filter_stream(
+                            resources, stream_filters, augment)
+                        filters = self.filters[len(stream_filters):]
+                    else:
+                        resources = list(resources)
+                if augment and resource_count is None:
                     with self.ctx.tracer.subsegment('resource-augment'):
                         resources = self.augment(resources)
                     # Don't pollute cache with unaugmented resources.
-                    self._cache.save(cache_key, resources)
+                    self._cache.save_resources(cache_key, resources, self.get_model().id)
 
-        resource_count = len(resources)
+        if resource_count is None:
+            resource_count = len(resources)
         with self.ctx.tracer.subsegment('filter'):
-            resources = self.filter_resources(resources)
+            resources = self.filter_resources(resources, filters=filters)
 
         # Check if we're out of a policies execution limits.
         if self.data == self.ctx.policy.data:
             self.check_resource_limit(len(resources), resource_count)
         return resources
 
+    def get_stream_filters(self):
+        """The leading in memory filters, to apply to a streamed population as it arrives.
+
+        Only when nothing is cached, as the cache holds the full population,
+        and when filters aren't reordered, as selectivity is recorded over
+        the population.
+        """
+        if not isinstance(self._cache, NullCache) or getattr(
+                self.ctx, 'filter_stats', None) is not None:
+            return []
+        # Lazy for non circular
+        from c7n.filters.ordering import is_barrier, is_in_memory
+        stream_filters = []
+        for f in self.filters:
+            if is_barrier(f) or not is_in_memory(f):
+                break
+            stream_filters.append(f)
+        return stream_filters
+
+    def filter_stream(self, resources, filters, augment=True):
+        """Filter a streamed population a chunk at a time.
+
+        Returns the matched resources and the population count. The
+        matches are then run through the rest of the filters as usual.
+        """
+        results, count = [], 0
+        for resource_set in chunks(resources, self.stream_chunk_size):
+            count += len(resource_set)
+            if augment:
+                resource_set = self.augment(resource_set)
+            results.extend(self.filter_resources(resource_set, filters=filters))
+        self.log.debug("Streamed %d %s, %d matched" % (
+            count, self.__class__.__name__.lower(), len(results)))
+        return results, count
+
     def check_resource_limit(self, selection_count, population_count):
         """Check if policy's execution affects more resources then its limit.
 
@@ -567,12 +886,10 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
     def _get_cached_resources(self, ids):
         key = self.get_cache_key(None)
         with self._cache:
-            resources = self._cache.get(key)
+            resources = self._cache.get_resources(key, ids, self.get_model().id)
             if resources is not None:
                 self.log.debug("Using cached results for get_resources")
-                m = self.get_model()
-                id_set = set(ids)
-                return [r for r in resources if r[m.id] in id_set]
+                return resources
         return None
 
     def get_resources(self, ids, cache=True, augment=True):
@@ -586,6 +903,11 @@ class QueryResourceManager(ResourceManager, metaclass=QueryMeta):
             resources = self.source.get_resources(ids)
             if augment:
                 resources = self.augment(resources)
+                if cache:
+                    # refresh any stale copies of these resources in the cache.
+                    with self._cache:
+                        self._cache.update_resources(
+                            self.get_cache_key(None), resources, self.get_model().id)
             return resources
         except ClientError as e:
             self.log.warning("event ids not resolved: %s error:%s" % (ids, e))
@@ -720,6 +1042,11 @@ class ChildResourceManager(QueryResourceManager):
         return self.get_resource_manager(self.resource_type.parent_spec[0])
 
 
+def _profile_augment(profiler, augment, resource_set):
+    with profiler.span('resource-augment:chunk', input=len(resource_set)):
+        return augment(resource_set)
+
+
 def _batch_augment(manager, model, detail_spec, client, resource_set):
     detail_op, param_name, param_key, detail_path, detail_args = detail_spec
     op = getattr(client, detail_op)
@@ -13,7 +13,8 @@ from concurrent.futures import as_completed
 from c7n.actions import BaseAction
 from c7n.exceptions import ClientError, PolicyValidationError
 from c7n.filters import (
-    AgeFilter, ValueFilter, Filter, CrossAccountAccessFilter)
+    AgeFilter, ValueFilter, CrossAccountAccessFilter)
+from c7n.filters.related import UsageFilter
 from c7n.manager import resources
 from c7n.query import QueryResourceManager, DescribeSource, TypeInfo
 from c7n.resolver import ValuesFrom
@@ -566,7 +567,7 @@ class ImageAgeFilter(AgeFilter):
 
 
 @AMI.filter_registry.register('unused')
-class ImageUnusedFilter(Filter):
+class ImageUnusedFilter(UsageFilter):
     """Filters images based on usage
 
     true: image has no instances spawned from it
@@ -591,29 +592,40 @@ class ImageUnusedFilter(Filter):
             self.manager.get_resource_manager(m).get_permissions()
             for m in ('asg', 'launch-config', 'ec2')]))
 
+    def get_scanners(self):
+        return (
+            ("instances", self._pull_ec2_images),
+            ("asgs", self._pull_asg_images),
+        )
+
     def _pull_asg_images(self):
         asgs = self.manager.get_resource_manager('asg').resources()
-        image_ids = set()
+        image_refs = {}
         lcfgs = set(a['LaunchConfigurationName'] for a in asgs if 'LaunchConfigurationName' in a)
         lcfg_mgr = self.manager.get_resource_manager('launch-config')
 
         if lcfgs:
-            image_ids.update([
-                lcfg['ImageId'] for lcfg in lcfg_mgr.resources()
-                if lcfg['LaunchConfigurationName'] in lcfgs])
+            for lcfg in lcfg_mgr.resources():
+                if lcfg['LaunchConfigurationName'] in lcfgs:
+                    image_refs.setdefault(lcfg['ImageId'], []).append(
+                        lcfg['LaunchConfigurationName'])
 
         tmpl_mgr = self.manager.get_resource_manager('launch-template-version')
         for tversion in tmpl_mgr.get_resources(
                 list(tmpl_mgr.get_asg_templates(asgs).keys())):
-            image_ids.add(tversion['LaunchTemplateData'].get('ImageId'))
-        return image_ids
+            image_refs.setdefault(tversion['LaunchTemplateData'].get('ImageId'), []).append(
+                "%s:%s" % (tversion['LaunchTemplateId'], tversion['VersionNumber']))
+        return image_refs
 
     def _pull_ec2_images(self):
         ec2_manager = self.manager.get_resource_manager('ec2')
-        return {i['ImageId'] for i in ec2_manager.resources()}
+        image_refs = {}
+        for i in ec2_manager.resources():
+            image_refs.setdefault(i['ImageId'], []).append(i['InstanceId'])
+        return image_refs
 
     def process(self, resources, event=None):
-        images = self._pull_ec2_images().union(self._pull_asg_images())
+        images = self.get_usage()
         if self.data.get('value', True):
             return [r for r in resources if r['ImageId'] not in images]
         return [r for r in resources if r['ImageId'] in images]
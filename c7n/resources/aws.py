@@ -4,11 +4,13 @@
 from c7n.provider import clouds, Provider
 
 from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import copy
 import datetime
 import itertools
 import logging
+import math
 import os
 import operator
 import socket
@@ -26,6 +28,7 @@ from botocore.validate import ParamValidator
 from boto3.s3.transfer import S3Transfer
 
 from c7n.credentials import SessionFactory
+from c7n.cache import RunIndex, encode
 from c7n.config import Bag
 from c7n.exceptions import InvalidOutputConfig, PolicyValidationError
 from c7n.log import CloudWatchLogHandler
@@ -319,56 +322,123 @@ class Arn(namedtuple('_Arn', (
         return cls(*parts)
 
 
+class ArnTypeIndex:
+    """Resource types by arn service and arn type.
+
+    Built from the provider's resource registry, and rebuilt as
+    resource types are loaded. Resolution matches a linear scan of the
+    registry, the first registered type matching an arn wins.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.size = None
+        self.types = {}
+        self.special = {}
+        self.lock = threading.Lock()
+
+    def build(self):
+        types, special = {}, {}
+        for idx, (type_name, klass) in enumerate(list(self.registry.items())):
+            m = klass.resource_type
+            if type_name in ('rest-account', 'account') or m.arn is False:
+                continue
+            service = m.arn_service or m.service
+            if type_name in ('asg', 'ecs-task'):
+                special.setdefault(service, []).append(
+                    (idx, type_name, "%s%s" % (m.arn_type, m.arn_separator)))
+            if m.arn_type is not None:
+                types.setdefault((service, m.arn_type), (idx, type_name))
+            if m.arn_service == service and m.arn_type == "":
+                special.setdefault(service, []).append((idx, type_name, None))
+        self.types, self.special = types, special
+
+    def resolve(self, arn):
+        with self.lock:
+            if self.size != len(self.registry):
+                self.build()
+                self.size = len(self.registry)
+            types, special = self.types, self.special
+        candidates = [types.get((arn.service, arn.resource_type), (math.inf, None))]
+        for idx, type_name, prefix in special.get(arn.service, ()):
+            if prefix is None or (arn.resource_type and prefix in arn.resource_type):
+                candidates.append((idx, type_name))
+        return min(candidates)[1]
+
+
+class ArnCache(RunIndex):
+    """Run scoped resolved arns per account and region."""
+
+    def get_key(self, manager):
+        key = super().get_key(manager)
+        if key is None:
+            return None
+        cache_key = manager.get_cache_key(None)
+        return encode((cache_key['account'], cache_key['region']))
+
+    def get(self, manager):
+        """Get the arn to resource mapping for a manager's account and region.
+
+        Returns None if caching is disabled.
+        """
+        key = self.get_key(manager)
+        if key is None:
+            return None
+        return self.get_entry(manager, key, dict)
+
+
+arn_cache = ArnCache()
+
+
 class ArnResolver:
 
+    executor_factory = ThreadPoolExecutor
+    max_workers = 4
+
     def __init__(self, manager):
         self.manager = manager
+        self.cache = arn_cache.get(manager)
+        if self.cache is None:
+            self.cache = {}
 
     def resolve(self, arns):
-        arns = map(Arn.parse, arns)
-        a_service = operator.attrgetter('service')
-        a_resource = operator.attrgetter('resource_type')
-        kfunc = lambda a: (a_service(a), a_resource(a))  # noqa
-        arns = sorted(arns, key=kfunc)
-        results = {}
-        for (service, arn_type), arn_set in itertools.groupby(arns, key=kfunc):
-            arn_set = list(arn_set)
-            rtype = ArnResolver.resolve_type(arn_set[0])
-            rmanager = self.manager.get_resource_manager(rtype)
-            if rtype == 'sns':
-                resources = rmanager.get_resources(
-                    [rarn.arn for rarn in arn_set])
-            else:
-                resources = rmanager.get_resources(
-                    [rarn.resource for rarn in arn_set])
-            for rarn, r in zip(rmanager.get_arns(resources), resources):
-                results[rarn] = r
-
-            for rarn in arn_set:
-                if rarn.arn not in results:
-                    results[rarn.arn] = None
+        arns = [Arn.parse(a) for a in arns]
+        results = {a.arn: self.cache[a.arn] for a in arns if a.arn in self.cache}
+        groups = {}
+        for a in arns:
+            if a.arn not in results:
+                groups.setdefault((a.service, a.resource_type), {})[a.arn] = a
+
+        if len(groups) > 1:
+            with self.executor_factory(max_workers=self.max_workers) as w:
+                resolved = list(w.map(self.resolve_group, groups.values()))
+        else:
+            resolved = [self.resolve_group(g) for g in groups.values()]
+
+        for group_results in resolved:
+            self.cache.update(group_results)
+            results.update(group_results)
+        return results
+
+    def resolve_group(self, arn_set):
+        arn_set = list(arn_set.values())
+        rtype = ArnResolver.resolve_type(arn_set[0])
+        rmanager = self.manager.get_resource_manager(rtype)
+        if rtype == 'sns':
+            resources = rmanager.get_resources(
+                [rarn.arn for rarn in arn_set])
+        else:
+            resources = rmanager.get_resources(
+                [rarn.resource for rarn in arn_set])
+        results = dict(zip(rmanager.get_arns(resources), resources))
+        for rarn in arn_set:
+            if rarn.arn not in results:
+                results[rarn.arn] = None
         return results
 
     @staticmethod
     def resolve_type(arn):
-        arn = Arn.parse(arn)
-
-        # this would benefit from a class cache {service} -> rtypes
-        for type_name, klass in AWS.resources.items():
-            if type_name in ('rest-account', 'account') or klass.resource_type.arn is False:
-                continue
-            if arn.service != (klass.resource_type.arn_service or klass.resource_type.service):
-                continue
-            if (type_name in ('asg', 'ecs-task') and
-                    "%s%s" % (klass.resource_type.arn_type, klass.resource_type.arn_separator)
-                    in arn.resource_type):
-                return type_name
-            elif (klass.resource_type.arn_type is not None and
-                    klass.resource_type.arn_type == arn.resource_type):
-                return type_name
-            elif (klass.resource_type.arn_service == arn.service and
-                    klass.resource_type.arn_type == ""):
-                return type_name
+        return arn_type_index.resolve(Arn.parse(arn))
 
 
 @metrics_outputs.register('aws')
@@ -647,12 +717,67 @@ class XrayTracer:
         self.metadata.clear()
 
 
+class ApiOperationStats:
+    """Latency histogram, retry, throttle and bytes received for an operation.
+
+    Latencies are bucketed logarithmically, so percentiles are
+    approximate to within 5%.
+    """
+
+    bucket_base = 1.05
+
+    def __init__(self):
+        self.buckets = Counter()
+        self.calls = 0
+        self.retries = 0
+        self.throttles = 0
+        self.bytes_received = 0
+
+    def record(self, latency=None, retries=0, size=0):
+        self.calls += 1
+        self.retries += retries
+        self.bytes_received += size
+        if latency is not None:
+            self.buckets[
+                math.floor(math.log(max(latency * 1000, 0.1), self.bucket_base))] += 1
+
+    def percentile(self, p):
+        target = sum(self.buckets.values()) * p / 100.0
+        seen = 0
+        for b in sorted(self.buckets):
+            seen += self.buckets[b]
+            if seen >= target:
+                return round(self.bucket_base ** (b + 1), 2)
+        return None
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'throttles': self.throttles,
+            'bytes_received': self.bytes_received,
+            'latency_ms': {
+                'p50': self.percentile(50),
+                'p95': self.percentile(95),
+                'p99': self.percentile(99)},
+        }
+
+
 @api_stats_outputs.register('aws')
 class ApiStats(DeltaStats):
 
+    context_key = 'c7n-api-stats-start'
+    events = (
+        ('before-call.*.*', '_start', 'c7n-api-stats-start'),
+        ('after-call.*.*', '_record', 'c7n-api-stats'),
+        ('needs-retry.*.*', '_observe', 'c7n-api-stats-retry'),
+    )
+
     def __init__(self, ctx, config=None):
         super(ApiStats, self).__init__(ctx, config)
         self.api_calls = Counter()
+        self.operations = {}
+        self.lock = threading.Lock()
 
     def get_snapshot(self):
         return dict(self.api_calls)
@@ -660,6 +785,16 @@ class ApiStats(DeltaStats):
     def get_metadata(self):
         return self.get_snapshot()
 
+    def get_detail(self):
+        return {k: v.as_dict() for k, v in sorted(self.operations.items())}
+
+    def get_operation(self, model):
+        key = "%s.%s" % (model.service_model.endpoint_prefix, model.name)
+        with self.lock:
+            if key not in self.operations:
+                self.operations[key] = ApiOperationStats()
+            return key, self.operations[key]
+
     def __enter__(self):
         if isinstance(self.ctx.session_factory, credentials.SessionFactory):
             self.ctx.session_factory.set_subscribers((self,))
@@ -671,20 +806,43 @@ class ApiStats(DeltaStats):
 
         # With cached sessions, we need to unregister any events subscribers
         # on extant sessions to allow for the next registration.
-        utils.local_session(self.ctx.session_factory).events.unregister(
-            'after-call.*.*', self._record, unique_id='c7n-api-stats')
+        events = utils.local_session(self.ctx.session_factory).events
+        for event, handler, unique_id in self.events:
+            events.unregister(event, getattr(self, handler), unique_id=unique_id)
 
         self.ctx.metrics.put_metric(
             "ApiCalls", sum(self.api_calls.values()), "Count")
+        for metric, attr in (('ApiRetries', 'retries'), ('ApiThrottles', 'throttles')):
+            value = sum(getattr(o, attr) for o in self.operations.values())
+            if value:
+                self.ctx.metrics.put_metric(metric, value, "Count")
         self.pop_snapshot()
 
     def __call__(self, s):
-        s.events.register(
-            'after-call.*.*', self._record, unique_id='c7n-api-stats')
-
-    def _record(self, http_response, parsed, model, **kwargs):
-        self.api_calls["%s.%s" % (
-            model.service_model.endpoint_prefix, model.name)] += 1
+        for event, handler, unique_id in self.events:
+            s.events.register(event, getattr(self, handler), unique_id=unique_id)
+
+    def _start(self, context, **kwargs):
+        context[self.context_key] = time.time()
+
+    def _record(self, http_response, parsed, model, context=None, **kwargs):
+        key, stats = self.get_operation(model)
+        self.api_calls[key] += 1
+        start = context and context.get(self.context_key)
+        latency = time.time() - start if start else None
+        metadata = parsed.get('ResponseMetadata', {})
+        size = metadata.get('HTTPHeaders', {}).get('content-length') or 0
+        with self.lock:
+            stats.record(latency, metadata.get('RetryAttempts', 0), int(size))
+
+    def _observe(self, operation, response=None, **kwargs):
+        if response is None:
+            return
+        code = response[1].get('Error', {}).get('Code')
+        if code in credentials.ApiRateLimiter.throttle_codes:
+            _, stats = self.get_operation(operation)
+            with self.lock:
+                stats.throttles += 1
 
 
 @blob_outputs.register('s3')
@@ -739,6 +897,11 @@ class AWS(Provider):
         _default_account_id(options)
         _default_bucket_region(options)
 
+        if options.get('api_concurrency'):
+            credentials.api_concurrency.limit = options.api_concurrency
+        if options.get('api_rate'):
+            credentials.api_rate_limiter.configure(options.api_rate)
+
         if options.tracer and options.tracer.startswith('xray') and HAVE_XRAY:
             XrayTracer.initialize(utils.parse_url_config(options.tracer))
         return options
@@ -812,6 +975,12 @@ class AWS(Provider):
                     Policy(p.data, options_copy,
                            session_factory=policy_collection.session_factory()))
 
+        if options.get('bulk_tags'):
+            # Lazy for non circular
+            from c7n.tags import tag_index
+            tag_index.add_types(
+                p.resource_manager.get_model() for p in policies if p.resource_manager)
+
         return PolicyCollection(
             # order policies by region to minimize local session invalidation.
             # note relative ordering of policies must be preserved, python sort
@@ -820,6 +989,9 @@ class AWS(Provider):
             options)
 
 
+arn_type_index = ArnTypeIndex(AWS.resources)
+
+
 def join_output(output_dir, suffix):
     if '{region}' in output_dir:
         return output_dir.rstrip('/')
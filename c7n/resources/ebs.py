@@ -16,7 +16,7 @@ from c7n.filters import (
     CrossAccountAccessFilter, Filter, AgeFilter, ValueFilter,
     ANNOTATION_KEY, ListItemFilter)
 from c7n.filters.health import HealthEventFilter
-from c7n.filters.related import RelatedResourceFilter
+from c7n.filters.related import RelatedResourceFilter, UsageFilter
 
 from c7n.manager import resources
 from c7n.resources.kms import ResourceKmsKeyAlias
@@ -261,7 +261,7 @@ class SnapshotCrossAccountAccess(CrossAccountAccessFilter):
 
 
 @Snapshot.filter_registry.register('unused')
-class SnapshotUnusedFilter(Filter):
+class SnapshotUnusedFilter(UsageFilter):
     """Filters snapshots based on usage
 
     true: snapshot is not used by launch-template, launch-config, or ami.
@@ -287,37 +287,46 @@ class SnapshotUnusedFilter(Filter):
             self.manager.get_resource_manager(m).get_permissions()
             for m in ('asg', 'launch-config', 'ami')]))
 
+    def get_scanners(self):
+        return (
+            ("asgs", self._pull_asg_snapshots),
+            ("amis", self._pull_ami_snapshots),
+        )
+
+    @staticmethod
+    def add_refs(snap_refs, block_devices, ref_id):
+        for bd in block_devices or ():
+            if 'Ebs' in bd and 'SnapshotId' in bd['Ebs']:
+                snap_refs.setdefault(bd['Ebs']['SnapshotId'], []).append(ref_id)
+
     def _pull_asg_snapshots(self):
         asgs = self.manager.get_resource_manager('asg').resources()
-        snap_ids = set()
+        snap_refs = {}
         lcfgs = set(a['LaunchConfigurationName'] for a in asgs if 'LaunchConfigurationName' in a)
         lcfg_mgr = self.manager.get_resource_manager('launch-config')
 
         if lcfgs:
             for lc in lcfg_mgr.resources():
-                for b in lc.get('BlockDeviceMappings'):
-                    if 'Ebs' in b and 'SnapshotId' in b['Ebs']:
-                        snap_ids.add(b['Ebs']['SnapshotId'])
+                self.add_refs(
+                    snap_refs, lc.get('BlockDeviceMappings'), lc['LaunchConfigurationName'])
 
         tmpl_mgr = self.manager.get_resource_manager('launch-template-version')
         for tversion in tmpl_mgr.get_resources(
                 list(tmpl_mgr.get_asg_templates(asgs).keys())):
-            for bd in tversion['LaunchTemplateData'].get('BlockDeviceMappings', ()):
-                if 'Ebs' in bd and 'SnapshotId' in bd['Ebs']:
-                    snap_ids.add(bd['Ebs']['SnapshotId'])
-        return snap_ids
+            self.add_refs(
+                snap_refs, tversion['LaunchTemplateData'].get('BlockDeviceMappings'),
+                "%s:%s" % (tversion['LaunchTemplateId'], tversion['VersionNumber']))
+        return snap_refs
 
     def _pull_ami_snapshots(self):
         amis = self.manager.get_resource_manager('ami').resources()
-        ami_snaps = set()
+        snap_refs = {}
         for i in amis:
-            for dev in i.get('BlockDeviceMappings'):
-                if 'Ebs' in dev and 'SnapshotId' in dev['Ebs']:
-                    ami_snaps.add(dev['Ebs']['SnapshotId'])
-        return ami_snaps
+            self.add_refs(snap_refs, i.get('BlockDeviceMappings'), i['ImageId'])
+        return snap_refs
 
     def process(self, resources, event=None):
-        snaps = self._pull_asg_snapshots().union(self._pull_ami_snapshots())
+        snaps = self.get_usage()
         if self.data.get('value', True):
             return [r for r in resources if r['SnapshotId'] not in snaps]
         return [r for r in resources if r['SnapshotId'] in snaps]
@@ -33,6 +33,7 @@ import itertools
 import logging
 import math
 import os
+import re
 import time
 import ssl
 
@@ -56,7 +57,7 @@ from c7n.filters import (
     ValueFilter, ListItemFilter)
 from .aws import shape_validate
 import c7n.filters.policystatement as polstmt_filter
-from c7n.manager import resources
+from c7n.manager import iter_filters, resources
 from c7n.output import NullBlobOutput
 from c7n import query
 from c7n.resources.securityhub import PostFinding
@@ -79,11 +80,13 @@ MAX_COPY_SIZE = 1024 * 1024 * 1024 * 2
 
 class DescribeS3(query.DescribeSource):
 
-    def augment(self, buckets):
+    def augment(self, buckets, full_augment=False):
+        assemble = functools.partial(
+            assemble_bucket, keys=self.manager.get_augment_keys(full_augment))
         with self.manager.executor_factory(
                 max_workers=min((10, len(buckets) + 1))) as w:
             results = w.map(
-                assemble_bucket,
+                assemble,
                 zip(itertools.repeat(self.manager.session_factory), buckets))
             results = list(filter(None, results))
             return results
@@ -399,6 +402,92 @@ class S3(query.QueryResourceManager):
         perms.extend([n[-1] for n in S3_AUGMENT_TABLE])
         return perms
 
+    def get_resources(self, ids, cache=True, augment=True):
+        # buckets fetched by id (ie. event modes) are fully augmented, as
+        # they are passed on to consumers outside of the policy.
+        if self.source_type != 'describe':
+            return super().get_resources(ids, cache, augment)
+        if not ids:
+            return []
+        cache_key = self.get_cache_key(None, full_augment=True)
+        if cache:
+            with self._cache:
+                resources = self._cache.get_resources(cache_key, ids, self.get_model().id)
+            if resources is not None:
+                self.log.debug("Using cached results for get_resources")
+                return resources
+        try:
+            resources = self.source.get_resources(ids)
+        except ClientError as e:
+            self.log.warning("event ids not resolved: %s error:%s" % (ids, e))
+            return []
+        if augment:
+            resources = self.source.augment(resources, full_augment=True)
+            if cache:
+                with self._cache:
+                    self._cache.update_resources(cache_key, resources, self.get_model().id)
+        return resources
+
+    def get_cache_key(self, query, full_augment=False):
+        key = super().get_cache_key(query)
+        if self.source_type == 'describe':
+            # partially augmented buckets must not be served to policies
+            # needing other augments.
+            augment_keys = self.get_augment_keys(full_augment)
+            key['augment'] = augment_keys and sorted(augment_keys)
+        return key
+
+    def get_augment_keys(self, full_augment=False):
+        """Return the bucket augment keys read by the policy's filters and actions.
+
+        Returns None when the full augmentation is needed, which is the case
+        when requested (ie. buckets fetched by id), for inventory policies
+        without filters or actions, managers not executing a policy (ie.
+        related resource lookups), and for any filter or action we don't
+        know the dependencies of.
+        """
+        if full_augment:
+            return None
+        if self.data != self.ctx.policy.data or not (self.filters or self.actions):
+            return None
+        keys = {'Location'}
+        for f in iter_filters(self.filters):
+            if f.type == 'value':
+                f_keys = get_value_filter_augment_keys(f.data)
+            else:
+                f_keys = S3_AUGMENT_DEPENDENCIES.get(f.type)
+            if f_keys is None:
+                return None
+            keys.update(f_keys)
+        for a in self.actions:
+            a_keys = S3_AUGMENT_DEPENDENCIES.get(a.type)
+            if a_keys is None:
+                return None
+            keys.update(a_keys)
+        return keys
+
+
+def get_value_filter_augment_keys(data):
+    """Return the augment keys a value filter reads, None if indeterminate."""
+    if data.get('value_type') == 'expr' or 'value_path' in data:
+        return None
+    if len(data) == 1 and 'type' not in data:
+        # shorthand key: value syntax
+        [key] = data.keys()
+    else:
+        key = data.get('key', '')
+    if key.startswith('tag:'):
+        return ('Tags',)
+    head = re.match(r'^[A-Za-z0-9_:\-]+(?=$|[.\[])', key)
+    if head is None:
+        return None
+    head = head.group()
+    if head in {m[1] for m in S3_AUGMENT_TABLE}:
+        return (head,)
+    elif head in S3_LIST_KEYS or head.startswith('c7n:'):
+        return ()
+    return None
+
 
 S3_CONFIG_SUPPLEMENT_NULL_MAP = {
     'BucketLoggingConfiguration': u'{"destinationBucketName":null,"logFilePrefix":null}',
@@ -431,9 +520,64 @@ S3_AUGMENT_TABLE = (
 )
 
 
-def assemble_bucket(item):
+# Keys of a bucket as returned by list buckets.
+S3_LIST_KEYS = ('Name', 'CreationDate', 'BucketRegion')
+
+# Bucket augment keys read by filters and actions, by type. Filters and
+# actions not listed here (and value filters on unknown keys) require a
+# bucket's full augmentation.
+S3_AUGMENT_DEPENDENCIES = {
+    'and': (),
+    'or': (),
+    'not': (),
+    'event': (),
+    'metrics': (),
+    'marked-for-op': ('Tags',),
+    'global-grants': ('Acl', 'Website'),
+    'cross-account': ('Policy',),
+    'has-statement': ('Policy',),
+    'no-encryption-statement': ('Policy',),
+    'missing-statement': ('Policy',),
+    'missing-policy-statement': ('Policy',),
+    'bucket-notification': ('Notification',),
+    'bucket-logging': ('Logging',),
+    'bucket-replication': ('Replication',),
+    'bucket-encryption': (),
+    'check-public-block': (),
+    'data-events': (),
+    'intelligent-tiering': (),
+    'inventory': (),
+    'ownership': (),
+    # actions, notify and others passing resources on outside of the
+    # policy need the full augmentation.
+    'tag': ('Tags',),
+    'mark-for-op': ('Tags',),
+    'remove-tag': ('Tags',),
+    'unmark': ('Tags',),
+    'delete-global-grants': ('Acl', 'Website'),
+    'set-statements': ('Policy',),
+    'remove-statements': ('Policy',),
+    'encryption-policy': ('Policy',),
+    'toggle-logging': ('Logging',),
+    'toggle-versioning': ('Versioning',),
+    'delete-bucket-notification': ('Notification',),
+    'configure-lifecycle': ('Lifecycle',),
+    'encrypt-keys': ('Versioning',),
+    'delete': ('Replication', 'Versioning'),
+    'remove-website-hosting': (),
+    'set-bucket-encryption': (),
+    'set-intelligent-tiering': (),
+    'set-inventory': (),
+    'set-public-block': (),
+    'set-replication': (),
+}
+
+
+def assemble_bucket(item, keys=None):
     """Assemble a document representing all the config state around a bucket.
 
+    If keys is given, only the augments for those bucket keys are fetched.
+
     TODO: Refactor this, the logic here feels quite muddled.
     """
     factory, b = item
@@ -441,7 +585,7 @@ def assemble_bucket(item):
     c = s.client('s3')
     # Bucket Location, Current Client Location, Default Location
     b_location = c_location = location = "us-east-1"
-    methods = list(S3_AUGMENT_TABLE)
+    methods = [m for m in S3_AUGMENT_TABLE if keys is None or m[1] in keys]
     for minfo in methods:
         m, k, default, select = minfo[:4]
         try:
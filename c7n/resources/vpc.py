@@ -9,7 +9,8 @@ from c7n.exceptions import PolicyValidationError, ClientError
 from c7n.filters import Filter, ValueFilter, MetricsFilter, ListItemFilter
 import c7n.filters.vpc as net_filters
 from c7n.filters.iamaccess import CrossAccountAccessFilter
-from c7n.filters.related import RelatedResourceFilter, RelatedResourceByIdFilter
+from c7n.filters.related import (
+    RelatedResourceFilter, RelatedResourceByIdFilter, UsageFilter, usage_index)
 from c7n.filters.revisions import Diff
 from c7n import query, resolver
 from c7n.manager import resources
@@ -940,9 +941,7 @@ class SecurityGroupPatch:
                        IpPermissions=[r for r in delta['added']])
 
 
-class SGUsage(Filter):
-
-    nics = ()
+class SGUsage(UsageFilter):
 
     def get_permissions(self):
         return list(itertools.chain(
@@ -954,14 +953,18 @@ class SGUsage(Filter):
     def filter_peered_refs(self, resources):
         if not resources:
             return resources
-        # Check that groups are not referenced across accounts
+        # Check that groups are not referenced across accounts, lookups
+        # are shared via the usage index as with the scanners.
+        peered_refs = usage_index.get(self.manager, 'peered-refs', dict)
+        group_ids = [r['GroupId'] for r in resources if r['GroupId'] not in peered_refs]
         client = local_session(self.manager.session_factory).client('ec2')
-        peered_ids = set()
-        for resource_set in chunks(resources, 200):
+        refs = {gid: [] for gid in group_ids}
+        for resource_set in chunks(group_ids, 200):
             for sg_ref in client.describe_security_group_references(
-                    GroupId=[r['GroupId'] for r in resource_set]
-            )['SecurityGroupReferenceSet']:
-                peered_ids.add(sg_ref['GroupId'])
+                    GroupId=resource_set)['SecurityGroupReferenceSet']:
+                refs[sg_ref['GroupId']].append(sg_ref['ReferencingVpcId'])
+        usage_index.update(peered_refs, refs)
+        peered_ids = {r['GroupId'] for r in resources if peered_refs.get(r['GroupId'])}
         self.log.debug(
             "%d of %d groups w/ peered refs", len(peered_ids), len(resources))
         return [r for r in resources if r['GroupId'] not in peered_ids]
@@ -978,77 +981,78 @@ class SGUsage(Filter):
         )
 
     def scan_groups(self):
-        used = set()
-        for kind, scanner in self.get_scanners():
-            sg_ids = scanner()
-            new_refs = sg_ids.difference(used)
-            used = used.union(sg_ids)
-            self.log.debug(
-                "%s using %d sgs, new refs %s total %s",
-                kind, len(sg_ids), len(new_refs), len(used))
+        return set(self.get_usage())
 
-        return used
+    @staticmethod
+    def add_refs(sg_refs, sg_ids, ref_id):
+        for sg_id in sg_ids or ():
+            sg_refs.setdefault(sg_id, []).append(ref_id)
 
     def get_launch_config_sgs(self):
         # Note assuming we also have launch config garbage collection
         # enabled.
-        sg_ids = set()
+        sg_refs = {}
         for cfg in self.manager.get_resource_manager('launch-config').resources():
-            for g in cfg['SecurityGroups']:
-                sg_ids.add(g)
-            for g in cfg['ClassicLinkVPCSecurityGroups']:
-                sg_ids.add(g)
-        return sg_ids
+            self.add_refs(sg_refs, cfg['SecurityGroups'], cfg['LaunchConfigurationName'])
+            self.add_refs(
+                sg_refs, cfg['ClassicLinkVPCSecurityGroups'], cfg['LaunchConfigurationName'])
+        return sg_refs
 
     def get_lambda_sgs(self):
-        sg_ids = set()
+        sg_refs = {}
         for func in self.manager.get_resource_manager('lambda').resources(augment=False):
             if 'VpcConfig' not in func:
                 continue
-            for g in func['VpcConfig']['SecurityGroupIds']:
-                sg_ids.add(g)
-        return sg_ids
+            self.add_refs(sg_refs, func['VpcConfig']['SecurityGroupIds'], func['FunctionName'])
+        return sg_refs
 
     def get_eni_sgs(self):
-        sg_ids = set()
-        self.nics = self.manager.get_resource_manager('eni').resources()
-        for nic in self.nics:
-            for g in nic['Groups']:
-                sg_ids.add(g['GroupId'])
-        return sg_ids
+        # enis are referenced by record rather than id, so the used
+        # filter can annotate their attributes from the usage index.
+        return self.get_nic_refs(self.manager.get_resource_manager('eni').resources())
+
+    @classmethod
+    def get_nic_refs(cls, nics):
+        sg_refs = {}
+        for nic in nics:
+            cls.add_refs(sg_refs, [g['GroupId'] for g in nic['Groups']], nic)
+        return sg_refs
 
     def get_codebuild_sgs(self):
-        sg_ids = set()
+        sg_refs = {}
         for cb in self.manager.get_resource_manager('codebuild').resources():
-            sg_ids |= set(cb.get('vpcConfig', {}).get('securityGroupIds', []))
-        return sg_ids
+            self.add_refs(
+                sg_refs, cb.get('vpcConfig', {}).get('securityGroupIds', []), cb['name'])
+        return sg_refs
 
     def get_sg_refs(self):
-        sg_ids = set()
+        sg_refs = {}
         for sg in self.manager.get_resource_manager('security-group').resources():
             for perm_type in ('IpPermissions', 'IpPermissionsEgress'):
                 for p in sg.get(perm_type, []):
-                    for g in p.get('UserIdGroupPairs', ()):
-                        # self references aren't usage.
-                        if g['GroupId'] != sg['GroupId']:
-                            sg_ids.add(g['GroupId'])
-        return sg_ids
+                    # self references aren't usage.
+                    self.add_refs(sg_refs, [
+                        g['GroupId'] for g in p.get('UserIdGroupPairs', ())
+                        if g['GroupId'] != sg['GroupId']], sg['GroupId'])
+        return {sg_id: sorted(set(refs)) for sg_id, refs in sg_refs.items()}
 
     def get_ecs_cwe_sgs(self):
-        sg_ids = set()
+        sg_refs = {}
         expr = jmespath_compile(
             'EcsParameters.NetworkConfiguration.awsvpcConfiguration.SecurityGroups[]')
         for rule in self.manager.get_resource_manager(
                 'event-rule-target').resources(augment=False):
-            ids = expr.search(rule)
-            if ids:
-                sg_ids.update(ids)
-        return sg_ids
+            self.add_refs(sg_refs, expr.search(rule), rule.get('Arn'))
+        return sg_refs
 
     def get_batch_sgs(self):
-        expr = jmespath_compile('[].computeResources.securityGroupIds[]')
-        resources = self.manager.get_resource_manager('aws.batch-compute').resources(augment=False)
-        return set(expr.search(resources) or [])
+        sg_refs = {}
+        for env in self.manager.get_resource_manager(
+                'aws.batch-compute').resources(augment=False):
+            self.add_refs(
+                sg_refs, env.get('computeResources', {}).get('securityGroupIds'),
+                env['computeEnvironmentName'])
+        return sg_refs
 
 
 @SecurityGroup.filter_registry.register('unused')
@@ -1143,30 +1147,31 @@ class UsedSecurityGroup(SGUsage):
     interface_type_key = 'c7n:InterfaceTypes'
     interface_resource_type_key = 'c7n:InterfaceResourceTypes'
 
-    def _get_eni_attributes(self):
+    def _get_eni_attributes(self, nic_refs):
         group_enis = {}
-        for nic in self.nics:
-            instance_owner_id, interface_resource_type = '', ''
-            if nic['Status'] == 'in-use':
-                if nic.get('Attachment') and 'InstanceOwnerId' in nic['Attachment']:
-                    instance_owner_id = nic['Attachment']['InstanceOwnerId']
-                interface_resource_type = get_eni_resource_type(nic)
-            interface_type = nic.get('InterfaceType')
-            for g in nic['Groups']:
-                group_enis.setdefault(g['GroupId'], []).append({
+        for sg_id, nics in nic_refs.items():
+            for nic in nics:
+                instance_owner_id, interface_resource_type = '', ''
+                if nic['Status'] == 'in-use':
+                    if nic.get('Attachment') and 'InstanceOwnerId' in nic['Attachment']:
+                        instance_owner_id = nic['Attachment']['InstanceOwnerId']
+                    interface_resource_type = get_eni_resource_type(nic)
+                group_enis.setdefault(sg_id, []).append({
                     'InstanceOwnerId': instance_owner_id,
-                    'InterfaceType': interface_type,
+                    'InterfaceType': nic.get('InterfaceType'),
                     'InterfaceResourceType': interface_resource_type
                 })
         return group_enis
 
     def process(self, resources, event=None):
-        used = self.scan_groups()
+        usage = self.get_usage()
+        used = set(usage)
         unused = [
             r for r in resources
             if r['GroupId'] not in used and 'VpcId' in r]
         unused = {g['GroupId'] for g in self.filter_peered_refs(unused)}
-        group_enis = self._get_eni_attributes()
+        group_enis = self._get_eni_attributes(
+            {sg_id: refs['nics'] for sg_id, refs in usage.items() if 'nics' in refs})
         for r in resources:
             enis = group_enis.get(r['GroupId'], ())
             r[self.instance_owner_id_key] = list({
@@ -1444,6 +1449,7 @@ class SGPermission(Filter):
 
     def process(self, resources, event=None):
         self.vfilters = []
+        self.cidr_vfilters = {}
         fattrs = list(sorted(self.perm_attrs.intersection(self.data.keys())))
         self.ports = 'Ports' in self.data and self.data['Ports'] or ()
         self.only_ports = (
@@ -1484,15 +1490,16 @@ class SGPermission(Filter):
         if not ip_perms:
             return False
 
-        match_range = self.data[cidr_key]
-
-        if isinstance(match_range, dict):
-            match_range['key'] = cidr_type
-        else:
-            match_range = {cidr_type: match_range}
-
-        vf = ValueFilter(match_range, self.manager)
-        vf.annotate = False
+        # built once per filter execution, so cidr sentinels are parsed once.
+        vf = self.cidr_vfilters.get(cidr_key)
+        if vf is None:
+            match_range = self.data[cidr_key]
+            if isinstance(match_range, dict):
+                match_range['key'] = cidr_type
+            else:
+                match_range = {cidr_type: match_range}
+            vf = self.cidr_vfilters[cidr_key] = ValueFilter(match_range, self.manager)
+            vf.annotate = False
 
         for ip_range in ip_perms:
             found = vf(ip_range)
@@ -2794,7 +2801,7 @@ class KeyPair(query.QueryResourceManager):
 
 
 @KeyPair.filter_registry.register('unused')
-class UnusedKeyPairs(Filter):
+class UnusedKeyPairs(UsageFilter):
     """Filter for used or unused keys.
 
     The default is unused but can be changed by using the state property.
@@ -2822,29 +2829,40 @@ class UnusedKeyPairs(Filter):
             self.manager.get_resource_manager(m).get_permissions()
             for m in ('asg', 'launch-config', 'ec2')]))
 
+    def get_scanners(self):
+        return (
+            ("instances", self._pull_ec2_keynames),
+            ("asgs", self._pull_asg_keynames),
+        )
+
     def _pull_asg_keynames(self):
         asgs = self.manager.get_resource_manager('asg').resources()
-        key_names = set()
+        key_refs = {}
         lcfgs = set(a['LaunchConfigurationName'] for a in asgs if 'LaunchConfigurationName' in a)
         lcfg_mgr = self.manager.get_resource_manager('launch-config')
 
         if lcfgs:
-            key_names.update([
-                lcfg['KeyName'] for lcfg in lcfg_mgr.resources()
-                if lcfg['LaunchConfigurationName'] in lcfgs])
+            for lcfg in lcfg_mgr.resources():
+                if lcfg['LaunchConfigurationName'] in lcfgs:
+                    key_refs.setdefault(lcfg['KeyName'], []).append(
+                        lcfg['LaunchConfigurationName'])
 
         tmpl_mgr = self.manager.get_resource_manager('launch-template-version')
         for tversion in tmpl_mgr.get_resources(
                 list(tmpl_mgr.get_asg_templates(asgs).keys())):
-            key_names.add(tversion['LaunchTemplateData'].get('KeyName'))
-        return key_names
+            key_refs.setdefault(tversion['LaunchTemplateData'].get('KeyName'), []).append(
+                "%s:%s" % (tversion['LaunchTemplateId'], tversion['VersionNumber']))
+        return key_refs
 
     def _pull_ec2_keynames(self):
         ec2_manager = self.manager.get_resource_manager('ec2')
-        return {i.get('KeyName', None) for i in ec2_manager.resources()}
+        key_refs = {}
+        for i in ec2_manager.resources():
+            key_refs.setdefault(i.get('KeyName', None), []).append(i['InstanceId'])
+        return key_refs
 
     def process(self, resources, event=None):
-        keynames = self._pull_ec2_keynames().union(self._pull_asg_keynames())
+        keynames = self.get_usage()
         if self.data.get('state', True):
             return [r for r in resources if r['KeyName'] not in keynames]
         return [r for r in resources if r['KeyName'] in keynames]
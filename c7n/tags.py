@@ -15,11 +15,12 @@ from datetime import datetime, timedelta
 from dateutil import tz as tzutil
 from dateutil.parser import parse
 
+import threading
 import time
 
 from c7n.manager import resources as aws_resources
 from c7n.actions import BaseAction as Action, AutoTagUser
-from c7n.exceptions import PolicyValidationError, PolicyExecutionError
+from c7n.exceptions import ClientError, PolicyValidationError, PolicyExecutionError
 from c7n.resources import load_resources
 from c7n.filters import Filter, OPERATORS
 from c7n.filters.offhours import Time
@@ -65,6 +66,135 @@ def register_universal_tags(filters, actions, compatibility=True):
     actions.register('rename-tag', UniversalTagRename)
 
 
+class TagIndex:
+    """Run scoped resource tags, prefetched per account and region.
+
+    In bulk mode universal tag augmentation pages through the tagging
+    api once per account and region for all the resource types of the
+    run, instead of fetching tags by arn for each policy. Tags are kept
+    for the run, or the cache period if one is set, with expired accounts
+    and regions pruned on each access. Resource types the tagging api
+    doesn't accept as a filter are augmented by arn, as are resources
+    retagged by an action since the prefetch.
+    """
+
+    def __init__(self):
+        self.types = set()
+        self.indexes = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_type_filter(model):
+        service = model.arn_service or model.service
+        return model.arn_type and "%s:%s" % (service, model.arn_type) or service
+
+    def add_types(self, models):
+        """Register the resource types to prefetch tags for."""
+        with self.lock:
+            self.types.update(
+                self.get_type_filter(m) for m in models
+                if getattr(m, 'universal_taggable', False) is not False)
+
+    def get(self, manager, client):
+        """Get a mapping of arn to tags for the manager's resource type.
+
+        Returns None if the resource type can't be prefetched.
+        """
+        type_filter = self.get_type_filter(manager.get_model())
+        key = (manager.config.account_id, client.meta.region_name)
+        with self.lock:
+            self.types.add(type_filter)
+            if manager.config.cache_period:
+                self.prune(time.time() - manager.config.cache_period * 60)
+            index = self.indexes.get(key)
+            if index is None:
+                index = self.indexes[key] = {
+                    'created': time.time(), 'tags': {}, 'fetched': set(), 'invalid': set(),
+                    'stale': set()}
+            key_lock = self.locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            missing = sorted(self.types - index['fetched'] - index['invalid'])
+            for type_set in utils.chunks(missing, 100):
+                self.fetch(manager, client, type_set, index)
+            with self.lock:
+                stale, index['stale'] = index['stale'], set()
+            try:
+                for arn_set in utils.chunks(sorted(stale), 100):
+                    self.fetch_arns(client, arn_set, index)
+                    stale.difference_update(arn_set)
+            finally:
+                with self.lock:
+                    index['stale'].update(stale)
+        if type_filter in index['invalid']:
+            return None
+        return index['tags']
+
+    def prune(self, created_before):
+        # callers hold the index lock
+        for key in [k for k, i in self.indexes.items() if i['created'] < created_before]:
+            self.indexes.pop(key)
+            self.locks.pop(key, None)
+
+    def fetch(self, manager, client, type_filters, index):
+        # Lazy for non circular :-(
+        from c7n.query import RetryPageIterator
+        paginator = client.get_paginator('get_resources')
+        paginator.PAGE_ITERATOR_CLS = RetryPageIterator
+        tags = {}
+        try:
+            for page in paginator.paginate(
+                    ResourceTypeFilters=type_filters, ResourcesPerPage=100):
+                for r in page.get('ResourceTagMappingList', ()):
+                    tags[r['ResourceARN']] = r['Tags']
+        except ClientError as e:
+            if len(type_filters) > 1:
+                for type_filter in type_filters:
+                    self.fetch(manager, client, [type_filter], index)
+                return
+            manager.log.debug(
+                "Unable to prefetch tags for %s: %s", type_filters[0], e)
+            index['invalid'].add(type_filters[0])
+            return
+        index['tags'].update(tags)
+        index['fetched'].update(type_filters)
+
+    def fetch_arns(self, client, arns, index):
+        tags = {
+            r['ResourceARN']: r['Tags'] for r in
+            client.get_resources(ResourceARNList=arns).get('ResourceTagMappingList', ())}
+        for arn in arns:
+            if arn in tags:
+                index['tags'][arn] = tags[arn]
+            else:
+                index['tags'].pop(arn, None)
+
+    def invalidate(self, manager, resources):
+        """Mark resources as retagged, so their tags are refetched on next use."""
+        if not resources or not self.indexes:
+            return
+        key = (
+            manager.config.account_id,
+            utils.get_resource_tagging_region(manager.resource_type, manager.config.region))
+        with self.lock:
+            index = self.indexes.get(key)
+        if index is None or self.get_type_filter(manager.get_model()) not in index['fetched']:
+            return
+        arns = manager.get_arns(resources)
+        with self.lock:
+            index['stale'].update(arns)
+
+    def clear(self):
+        with self.lock:
+            self.types.clear()
+            self.indexes.clear()
+            self.locks.clear()
+
+
+tag_index = TagIndex()
+
+
 def universal_augment(self, resources):
     # Resource Tagging API Support
     # https://docs.aws.amazon.com/awsconsolehelpdocs/latest/gsg/supported-resources.html
@@ -84,6 +214,14 @@ def universal_augment(self, resources):
 
     rfetch = [r for r in resources if 'Tags' not in r]
 
+    tag_map = None
+    if self.config.get('bulk_tags'):
+        tag_map = tag_index.get(self, client)
+    if tag_map is not None:
+        for arn, r in zip(self.get_arns(rfetch), rfetch):
+            r['Tags'] = [dict(t) for t in tag_map.get(arn, ())]
+        return resources
+
     for arn_resource_set in utils.chunks(
             zip(self.get_arns(rfetch), rfetch), 100):
         arn_resource_map = dict(arn_resource_set)
@@ -100,7 +238,7 @@ def universal_augment(self, resources):
 
 def _common_tag_processer(executor_factory, batch_size, concurrency, client,
                           process_resource_set, id_key, resources, tags,
-                          log):
+                          log, manager=None):
 
     error = None
     with executor_factory(max_workers=concurrency) as w:
@@ -115,6 +253,8 @@ def _common_tag_processer(executor_factory, batch_size, concurrency, client,
                 log.error(
                     "Exception with tags: %s  %s", tags, f.exception())
 
+    if manager is not None:
+        tag_index.invalidate(manager, resources)
     if error:
         raise error
 
@@ -411,7 +551,8 @@ class Tag(Action):
         client = self.get_client()
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
-            self.process_resource_set, self.id_key, resources, tags, self.log)
+            self.process_resource_set, self.id_key, resources, tags, self.log,
+            self.manager)
 
     def process_resource_set(self, client, resource_set, tags):
         mid = self.manager.get_model().id
@@ -468,7 +609,8 @@ class RemoveTag(Action):
         client = self.get_client()
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
-            self.process_resource_set, self.id_key, resources, tags, self.log)
+            self.process_resource_set, self.id_key, resources, tags, self.log,
+            self.manager)
 
     def process_resource_set(self, client, resource_set, tag_keys):
         return self.manager.retry(
@@ -570,6 +712,7 @@ class RenameTag(Action):
                     self.log.error(
                         "Exception renaming tag set \n %s" % (
                             f.exception()))
+        tag_index.invalidate(self.manager, resources)
         return resources
 
     def get_client(self):
@@ -682,7 +825,8 @@ class TagDelayedAction(Action):
         client = self.get_client()
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
-            self.process_resource_set, self.id_key, resources, tags, self.log)
+            self.process_resource_set, self.id_key, resources, tags, self.log,
+            self.manager)
 
     def process_resource_set(self, client, resource_set, tags):
         tagger = self.manager.action_registry['tag']({}, self.manager)
@@ -817,6 +961,7 @@ class NormalizeTag(Action):
                     self.log.error(
                         "Exception renaming tag set \n %s" % (
                             f.exception()))
+        tag_index.invalidate(self.manager, resources)
         return resources
 
 
@@ -870,7 +1015,8 @@ class UniversalTag(Tag):
 
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
-            self.process_resource_set, self.id_key, resources, tags, self.log)
+            self.process_resource_set, self.id_key, resources, tags, self.log,
+            self.manager)
 
     def process_resource_set(self, client, resource_set, tags):
         arns = self.manager.get_arns(resource_set)
@@ -1038,7 +1184,8 @@ class UniversalTagDelayedAction(TagDelayedAction):
 
         _common_tag_processer(
             self.executor_factory, batch_size, self.concurrency, client,
-            self.process_resource_set, self.id_key, resources, tags, self.log)
+            self.process_resource_set, self.id_key, resources, tags, self.log,
+            self.manager)
 
     def process_resource_set(self, client, resource_set, tags):
         arns = self.manager.get_arns(resource_set)
@@ -1219,12 +1366,18 @@ class CopyRelatedResourceTag(Tag):
         """
         Returns a mapping of {resource_id: {tagkey: tagvalue}}
         """
+        from c7n.filters.related import related_index
         manager = self.manager.get_resource_manager(r_type)
         r_id = manager.resource_type.id
 
+        index = related_index.get(manager, build=False)
+        if index is not None:
+            resources = index.get(ids).values()
+        else:
+            resources = manager.get_resources(list(ids))
         return {
             r[r_id]: {t['Key']: t['Value'] for t in r.get('Tags', [])}
-            for r in manager.get_resources(list(ids))
+            for r in resources
         }
 
     def get_resource_tag_map_universal(self, ids):
@@ -1,11 +1,14 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
+import bisect
+import contextlib
 import copy
 from collections import UserString
 from datetime import datetime, timedelta
 from dateutil.tz import tzutc
 import json
 import itertools
+import functools
 import ipaddress
 import logging
 import os
@@ -26,6 +29,11 @@ from jmespath.parser import Parser, ParsedResult
 from c7n import config
 from c7n.exceptions import ClientError, PolicyValidationError
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
 # Try to play nice in a serverless environment, where we don't require yaml
 
 try:
@@ -253,6 +261,32 @@ def chunks(iterable, size=50):
         yield batch
 
 
+@functools.lru_cache(maxsize=8192)
+def _camel_key(k, implicitTitle):
+    # returns the normalized key, and whether its values may be dates
+    ok = implicitTitle and "%s%s" % (k[:1].upper(), k[1:]) or k
+    kn = k.lower()
+    return ok, 'time' in kn or 'date' in kn
+
+
+ISO_DATE_PREFIX = re.compile(r'\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}')
+
+
+def _parse_implicit_date(v):
+    # most config dates are isoformat, which the stdlib parses far faster
+    # than dateutil, falling back to parse_date for anything else.
+    if isinstance(v, str) and ISO_DATE_PREFIX.match(v):
+        try:
+            return datetime.fromisoformat(
+                v[-1] == 'Z' and v[:-1] + '+00:00' or v).astimezone(tzutc())
+        except ValueError:
+            pass
+    try:
+        return parse_date(v)
+    except ParserError:
+        return None
+
+
 def camelResource(obj, implicitDate=False, implicitTitle=True):
     """Some sources from apis return lowerCased where as describe calls
 
@@ -260,37 +294,34 @@ def camelResource(obj, implicitDate=False, implicitTitle=True):
 
     implicitDate ~ automatically sniff keys that look like isoformat date strings
      and convert to python datetime objects.
+
+    Dicts are normalized in place, in a single pass over their items.
     """
     if not isinstance(obj, dict):
         return obj
-    for k in list(obj.keys()):
-        v = obj.pop(k)
-        if implicitTitle:
-            ok = "%s%s" % (k[0].upper(), k[1:])
-        else:
-            ok = k
-        obj[ok] = v
-
-        if implicitDate:
+    items = {}
+    for k, v in obj.items():
+        ok, date_key = _camel_key(k, implicitTitle)
+        # a renamed key takes precedence over an existing key of the same name
+        if ok == k and ok in items:
+            continue
+
+        if implicitDate and date_key and isinstance(v, (str, int)):
             # config service handles datetime differently then describe sdks
             # the sdks use knowledge of the shape to support language native
             # date times, while config just turns everything into a serialized
             # json with mangled keys without type info. to normalize to describe
             # we implicitly sniff keys which look like datetimes, and have an
             # isoformat marker ('T').
-            kn = k.lower()
-            if isinstance(v, (str, int)) and ('time' in kn or 'date' in kn):
-                try:
-                    dv = parse_date(v)
-                except ParserError:
-                    dv = None
-                if dv:
-                    obj[ok] = dv
-        if isinstance(v, dict):
+            v = _parse_implicit_date(v) or v
+        elif isinstance(v, dict):
             camelResource(v, implicitDate, implicitTitle)
         elif isinstance(v, list):
             for e in v:
                 camelResource(e, implicitDate, implicitTitle)
+        items[ok] = v
+    obj.clear()
+    obj.update(items)
     return obj
 
 
@@ -487,6 +518,14 @@ def parse_cidr(value):
     """Process cidr ranges."""
     if isinstance(value, list) or isinstance(value, set):
         return IPv4List([parse_cidr(item) for item in value])
+    if isinstance(value, str):
+        return _parse_cidr(value)
+    return _parse_cidr.__wrapped__(value)
+
+
+@functools.lru_cache(maxsize=8192)
+def _parse_cidr(value):
+    # rule cidrs repeat heavily across resources, parsed values are immutable.
     klass = IPv4Network
     if '/' not in value:
         klass = ipaddress.ip_address
@@ -528,15 +567,85 @@ class IPv4Network(ipaddress.IPv4Network):
 class IPv4List:
     def __init__(self, ipv4_list):
         self.ipv4_list = ipv4_list
+        self.networks = CidrSet(
+            [y_elem for y_elem in ipv4_list if isinstance(y_elem, IPv4Network)])
+        self.addresses = {
+            y_elem for y_elem in ipv4_list if isinstance(y_elem, ipaddress.IPv4Address)}
 
     def __contains__(self, other):
         if other is None:
             return False
-        in_networks = any([other in y_elem for y_elem in self.ipv4_list
-          if isinstance(y_elem, IPv4Network)])
-        in_addresses = any([other == y_elem for y_elem in self.ipv4_list
-          if isinstance(y_elem, ipaddress.IPv4Address)])
-        return any([in_networks, in_addresses])
+        if other in self.addresses:
+            return True
+        if getattr(other, 'version', None) != 4:
+            return False
+        return self.networks.supernet_of(other)
+
+
+class CidrSet:
+    """A set of ipv4 and ipv6 networks indexed for prefix queries.
+
+    Member network prefixes are hashed by prefix length, so finding a
+    member containing a network or address is a lookup per distinct
+    prefix length rather than a scan of the set. Members are also
+    kept sorted by first address for subnet and overlap queries.
+    """
+
+    def __init__(self, networks=()):
+        self.prefixes = {4: {}, 6: {}}
+        self.starts = {4: [], 6: []}
+        self.ranges = {4: [], 6: []}
+        for n in networks:
+            self.add(n)
+
+    @staticmethod
+    def as_network(value):
+        if isinstance(value, ipaddress._BaseNetwork):
+            return value
+        return ipaddress.ip_network(value)
+
+    def add(self, network):
+        network = self.as_network(network)
+        host_bits = network.max_prefixlen - network.prefixlen
+        prefixes = self.prefixes[network.version]
+        prefixes.setdefault(network.prefixlen, set()).add(
+            int(network.network_address) >> host_bits)
+        span = (int(network.network_address), int(network.broadcast_address))
+        idx = bisect.bisect_left(self.ranges[network.version], span)
+        self.ranges[network.version].insert(idx, span)
+        self.starts[network.version].insert(idx, span[0])
+
+    def __len__(self):
+        return len(self.ranges[4]) + len(self.ranges[6])
+
+    def supernet_of(self, other):
+        """Is the network or address within a member network."""
+        other = self.as_network(other)
+        address = int(other.network_address)
+        for prefixlen, members in self.prefixes[other.version].items():
+            if prefixlen > other.prefixlen:
+                continue
+            if address >> (other.max_prefixlen - prefixlen) in members:
+                return True
+        return False
+
+    def subnet_of(self, other):
+        """Is a member network within the network."""
+        other = self.as_network(other)
+        starts, ranges = self.starts[other.version], self.ranges[other.version]
+        last = int(other.broadcast_address)
+        # members either nest or are disjoint, so only supernets of the
+        # network sharing its first address are passed over.
+        idx = bisect.bisect_left(starts, int(other.network_address))
+        while idx < len(starts) and starts[idx] <= last:
+            if ranges[idx][1] <= last:
+                return True
+            idx += 1
+        return False
+
+    def overlaps(self, other):
+        """Does the network or address overlap with a member network."""
+        return self.supernet_of(other) or self.subnet_of(other)
 
 
 def reformat_schema(model):
@@ -647,6 +756,23 @@ def join_output_path(output_path, *parts):
     return urlparse.urlunparse(parts)
 
 
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a lock file across processes.
+
+    Where flock isn't available (windows) this is a no-op.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(path, 'a') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
 def get_policy_provider(policy_data):
     if isinstance(policy_data['resource'], list):
         provider_name, _ = policy_data['resource'][0].split('.', 1)
@@ -6,6 +6,8 @@ import logging
 import os
 import unittest
 import uuid
+from unittest.mock import MagicMock
+
 from c7n.config import Bag
 
 from c7n.testing import TestUtils, TextTestIO, functional # NOQA
@@ -150,6 +152,16 @@ def load_data(file_name, state=None, **kw):
     return data
 
 
+def mock_manager(cache=None, cache_period=0, cache_key=None, **config):
+    """Return a mock resource manager with a cache config and cache key."""
+    manager = MagicMock()
+    config.setdefault('account_id', ACCOUNT_ID)
+    manager.config = Bag(cache=cache, cache_period=cache_period, **config)
+    manager.get_cache_key.return_value = cache_key or {
+        'account': config['account_id'], 'region': 'us-east-1'}
+    return manager
+
+
 def instance(state=None, file="ec2-instance.json", **kw):
     return load_data(file, state, **kw)
 
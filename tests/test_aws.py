@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import json
+import os
 import time
 import threading
 import socket
@@ -18,7 +19,7 @@ from c7n import output
 from c7n.resources.sqs import SQS
 from c7n.executor import MainThreadExecutor
 
-from .common import BaseTest
+from .common import BaseTest, mock_manager
 
 from aws_xray_sdk.core.models.segment import Segment
 from aws_xray_sdk.core.models.subsegment import Subsegment
@@ -84,10 +85,85 @@ class TestArnResolver:
         resolver = aws.ArnResolver(p.resource_manager)
         load_resources(('aws.sqs', 'aws.lambda'))
         test.patch(SQS, 'executor_factory', MainThreadExecutor)
+        test.patch(aws.ArnResolver, 'executor_factory', MainThreadExecutor)
         arn_map = resolver.resolve(arns)
         assert len(arn_map) == 3
         assert None not in arn_map.values()
 
+    def get_resolver_manager(self, cache=None):
+        rmanager = Mock()
+        rmanager.get_resources.side_effect = lambda ids: [
+            {'Name': i} for i in ids if i != 'missing']
+        rmanager.get_arns.side_effect = lambda resources: [
+            'arn:aws:sqs:us-east-1:123456789012:%s' % r['Name'] for r in resources]
+        manager = mock_manager(cache=cache, cache_period=cache and 5 or 0)
+        manager.get_resource_manager.return_value = rmanager
+        return manager, rmanager
+
+    def test_arn_resolve_cached(self):
+        load_resources(('aws.sqs',))
+        manager, rmanager = self.get_resolver_manager()
+        resolver = aws.ArnResolver(manager)
+        arns = ['arn:aws:sqs:us-east-1:123456789012:%s' % n for n in ('a', 'b', 'missing')]
+        assert resolver.resolve(arns) == {
+            arns[0]: {'Name': 'a'}, arns[1]: {'Name': 'b'}, arns[2]: None}
+        assert resolver.resolve(arns[:2]) == {
+            arns[0]: {'Name': 'a'}, arns[1]: {'Name': 'b'}}
+        assert rmanager.get_resources.call_count == 1
+        # without caching, resolved arns are not shared across resolvers
+        aws.ArnResolver(manager).resolve(arns)
+        assert rmanager.get_resources.call_count == 2
+
+    def test_arn_resolve_run_cache(self):
+        load_resources(('aws.sqs',))
+        manager, rmanager = self.get_resolver_manager(cache='memory')
+        arn = 'arn:aws:sqs:us-east-1:123456789012:a'
+        try:
+            aws.ArnResolver(manager).resolve([arn])
+            assert aws.ArnResolver(manager).resolve([arn]) == {arn: {'Name': 'a'}}
+            assert rmanager.get_resources.call_count == 1
+        finally:
+            aws.arn_cache.clear()
+
+    def test_arn_resolve_concurrent(self):
+        load_resources(('aws.sqs', 'aws.lambda'))
+        manager, rmanager = self.get_resolver_manager()
+        arns = [
+            'arn:aws:sqs:us-east-1:123456789012:a',
+            'arn:aws:lambda:us-east-1:123456789012:function:b']
+        with patch.object(aws.ArnResolver, 'executor_factory') as executor:
+            executor.return_value.__enter__.return_value = MainThreadExecutor()
+            aws.ArnResolver(manager).resolve(arns)
+        executor.assert_called_once_with(max_workers=aws.ArnResolver.max_workers)
+        assert rmanager.get_resources.call_count == 2
+        assert {c.args[0] for c in manager.get_resource_manager.call_args_list} == {
+            'sqs', 'lambda'}
+
+    def test_arn_type_index(self):
+        def scan_type(arn):
+            for type_name, klass in aws.AWS.resources.items():
+                m = klass.resource_type
+                if type_name in ('rest-account', 'account') or m.arn is False:
+                    continue
+                if arn.service != (m.arn_service or m.service):
+                    continue
+                if (type_name in ('asg', 'ecs-task') and
+                        "%s%s" % (m.arn_type, m.arn_separator) in arn.resource_type):
+                    return type_name
+                elif m.arn_type is not None and m.arn_type == arn.resource_type:
+                    return type_name
+                elif m.arn_service == arn.service and m.arn_type == "":
+                    return type_name
+
+        load_resources(('aws.*',))
+        for klass in aws.AWS.resources.values():
+            m = klass.resource_type
+            if not m.arn_type:
+                continue
+            arn = aws.Arn.parse('arn:aws:%s:us-east-1:123456789012:%s%sname' % (
+                m.arn_service or m.service, m.arn_type, m.arn_separator))
+            assert aws.ArnResolver.resolve_type(arn) == scan_type(arn)
+
     def test_arn_meta(self):
 
         legacy = set()
@@ -569,3 +645,57 @@ def test_get_bucket_url_s3_same_region():
     assert aws.get_bucket_url_with_region(
         "s3://slack.cloudcustodian.io/logs/?param=x",
         "us-east-1") == "s3://slack.cloudcustodian.io/logs?param=x&region=us-east-1"
+
+
+class ApiStatsTest(BaseTest):
+
+    def test_operation_stats(self):
+        stats = aws.ApiOperationStats()
+        for latency in [0.01] * 90 + [0.1] * 9 + [1.0]:
+            stats.record(latency, size=10)
+        stats.record(retries=2)
+        detail = stats.as_dict()
+        self.assertEqual(detail['calls'], 101)
+        self.assertEqual(detail['retries'], 2)
+        self.assertEqual(detail['bytes_received'], 1000)
+        self.assertAlmostEqual(detail['latency_ms']['p50'], 10, delta=0.5)
+        self.assertAlmostEqual(detail['latency_ms']['p95'], 100, delta=5)
+        self.assertAlmostEqual(detail['latency_ms']['p99'], 100, delta=5)
+
+    def test_api_stats_metadata(self):
+        replay_factory = self.replay_flight_data('test_sqs_delete', region='us-east-2')
+
+        def factory(*args, **kw):
+            # flight data factories aren't SessionFactory instances, subscribe directly.
+            session = replay_factory(*args, **kw)
+            p.ctx.api_stats(session)
+            return session
+
+        output_dir = self.get_temp_dir()
+        p = self.load_policy(
+            {'name': 'sqs-stats', 'resource': 'sqs'},
+            config={'region': 'us-east-2'},
+            session_factory=factory,
+            output_dir=output_dir)
+        p.run()
+        with open(os.path.join(output_dir, 'sqs-stats', 'metadata.json')) as fh:
+            metadata = json.load(fh)
+
+        self.assertEqual(
+            set(metadata['api-detail']),
+            {'sqs.ListQueues', 'sqs.GetQueueAttributes', 'tagging.GetResources'})
+        list_queues = metadata['api-detail']['sqs.ListQueues']
+        self.assertEqual(list_queues['calls'], 1)
+        self.assertEqual(list_queues['throttles'], 0)
+        self.assertTrue(
+            {'resource-fetch', 'resource-augment', 'filter'}.issubset(metadata['timings']))
+
+    def test_api_stats_throttle(self):
+        stats = aws.ApiStats(Bag())
+        operation = Bag(name='DescribeInstances', service_model=Bag(endpoint_prefix='ec2'))
+        stats._observe(operation, response=(
+            Bag(status_code=400), {'Error': {'Code': 'RequestLimitExceeded'}}))
+        stats._observe(operation, response=(Bag(status_code=200), {}))
+        stats._observe(operation, caught_exception=ValueError())
+        self.assertEqual(
+            stats.get_detail()['ec2.DescribeInstances']['throttles'], 1)
@@ -11,6 +11,9 @@ from unittest import TestCase
 import pytest
 
 from c7n import cache, config
+from c7n.query import DescribeSource
+
+from .common import BaseTest
 
 
 class TestCache(TestCase):
@@ -86,6 +89,77 @@ def test_sqlkv_parent_dir_create(tmp_path):
     assert os.path.exists(os.path.dirname(cache_path))
 
 
+def test_sqlkv_resources(tmp_path):
+    kv = cache.SqlKvCache(config.Bag(cache=tmp_path / "cache.db", cache_period=60))
+    kv.load()
+    k1 = {"account": "12345678901234", "region": "us-west-2", "resource": "ec2"}
+    resources = [{'id': 'c'}, {'id': 'a', 'v': 1}, {'id': 'b'}]
+
+    assert kv.get_resources(k1, ['a'], 'id') is None
+    kv.save_resources(k1, resources, 'id')
+    assert kv.get(k1) == resources
+    assert kv.get_resources(k1, ['b', 'a', 'x'], 'id') == resources[1:]
+    assert kv.get_resources(k1, ['x'], 'id') == []
+
+    kv.update_resources(k1, [{'id': 'a', 'v': 2}, {'id': 'd'}], 'id')
+    assert kv.get(k1) == [{'id': 'c'}, {'id': 'a', 'v': 2}, {'id': 'b'}, {'id': 'd'}]
+
+    # a full save replaces the set
+    kv.save_resources(k1, resources[:1], 'id')
+    assert kv.get(k1) == resources[:1]
+    assert kv.conn.execute('pragma journal_mode').fetchone()[0] == 'wal'
+    kv.close()
+
+
+def test_sqlkv_resources_expired(tmp_path):
+    kv = cache.SqlKvCache(config.Bag(cache=tmp_path / "cache.db", cache_period=60))
+    kv.load()
+    k1 = {'a': 'b'}
+    kv.save_resources(k1, [{'id': 'a'}], 'id', datetime.utcnow() - timedelta(days=10))
+    assert kv.get(k1) is None
+    assert kv.get_resources(k1, ['a'], 'id') is None
+    kv.close()
+
+    kv.load()
+    assert kv.conn.execute('select count(*) from c7n_resource').fetchone()[0] == 0
+
+
+def test_sqlkv_resources_missing_id(tmp_path):
+    kv = cache.SqlKvCache(config.Bag(cache=tmp_path / "cache.db", cache_period=60))
+    kv.load()
+    k1 = {'a': 'b'}
+    kv.save_resources(k1, [{'id': 'a'}, {'name': 'b'}], 'id')
+    assert kv.get(k1) == [{'id': 'a'}, {'name': 'b'}]
+    assert kv.get_resources(k1, ['a'], 'id') == [{'id': 'a'}]
+
+
+def test_sqlkv_update_resources_batched(tmp_path):
+    kv = cache.SqlKvCache(config.Bag(cache=tmp_path / "cache.db", cache_period=60))
+    kv.batch_size = 2
+    kv.load()
+    k1 = {'a': 'b'}
+    kv.save_resources(k1, [{'id': str(i)} for i in range(5)], 'id')
+    kv.update_resources(k1, [{'id': str(i), 'v': i} for i in (4, 0, 2, 5)], 'id')
+    assert kv.get(k1) == [
+        {'id': '0', 'v': 0}, {'id': '1'}, {'id': '2', 'v': 2},
+        {'id': '3'}, {'id': '4', 'v': 4}, {'id': '5', 'v': 5}]
+
+    # resources missing an id invalidate the set
+    kv.update_resources(k1, [{'id': '1', 'v': 1}, {'name': 'x'}], 'id')
+    assert kv.get(k1) is None
+    kv.close()
+
+
+def test_mem_update_resources():
+    mem_cache = cache.InMemoryCache({})
+    k1 = {'resource': 'ec2-update'}
+    mem_cache.update_resources(k1, [{'id': 'a'}], 'id')
+    assert mem_cache.get(k1) is None
+    mem_cache.save_resources(k1, [{'id': 'a'}, {'id': 'b'}], 'id')
+    mem_cache.update_resources(k1, [{'id': 'b', 'v': 1}], 'id')
+    assert mem_cache.get_resources(k1, ['b'], 'id') == [{'id': 'b', 'v': 1}]
+
+
 @pytest.mark.skipif(
     sys.platform == 'win32',
     reason="windows can't remove a recently created but closed file")
@@ -99,3 +173,53 @@ def test_sqlkv_convert(tmp_path):
     kv.close()
     with open(cache_path, 'rb') as fh:
         assert fh.read(15) == b"SQLite format 3"
+
+
+class FetchPlanTest(BaseTest):
+
+    def test_fetch_plan_shared_resources(self):
+        factory = self.replay_flight_data("test_ec2_state_transition_age_filter")
+        fetches = []
+        resources = DescribeSource.resources
+
+        def counting_resources(source, query):
+            fetches.append(source.manager.type)
+            return resources(source, query)
+
+        self.patch(DescribeSource, "resources", counting_resources)
+
+        running, terminated, lambda_mode = [
+            self.load_policy(p, session_factory=factory) for p in (
+                {"name": "ec2-running", "resource": "ec2",
+                 "filters": [{"State.Name": "running"}]},
+                {"name": "ec2-terminated", "resource": "ec2",
+                 "filters": [{"State.Name": "terminated"}]},
+                {"name": "ec2-event", "resource": "ec2",
+                 "mode": {"type": "cloudtrail", "events": ["RunInstances"]}})]
+
+        plan = cache.FetchPlan([running, terminated, lambda_mode])
+        self.assertEqual(len(plan.groups), 1)
+        self.assertIsInstance(running.resource_manager._cache, cache.PlanCache)
+        self.assertNotIsInstance(lambda_mode.resource_manager._cache, cache.PlanCache)
+
+        self.assertEqual(len(running.resource_manager.resources()), 2)
+        plan.release(running)
+        self.assertEqual(len(terminated.resource_manager.resources()), 1)
+        self.assertEqual(fetches, ["ec2"])
+
+        # resources served from the plan are copies of the fetched population
+        store = plan.stores[cache.FetchPlan.get_group_key(terminated)]
+        self.assertEqual(len(store), 1)
+        self.assertTrue(all(
+            "c7n:MatchedFilters" not in r for r in list(store.values())[0]))
+
+        plan.release(terminated)
+        self.assertEqual(store, {})
+        self.assertFalse(plan.pending)
+
+    def test_fetch_plan_single_policy(self):
+        p = self.load_policy({"name": "ec2", "resource": "ec2"})
+        plan = cache.FetchPlan([p])
+        self.assertEqual(plan.groups, {})
+        self.assertNotIsInstance(p.resource_manager._cache, cache.PlanCache)
+        plan.release(p)
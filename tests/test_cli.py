@@ -568,6 +568,94 @@ class RunTest(CliTest):
             ["custodian", "run", "-s", temp_dir, "--debug", yaml_file], CustomError
         )
 
+    def test_parallel_errors(self):
+        from c7n.policy import Policy
+
+        executed = []
+
+        def policy_call(p):
+            executed.append(p.name)
+            if p.name.startswith("error"):
+                raise ValueError(p.name)
+
+        self.patch(Policy, "__call__", policy_call)
+
+        temp_dir = self.get_temp_dir()
+        yaml_file = self.write_policy_file(
+            {"policies": [
+                {"name": "error-b", "resource": "ec2"},
+                {"name": "ok", "resource": "ec2"},
+                {"name": "error-a", "resource": "ec2",
+                 "filters": [{"State.Name": "running"}]},
+                {"name": "ok-ami", "resource": "ami"}]})
+        log_output = self.capture_logging("custodian.commands")
+        self.run_and_expect_failure(
+            ["custodian", "run", "-s", temp_dir, "--workers", "3", yaml_file], 2)
+        self.assertEqual(sorted(executed), ["error-a", "error-b", "ok", "ok-ami"])
+        # errors are reported in policy order
+        self.assertIn("executing\n - error-b\n - error-a", log_output.getvalue())
+
+    def test_parallel_process_errors(self):
+        import multiprocessing
+        from functools import partial
+        from c7n.exceptions import PolicyExecutionError
+        from c7n.policy import Policy
+
+        def policy_call(p):
+            if p.name.startswith("error"):
+                raise ValueError(p.name)
+
+        # policies are rebuilt in forked workers, which inherit the patch.
+        self.patch(Policy, "__call__", policy_call)
+        self.patch(
+            commands, "ProcessPoolExecutor",
+            partial(commands.ProcessPoolExecutor,
+                    mp_context=multiprocessing.get_context("fork")))
+
+        temp_dir = self.get_temp_dir()
+        yaml_file = self.write_policy_file(
+            {"policies": [
+                {"name": "error-b", "resource": "ec2"},
+                {"name": "ok", "resource": "ami"},
+                {"name": "error-a", "resource": "ebs"}]})
+        log_output = self.capture_logging("custodian.commands")
+        self.run_and_expect_failure(
+            ["custodian", "run", "-s", temp_dir, "--workers", "2",
+             "--worker-mode", "process", yaml_file], 2)
+        # errors are reported in policy order
+        self.assertIn("executing\n - error-b\n - error-a", log_output.getvalue())
+
+        # with debug, the first error's representation is raised.
+        import pdb
+        raised = []
+        self.patch(pdb, "post_mortem", lambda tb: raised.append(sys.exc_info()[1]))
+        self.capture_output()
+        self.patch_account_id()
+        self.patch(sys, "argv", [
+            "custodian", "run", "-s", temp_dir, "--workers", "2",
+            "--worker-mode", "process", "--debug", yaml_file])
+        cli.main()
+        self.assertEqual(len(raised), 1)
+        self.assertIsInstance(raised[0], PolicyExecutionError)
+        self.assertEqual(str(raised[0]), "ValueError('error-b')")
+
+    def test_run_api_rate(self):
+        temp_dir = self.get_temp_dir()
+        yaml_file = self.write_policy_file({"policies": [{"name": "ok", "resource": "ec2"}]})
+        for rate in ("ec2=fast", "ec2=0"):
+            _, err = self.run_and_expect_failure(
+                ["custodian", "run", "-s", temp_dir, "--api-rate", rate, yaml_file], 2)
+            self.assertIn("argument --api-rate: values must be of the form", err)
+
+    def test_run_units(self):
+        p = self.load_policy({"name": "ec2-a", "resource": "ec2"})
+        p2 = self.load_policy({"name": "ec2-b", "resource": "ec2"})
+        p3 = self.load_policy({"name": "ami", "resource": "ami"})
+        p4 = self.load_policy({"name": "ec2-c", "resource": "ec2", "source": "config"})
+        self.assertEqual(
+            [[u.name for u in unit] for unit in commands.get_run_units([p, p3, p2, p4])],
+            [["ec2-a", "ec2-b"], ["ami"], ["ec2-c"]])
+
     def test_session_policy(self):
         parser = argparse.ArgumentParser()
         parser.add_argument('--session-policy', action=LoadSessionPolicyJson)
@@ -1,7 +1,11 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
+import datetime
 import os
+from unittest import mock
+
 from botocore.exceptions import ClientError
+from dateutil.tz import tzutc
 import placebo
 
 from c7n import credentials
@@ -11,7 +15,7 @@ from c7n.credentials import (
 from c7n.version import version
 from c7n.utils import local_session
 
-from .common import BaseTest
+from .common import Bag, BaseTest
 
 import freezegun
 import pytest
@@ -123,3 +127,143 @@ class Credential(BaseTest):
         client = local_session(factory).client('ec2')
         self.assertTrue(
             'check-ec2' in client._client_config.user_agent)
+
+
+def test_api_concurrency():
+    limiter = credentials.ApiConcurrency(limit=2)
+    session = SessionFactory('us-east-1')()
+    limiter.register(session)
+
+    client = session.client('ec2')
+    calls = []
+
+    def stub(model, context, **kw):
+        slot = limiter.get_semaphore('ec2')
+        calls.append(slot._value)
+        return (Bag(status_code=200), {})
+
+    client.meta.events.register('before-call.ec2.DescribeRegions', stub)
+    client.describe_regions()
+    client.describe_regions()
+
+    # one of the two slots was held for the duration of each call
+    assert calls == [1, 1]
+    assert limiter.get_semaphore('ec2')._value == 2
+
+
+def test_api_rate_before_concurrency(monkeypatch):
+    concurrency = credentials.ApiConcurrency(limit=1)
+    limiter = credentials.ApiRateLimiter('ec2=10')
+    monkeypatch.setattr(credentials, 'api_concurrency', concurrency)
+    monkeypatch.setattr(credentials, 'api_rate_limiter', limiter)
+    slots = []
+    monkeypatch.setattr(
+        credentials.TokenBucket, 'acquire',
+        lambda self: slots.append(concurrency.get_semaphore('ec2')._value))
+    client = SessionFactory('us-east-1')().client('ec2')
+    client.meta.events.register(
+        'before-call.ec2.DescribeRegions', lambda **kw: (Bag(status_code=200), {}))
+    client.describe_regions()
+    # calls wait on their rate without holding a concurrency slot
+    assert slots == [1]
+
+
+def test_api_concurrency_unlimited():
+    limiter = credentials.ApiConcurrency()
+    session = SessionFactory('us-east-1')()
+    limiter.register(session)
+    assert limiter.semaphores == {}
+
+
+def test_credential_cache(tmp_path):
+    cache = credentials.CredentialCache(str(tmp_path / 'creds'))
+    fetched = []
+
+    def fetch():
+        fetched.append(1)
+        return dict(
+            access_key='AKIA', secret_key='secret', token='token',
+            expiry_time='2019-09-29T23:07:46+00:00')
+
+    params = ('arn:aws:iam::644160558196:role/Custodian', 'c7n', None, None, 'us-east-1')
+    with freezegun.freeze_time('2019-09-29T22:07:46+00:00'):
+        assert cache.get_credentials(params, fetch)['access_key'] == 'AKIA'
+        assert cache.get_credentials(params, fetch)['access_key'] == 'AKIA'
+        assert cache.get_credentials(params[:-1] + ('us-east-2',), fetch)
+    assert len(fetched) == 2
+    assert cache.stats() == {'hits': 1, 'misses': 2}
+    cache_file = tmp_path / 'creds' / ('%s.json' % cache.get_key(*params))
+    assert oct(cache_file.stat().st_mode & 0o777) == oct(0o600)
+
+    # refreshed ahead of botocore's refresh window
+    with freezegun.freeze_time('2019-09-29T22:50:00+00:00'):
+        cache.get_credentials(params, fetch)
+    assert len(fetched) == 3
+
+
+def test_credential_cache_assumed_session(tmp_path):
+    fetched = []
+
+    def assume_role(**params):
+        fetched.append(params)
+        return {'Credentials': {
+            'AccessKeyId': 'AKIA', 'SecretAccessKey': 'secret', 'SessionToken': 'token',
+            'Expiration': datetime.datetime(2019, 9, 29, 23, 7, 46, tzinfo=tzutc())}}
+
+    sts = Bag(assume_role=assume_role)
+    cache = credentials.CredentialCache(str(tmp_path))
+    with mock.patch.object(credentials, 'credential_cache', cache), \
+            mock.patch.object(credentials, 'get_sts_client', return_value=sts), \
+            freezegun.freeze_time('2019-09-29T22:07:46+00:00'):
+        for i in range(2):
+            session = assumed_session(
+                'arn:aws:iam::644160558196:role/Custodian', 'c7n',
+                session=SessionFactory('us-east-1')(), external_id='abc')
+            assert session.get_credentials().access_key == 'AKIA'
+    assert len(fetched) == 1
+    assert fetched[0]['ExternalId'] == 'abc'
+    assert cache.stats() == {'hits': 1, 'misses': 1}
+
+
+def test_token_bucket_aimd():
+    bucket = credentials.TokenBucket(10)
+    bucket.on_throttle()
+    assert bucket.rate == 5
+    # throttles of calls already in flight only back off once
+    bucket.on_throttle()
+    assert bucket.rate == 5
+    bucket.on_success()
+    assert bucket.rate == 5.2
+    for i in range(100):
+        bucket.on_success()
+    assert bucket.rate == 10
+
+
+def test_api_rate_limiter():
+    assert credentials.ApiRateLimiter.parse_budgets('20, ec2=10,s3=50') == {
+        None: 20, 'ec2': 10, 's3': 50}
+    with pytest.raises(ValueError):
+        credentials.ApiRateLimiter.parse_budgets('ec2=fast')
+    limiter = credentials.ApiRateLimiter('ec2=10')
+    session = SessionFactory('us-east-1')()
+    limiter.register(session, 'dev')
+
+    client = session.client('ec2')
+    client.meta.events.register(
+        'before-call.ec2.DescribeRegions', lambda **kw: (Bag(status_code=200), {}))
+    client.describe_regions()
+    bucket = limiter.get_bucket('dev', 'us-east-1', 'ec2')
+    assert round(bucket.tokens) == 9
+    # no budget for the service
+    assert limiter.get_bucket('dev', 'us-east-1', 's3') is None
+
+    operation = Bag(service_model=Bag(service_name='ec2'))
+    request = {'context': {'client_region': 'us-east-1'}}
+    limiter._observe(
+        'dev', operation, request,
+        response=(Bag(status_code=400), {'Error': {'Code': 'RequestLimitExceeded'}}))
+    assert bucket.rate == 5
+    limiter._observe('dev', operation, request, response=(Bag(status_code=200), {}))
+    assert bucket.rate == 5.2
+    # other accounts and regions have their own budget
+    assert limiter.get_bucket('dev', 'us-west-2', 'ec2').rate == 10
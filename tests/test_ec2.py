@@ -14,6 +14,7 @@ from c7n.exceptions import PolicyValidationError, ClientError
 from c7n.resources import ec2
 from c7n.resources.ec2 import actions, QueryFilter
 from c7n import tags, utils
+from c7n.filters import metrics
 
 from .common import BaseTest
 
@@ -323,6 +324,42 @@ class TestMetricFilter(BaseTest):
         resources = policy.run()
         self.assertEqual(len(resources), 1)
 
+    def test_metric_filter_batch(self):
+        session_factory = self.replay_flight_data("test_metric_filter_batch")
+        self.addCleanup(metrics.metric_data.clear)
+        policy_data = {
+            "name": "ec2-utilization-per-day",
+            "resource": "ec2",
+            "filters": [
+                {
+                    "type": "metrics",
+                    "name": "CPUUtilization",
+                    "days": 3,
+                    "period": 86400,
+                    "value": 1,
+                    "op": "lte",
+                    "batch": True,
+                }
+            ],
+        }
+        policy = self.load_policy(policy_data, session_factory=session_factory)
+        self.assertEqual(
+            policy.resource_manager.filters[0].get_permissions(),
+            ("cloudwatch:GetMetricData",))
+        now = datetime.datetime(2023, 7, 13, 12, 0)
+        with mock_datetime_now(now, metrics):
+            resources = policy.run()
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(
+            [d["Average"] for d in resources[0]["c7n.metrics"]["AWS/EC2.CPUUtilization.Average.3"]],
+            [0.394728034997871, 0.3825404878776848, 0.3891556955496724])
+
+        # metric data is shared with subsequent policies in the run
+        self.patch(metrics.MetricsFilter, "get_metric_data", None)
+        policy = self.load_policy(policy_data, session_factory=session_factory)
+        with mock_datetime_now(now, metrics):
+            self.assertEqual(len(policy.run()), 1)
+
 
 class TestPropagateSpotTags(BaseTest):
 
@@ -2,17 +2,21 @@
 # SPDX-License-Identifier: Apache-2.0
 import copy
 import calendar
+import json
 from collections import namedtuple
 from datetime import datetime, timedelta
 from dateutil import tz
 from dateutil.parser import parse as parse_date
 import random
 import unittest
+from unittest import mock
 import os
 
 from c7n.exceptions import PolicyValidationError, PolicyExecutionError
 from c7n.executor import MainThreadExecutor
 from c7n import filters as base_filters
+from c7n.filters import related
+from c7n.filters.ordering import FilterStats, is_in_memory, order_filters
 from c7n.resources.ec2 import filters
 from c7n.resources.elb import ELB
 from c7n.testing import mock_datetime_now
@@ -158,6 +162,306 @@ class TestNotFilter(unittest.TestCase):
         self.assertFalse(fake.invoked)
 
 
+class TestCompiledFilter(unittest.TestCase):
+
+    resources = [
+        instance(InstanceId="i-0", Architecture="x86_64", Color="green", Size=4, Tags=[
+            {"Key": "Env", "Value": "prod"}, {"Key": "Owner", "Value": "x-12"}]),
+        instance(InstanceId="i-1", Architecture="armv8", Color=None, Size=12, Tags=[]),
+        instance(InstanceId="i-2", Architecture="x86_64", Color="blue", Size="8",
+                 Networks=[{"Cidr": "10.0.0.0/16"}]),
+        instance(InstanceId="i-3", Architecture="X86_64 ", Tags=[{"Key": "Env", "Value": "dev"}]),
+    ]
+
+    def assert_compiled_equal(self, data):
+        # compare against block evaluation with a manager, ie. per filter set
+        # processing with annotation sweeping.
+        manager = Bag(get_model=lambda: Bag(id="InstanceId"))
+        with mock.patch.object(base_filters.ValueFilter, 'compile', return_value=None):
+            f = filters.factory(data, manager)
+            self.assertIsNone(f.compile())
+            expected = f.process(copy.deepcopy(self.resources))
+        f = filters.factory(data, manager)
+        self.assertIsNotNone(f.compile())
+        # or blocks with a manager don't preserve resource order.
+        self.assertEqual(
+            f.process(copy.deepcopy(self.resources)),
+            sorted(expected, key=lambda r: r["InstanceId"]))
+
+    def test_compiled_value_filters(self):
+        for data in (
+            {"Architecture": "x86_64"},
+            {"Color": "absent"},
+            {"Color": "present"},
+            {"Color": "not-null"},
+            {"Tags": "empty"},
+            {"tag:Env": "prod"},
+            {"tag:Env": "absent"},
+            {"type": "value", "key": "Size", "value": 6, "op": "gte"},
+            {"type": "value", "key": "Size", "value": 6, "op": "gte", "value_type": "integer"},
+            {"type": "value", "key": "Architecture", "value": "x86_64",
+             "value_type": "normalize"},
+            {"type": "value", "key": "Color", "value": ["green", "red"], "op": "in"},
+            {"type": "value", "key": "Color", "value": ["green", "red"], "op": "not-in"},
+            {"type": "value", "key": "Networks[].Cidr", "value": "10.0.0.0/16",
+             "op": "contains"},
+            {"type": "value", "key": "tag:Owner", "value_regex": "x-([0-9]+)",
+             "value": "12"},
+            {"type": "value", "key": "Size", "value": "Size", "value_type": "expr"},
+        ):
+            self.assert_compiled_equal(data)
+
+    def test_compiled_blocks(self):
+        for data in (
+            {"or": [{"Architecture": "armv8"}, {"Color": "blue"}]},
+            {"and": [{"Architecture": "x86_64"}, {"tag:Env": "present"}]},
+            {"not": [{"Architecture": "x86_64"}, {"Color": "green"}]},
+            {"or": [{"and": [{"Color": "green"}, {"Size": 4}]}, {"not": [{"Tags": "present"}]}]},
+        ):
+            self.assert_compiled_equal(data)
+
+    def test_compiled_annotation(self):
+        f = filters.factory(
+            {"or": [{"Architecture": "x86_64"}, {"not": [{"Color": "blue"}]}]})
+        results = f.process(copy.deepcopy(self.resources))
+        self.assertEqual(
+            [r.get("c7n:MatchedFilters") for r in results],
+            [["Architecture"], None, ["Architecture"], None])
+
+    def test_uncompiled_filters(self):
+        self.assertIsNone(filters.factory(
+            {"type": "value", "key": "Size", "value_path": "Size"}).compile())
+        self.assertIsNone(filters.factory(
+            {"type": "value", "value_type": "resource_count", "op": "gt", "value": 1}).compile())
+        self.assertIsNone(filters.factory(
+            {"or": [{"Color": "green"}, {"type": "instance-age", "days": 1}]}).compile())
+
+        class Block(base_filters.core.BooleanGroupFilter):
+            pass
+
+        # boolean blocks without a combined matcher are not compiled
+        self.assertIsNone(Block({"block": [{"Color": "green"}]}, filters, None).compile())
+
+
+class TestFilterOrdering(BaseTest):
+
+    def get_filters(self, data):
+        manager = Bag(type="ec2", get_model=lambda: Bag(id="InstanceId"))
+        return manager, [filters.factory(d, manager) for d in data]
+
+    def test_order_filters(self):
+        manager, fs = self.get_filters([
+            {"type": "instance-age", "days": 1},
+            {"tag:Owner": "absent"},
+            {"type": "reduce", "limit": 1},
+            {"type": "instance-uptime", "days": 1},
+            {"State.Name": "running"},
+            {"c7n:MatchedFilters": "present"},
+            {"or": [{"Color": "green"}, {"Size": 4}]},
+        ])
+        resources = [{"Tags": [], "State": {"Name": "running"}, "Color": "red", "Size": 1}]
+        self.assertEqual(
+            order_filters(manager, fs, FilterStats(), resources),
+            [fs[1], fs[0], fs[2], fs[4], fs[3], fs[5], fs[6]])
+
+    def test_order_filters_annotation_dependency(self):
+        # filters reading keys not on the resources, ie. annotations written
+        # by preceding filters under any name, aren't moved ahead of them.
+        manager, fs = self.get_filters([
+            {"type": "metrics", "name": "CPUUtilization", "days": 1, "value": 1, "op": "lt"},
+            {"type": "value", "key": '"c7n.metrics"."AWS/EC2.CPUUtilization.Average.1"',
+             "value": "present"},
+            {"type": "instance-uptime", "days": 1},
+            {"MatchedFilters": "present"},
+            {"type": "instance-age", "days": 1},
+            {"type": "value", "key": "length(Tags)", "value": 0},
+            {"tag:Owner": "absent"},
+        ])
+        resources = [{"InstanceId": "i-1", "Tags": []}]
+        self.assertEqual(
+            order_filters(manager, fs, FilterStats(), resources),
+            [fs[0], fs[1], fs[2], fs[3], fs[4], fs[5], fs[6]])
+        self.assertEqual(
+            order_filters(manager, [fs[4], fs[6], fs[5]], FilterStats(), resources),
+            [fs[6], fs[4], fs[5]])
+
+    def test_order_filters_in_memory(self):
+        _, fs = self.get_filters([
+            {"type": "value", "key": "Color", "value_from": {"url": "s3://bucket/colors"}},
+            {"type": "value", "key": "Color", "value_path": "Colors"},
+            {"and": [{"Color": "green"}, {"type": "instance-age", "days": 1}]},
+            {"not": [{"Color": "green"}]},
+        ])
+        with mock.patch.object(
+                base_filters.ValueFilter, "initialize_content",
+                side_effect=AssertionError("compiled")):
+            self.assertEqual(
+                [is_in_memory(f) for f in fs], [True, False, False, True])
+
+    def test_order_filters_selectivity(self):
+        manager, fs = self.get_filters([
+            {"type": "instance-age", "days": 1},
+            {"State.Name": "running"},
+            {"tag:Owner": "absent"},
+        ])
+        stats = FilterStats()
+        stats.record(stats.get_key(manager, fs[1]), 10, 8)
+        stats.record(stats.get_key(manager, fs[2]), 10, 1)
+        self.assertEqual(stats.selectivity(stats.get_key(manager, fs[0])), 1.0)
+        self.assertEqual(
+            order_filters(manager, fs, stats, [{"State": {}, "Tags": []}]),
+            [fs[2], fs[1], fs[0]])
+
+    def test_filter_stats_flush(self):
+        path = os.path.join(self.get_temp_dir(), "stats", "filter-stats.json")
+        stats = FilterStats().configure(path)
+        stats.record("a", 10, 2)
+        stats.flush()
+        other = FilterStats().configure(path)
+        other.record("a", 10, 0)
+        other.record("b", 1, 1)
+        other.flush()
+        stats.flush()
+        self.assertEqual(FilterStats().configure(path).stats, {"a": [20, 2], "b": [1, 1]})
+        self.assertEqual(other.selectivity("a"), 0.1)
+
+    def test_reorder_policy_filters(self):
+        factory = self.replay_flight_data("test_sqs_delete", region="us-east-2")
+        path = os.path.join(self.get_temp_dir(), "filter-stats.json")
+        p = self.load_policy({
+            "name": "sqs-reorder",
+            "resource": "sqs",
+            "filters": [
+                {"type": "list-item", "key": "Tags", "attrs": [{"Key": "App"}]},
+                {"QueueArn": "absent"}]},
+            config={"region": "us-east-2", "reorder_filters": True, "filter_stats": path},
+            session_factory=factory)
+        with mock.patch.object(
+                base_filters.ListItemFilter, "process",
+                side_effect=AssertionError("not reordered")):
+            self.assertEqual(p.run(), [])
+        with open(path) as fh:
+            self.assertEqual(list(json.load(fh).values()), [[1, 0]])
+
+
+class TestRelatedIndex(unittest.TestCase):
+
+    def get_manager(self, resources, cache="memory", cache_period=10):
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            return resources
+
+        manager = Bag(
+            config=Bag(cache=cache, cache_period=cache_period),
+            get_cache_key=lambda q: {"resource": "subnet", "region": "us-east-1"},
+            get_model=lambda: Bag(id="SubnetId"),
+            resources=fetch)
+        return manager, fetches
+
+    def test_related_index(self):
+        index = related.RelatedIndex()
+        manager, fetches = self.get_manager([
+            {"SubnetId": "s-1", "AvailabilityZone": "a", "Ids": ["x", "y"]},
+            {"SubnetId": "s-2", "AvailabilityZone": "b", "Ids": ["y"]},
+            {"SubnetId": "s-3", "AvailabilityZone": "a"}])
+        self.assertIsNone(index.get(manager, build=False))
+        self.assertEqual(list(index.get(manager).get(["s-1", "s-4"])), ["s-1"])
+        self.assertEqual(
+            [r["SubnetId"] for r in index.get(manager).get_secondary("AvailabilityZone")["a"]],
+            ["s-1", "s-3"])
+        self.assertEqual(
+            {k: len(v) for k, v in index.get(manager).get_secondary("Ids").items()},
+            {"x": 1, "y": 2})
+        self.assertEqual(len(fetches), 1)
+
+        key = index.get_key(manager)
+        index.entries[key] = (index.entries[key][0] - 11 * 60, index.entries[key][1])
+        index.get(manager)
+        self.assertEqual(len(fetches), 2)
+
+    def test_related_index_cache_disabled(self):
+        index = related.RelatedIndex()
+        manager, fetches = self.get_manager([], cache_period=0)
+        self.assertIsNone(index.get(manager))
+        self.assertEqual(fetches, [])
+
+
+class TestUsageIndex(unittest.TestCase):
+
+    def get_manager(self, cache="memory", cache_period=10):
+        return Bag(
+            config=Bag(cache=cache, cache_period=cache_period),
+            get_cache_key=lambda q: {"resource": "security-group", "region": "us-east-1"})
+
+    def test_usage_index(self):
+        index = related.UsageIndex()
+        manager = self.get_manager()
+        scans = []
+
+        def scan():
+            scans.append(1)
+            return {"sg-1": ["eni-1"]}
+
+        self.assertEqual(index.get(manager, "nics", scan), {"sg-1": ["eni-1"]})
+        self.assertEqual(index.get(manager, "nics", scan), {"sg-1": ["eni-1"]})
+        self.assertEqual(index.get(manager, "lambdas", dict), {})
+        self.assertEqual(len(scans), 1)
+
+        key = index.get_key(manager, "nics")
+        index.entries[key] = (index.entries[key][0] - 11 * 60, index.entries[key][1])
+        index.get(manager, "nics", scan)
+        self.assertEqual(len(scans), 2)
+
+    def test_usage_index_prunes_expired(self):
+        index = related.UsageIndex()
+        manager = self.get_manager()
+        index.get(manager, "nics", dict)
+        index.get(manager, "lambdas", dict)
+        key = index.get_key(manager, "nics")
+        index.entries[key] = (index.entries[key][0] - 11 * 60, index.entries[key][1])
+
+        # reading any key drops the expired entries and their locks
+        index.get(manager, "lambdas", dict)
+        self.assertEqual(list(index.entries), [index.get_key(manager, "lambdas")])
+        self.assertEqual(list(index.locks), [index.get_key(manager, "lambdas")])
+
+        index.clear()
+        self.assertEqual((index.entries, index.locks), ({}, {}))
+
+    def test_usage_index_update(self):
+        index = related.UsageIndex()
+        manager = self.get_manager()
+        refs = index.get(manager, "peered-refs", dict)
+        with mock.patch.object(index, "lock") as lock:
+            index.update(refs, {"sg-1": ["vpc-1"]})
+        lock.__enter__.assert_called_once_with()
+        self.assertEqual(index.get(manager, "peered-refs", dict), {"sg-1": ["vpc-1"]})
+
+    def test_usage_index_cache_disabled(self):
+        index = related.UsageIndex()
+        manager = self.get_manager(cache_period=0)
+        self.assertIsNone(index.get_key(manager, "nics"))
+        index.get(manager, "nics", dict)
+        self.assertEqual(index.entries, {})
+
+    def test_usage_filter(self):
+        class Usage(related.UsageFilter):
+            executor_factory = MainThreadExecutor
+
+            def get_scanners(self):
+                return (
+                    ("nics", lambda: {"sg-1": ["eni-1"], "sg-2": ["eni-2"]}),
+                    ("lambdas", lambda: {"sg-2": ["func"], "sg-3": ["func"]}))
+
+        f = Usage({}, self.get_manager(cache_period=0))
+        self.assertEqual(f.get_usage(), {
+            "sg-1": {"nics": ["eni-1"]},
+            "sg-2": {"nics": ["eni-2"], "lambdas": ["func"]},
+            "sg-3": {"lambdas": ["func"]}})
+
+
 class TestValueFilter(unittest.TestCase):
 
     # TODO test_manager needs a valid session_factory object
@@ -1567,6 +1871,8 @@ class ListItemFilterTest(BaseFilterTest):
             ctx = unittest.mock.MagicMock()
         m = Manager()
         m.ctx.options.cache = None
+        m.ctx.filter_stats = None
+        m.ctx.profiler = None
         return m
 
     def instance(self, id_, list_):
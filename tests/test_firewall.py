@@ -27,6 +27,8 @@ class NetworkFirewallTest(BaseTest):
         resources = p.run()
         self.assertEqual(len(resources), 1)
         assert resources[0]['FirewallName'] == 'unicron'
+        assert resources[0]['Tags'] == [
+            {'Key': 'App', 'Value': 'CustodianDev'}, {'Key': 'Owner', 'Value': 'Kapil'}]
 
     def test_firewall_tag_untag(self):
         session_factory = self.replay_flight_data('test_firewall_tag_untag')
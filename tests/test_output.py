@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: Apache-2.0
 import datetime
 import gzip
+import json
 import logging
 import shutil
 from unittest import mock
@@ -11,7 +12,8 @@ from dateutil.parser import parse as date_parse
 
 from c7n.ctx import ExecutionContext
 from c7n.config import Config
-from c7n.output import DirectoryOutput, BlobOutput, LogFile, metrics_outputs
+from c7n.output import (
+    DirectoryOutput, BlobOutput, LogFile, PolicyLogFilter, SpanProfiler, metrics_outputs)
 from c7n.resources.aws import S3Output, MetricsOutput, inspect_bucket_region
 from c7n.testing import mock_datetime_now, TestUtils
 
@@ -121,6 +123,22 @@ class S3OutputTest(TestUtils):
             content = fh.read().strip()
             self.assertTrue(content.endswith("hello world"))
 
+    def test_policy_log_filter(self):
+        record = logging.LogRecord("custodian.s3", logging.INFO, "", 0, "msg", (), None)
+        with PolicyLogFilter() as own:
+            self.assertTrue(own.filter(record))
+            # records from threads not executing a policy are accepted
+            record.thread = -1
+            self.assertTrue(own.filter(record))
+            PolicyLogFilter.active[-1] += 1
+            self.addCleanup(PolicyLogFilter.active.pop, -1)
+            # records from another executing policy's thread are not
+            self.assertFalse(own.filter(record))
+            # nor are unattributed records once several policies execute
+            record.thread = -2
+            self.assertFalse(own.filter(record))
+        self.assertNotIn(own.thread, PolicyLogFilter.active)
+
     def test_compress(self):
         output = self.get_s3_output()
 
@@ -217,3 +235,56 @@ def test_get_bucket_region_http(bucket, endpoint, expected_region, request):
     ):
         region = inspect_bucket_region(bucket, endpoint)
         assert region == expected_region
+
+
+class SpanProfilerTest(BaseTest):
+
+    def test_span_annotate(self):
+        profiler = SpanProfiler()
+        with profiler:
+            with profiler.span('outer', input=2):
+                with profiler.span('inner'):
+                    profiler.annotate(output=1)
+                profiler.annotate(output=2)
+        profiler.annotate(ignored=True)
+        events = {e['name']: e for e in profiler.get_trace()['traceEvents']}
+        self.assertEqual(events['outer']['args'], {'input': 2, 'output': 2})
+        self.assertEqual(events['inner']['args'], {'output': 1})
+        self.assertTrue(events['outer']['ts'] <= events['inner']['ts'])
+        self.assertTrue(events['outer']['dur'] >= events['inner']['dur'])
+
+    def test_sample_stacks(self):
+        profiler = SpanProfiler(sample_stacks=True)
+        with profiler:
+            profiler.sample()
+        self.assertIsNone(profiler.sampler)
+        self.assertIn('test_sample_stacks (test_output.py:', profiler.get_folded_stacks())
+
+    def test_policy_profile(self):
+        factory = self.replay_flight_data('test_sqs_delete', region='us-east-2')
+        output_dir = self.get_temp_dir()
+        p = self.load_policy({
+            'name': 'sqs-profile',
+            'resource': 'sqs',
+            'filters': [
+                {'QueueArn': 'present'},
+                {'or': [
+                    {'type': 'list-item', 'key': 'Tags', 'attrs': [{'Key': 'App'}]},
+                    {'not': [{'QueueArn': 'absent'}]}]}]},
+            config={'region': 'us-east-2', 'profiler': 'spans'},
+            session_factory=factory,
+            output_dir=output_dir)
+        p.run()
+
+        with open(os.path.join(output_dir, 'sqs-profile', 'profile.json')) as fh:
+            trace = json.load(fh)
+        self.assertFalse(os.path.exists(
+            os.path.join(output_dir, 'sqs-profile', 'profile-stacks.txt')))
+        spans = {}
+        for e in trace['traceEvents']:
+            spans.setdefault(e['name'], []).append(e['args'])
+        self.assertTrue({'resource-fetch', 'resource-augment', 'filter'}.issubset(spans))
+        self.assertEqual(spans['filter:value'], [{'input': 1, 'output': 1}])
+        self.assertEqual(spans['filter:or'], [{'input': 1, 'output': 1}])
+        self.assertEqual(spans['filter:list-item'], [{'input': 1, 'output': 0}])
+        self.assertEqual(spans['filter:not'], [{'input': 1, 'output': 1, 'compiled': True}])
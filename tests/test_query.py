@@ -3,13 +3,21 @@
 import json
 import logging
 import os
+from unittest import mock
 
 
-from c7n.query import ResourceQuery, RetryPageIterator, TypeInfo
+from c7n import query, tags
+from c7n.config import Bag
+from c7n.exceptions import ClientError, PolicyValidationError
+from c7n.executor import MainThreadExecutor
+from c7n.query import ChildResourceQuery, ResourceQuery, RetryPageIterator, TypeInfo
 from c7n.resources.vpc import InternetGateway
+from c7n.utils import get_retry
 
+import boto3
 from botocore.config import Config
-from .common import BaseTest, placebo_dir
+from botocore.stub import Stubber
+from .common import BaseTest, mock_manager, placebo_dir
 
 
 class ResourceQueryTest(BaseTest):
@@ -128,6 +136,296 @@ class ConfigSourceTest(BaseTest):
         p.data['query'] = [{'clause': "configuration.imageId = 'xyz'"}]
         self.assertIn("imageId = 'xyz'", source.get_query_params(None)['expr'])
 
+    def get_stubbed_client(self):
+        client = boto3.Session(region_name='us-east-1').client('config')
+        stubber = Stubber(client)
+        self.addCleanup(stubber.deactivate)
+        self.patch(query, 'local_session', lambda factory: Bag(client=lambda *a: client))
+        return client, stubber
+
+    def get_item(self, instance_id, tags=None, **kw):
+        config = {'instanceId': instance_id}
+        if tags is not None:
+            config['tags'] = [{'key': k, 'value': v} for k, v in tags.items()]
+        return dict(
+            resourceId=instance_id,
+            configuration=json.dumps(config),
+            supplementaryConfiguration={}, **kw)
+
+    def test_config_batch_get_resources(self):
+        _, stubber = self.get_stubbed_client()
+        self.patch(query.time, 'sleep', lambda delay: None)
+        keys = [{'resourceType': 'AWS::EC2::Instance', 'resourceId': i}
+                for i in ('i-1', 'i-2')]
+        stubber.add_response(
+            'batch_get_resource_config',
+            {'baseConfigurationItems': [self.get_item('i-1', tags={})],
+             'unprocessedResourceKeys': keys[1:]},
+            {'resourceKeys': keys})
+        stubber.add_response(
+            'batch_get_resource_config',
+            {'baseConfigurationItems': [self.get_item('i-2', tags={'App': 'x'})]},
+            {'resourceKeys': keys[1:]})
+        stubber.activate()
+
+        p = self.load_policy({'name': 'x', 'resource': 'ec2', 'source': 'config'})
+        resources = p.resource_manager.source.get_resources(['i-1', 'i-2'])
+        self.assertEqual(
+            [(r['InstanceId'], r['Tags']) for r in resources],
+            [('i-1', []), ('i-2', [{'Key': 'App', 'Value': 'x'}])])
+        stubber.assert_no_pending_responses()
+
+    def get_stubbed_tagging(self):
+        client = boto3.Session(region_name='us-east-1').client('resourcegroupstaggingapi')
+        stubber = Stubber(client)
+        self.addCleanup(stubber.deactivate)
+        self.patch(
+            tags.utils, 'local_session', lambda factory: Bag(client=lambda *a, **kw: client))
+        return stubber
+
+    def test_config_batch_get_resources_missing_tags(self):
+        # tags missing from a chunk of configuration items are fetched in bulk
+        ids = ['i-%d' % i for i in range(100)]
+        _, stubber = self.get_stubbed_client()
+        stubber.add_response(
+            'batch_get_resource_config',
+            {'baseConfigurationItems': [self.get_item(i) for i in ids]},
+            {'resourceKeys': [{'resourceType': 'AWS::EC2::Instance', 'resourceId': i}
+                              for i in ids]})
+        stubber.activate()
+        p = self.load_policy({'name': 'x', 'resource': 'ec2', 'source': 'config'})
+        arns = p.resource_manager.get_arns([{'InstanceId': i} for i in ids])
+        tagging = self.get_stubbed_tagging()
+        tagging.add_response(
+            'get_resources',
+            {'ResourceTagMappingList': [
+                {'ResourceARN': arns[0], 'Tags': [{'Key': 'App', 'Value': 'x'}]}]},
+            {'ResourceARNList': arns})
+        tagging.activate()
+
+        self.assertIn('tag:GetResources', p.resource_manager.get_permissions())
+        resources = p.resource_manager.source.get_resources(ids)
+        self.assertEqual(len(resources), 100)
+        self.assertEqual(resources[0]['Tags'], [{'Key': 'App', 'Value': 'x'}])
+        self.assertTrue(all(r['Tags'] == [] for r in resources[1:]))
+        # one batch get and one tagging call for the chunk
+        stubber.assert_no_pending_responses()
+        tagging.assert_no_pending_responses()
+
+    def test_config_batch_get_resources_tagging_denied(self):
+        # without tag:GetResources missing tags are loaded from history
+        _, stubber = self.get_stubbed_client()
+        stubber.add_response(
+            'batch_get_resource_config',
+            {'baseConfigurationItems': [self.get_item('i-1'), self.get_item('i-2')]},
+            {'resourceKeys': [{'resourceType': 'AWS::EC2::Instance', 'resourceId': i}
+                              for i in ('i-1', 'i-2')]})
+        stubber.add_response(
+            'get_resource_config_history',
+            {'configurationItems': [self.get_item('i-1', tags={'App': 'x'})]},
+            {'resourceId': 'i-1', 'resourceType': 'AWS::EC2::Instance', 'limit': 1})
+        stubber.add_response(
+            'get_resource_config_history',
+            {'configurationItems': []},
+            {'resourceId': 'i-2', 'resourceType': 'AWS::EC2::Instance', 'limit': 1})
+        stubber.activate()
+        tagging = self.get_stubbed_tagging()
+        tagging.add_client_error('get_resources', 'AccessDeniedException')
+        tagging.activate()
+
+        p = self.load_policy({'name': 'x', 'resource': 'ec2', 'source': 'config'})
+        resources = p.resource_manager.source.get_resources(['i-1', 'i-2'])
+        self.assertEqual(
+            [(r['InstanceId'], r['Tags']) for r in resources],
+            [('i-1', [{'Key': 'App', 'Value': 'x'}])])
+        stubber.assert_no_pending_responses()
+        tagging.assert_no_pending_responses()
+
+    def test_config_batch_get_denied_history(self):
+        # without config:BatchGetResourceConfig resources are loaded from history
+        _, stubber = self.get_stubbed_client()
+        stubber.add_client_error(
+            'batch_get_resource_config', 'AccessDeniedException',
+            expected_params={'resourceKeys': [
+                {'resourceType': 'AWS::EC2::Instance', 'resourceId': 'i-1'}]})
+        stubber.add_response(
+            'get_resource_config_history',
+            {'configurationItems': [self.get_item('i-1', tags={'App': 'x'})]},
+            {'resourceId': 'i-1', 'resourceType': 'AWS::EC2::Instance', 'limit': 1})
+        stubber.activate()
+
+        p = self.load_policy({'name': 'x', 'resource': 'ec2', 'source': 'config'})
+        self.assertIn(
+            'config:GetResourceConfigHistory', p.resource_manager.get_permissions())
+        resources = p.resource_manager.source.get_resources(['i-1'])
+        self.assertEqual(
+            [(r['InstanceId'], r['Tags']) for r in resources],
+            [('i-1', [{'Key': 'App', 'Value': 'x'}])])
+        stubber.assert_no_pending_responses()
+
+    def test_config_stream_filters(self):
+        _, stubber = self.get_stubbed_client()
+        expr = ("select resourceId, configuration, supplementaryConfiguration "
+                "where resourceType = 'AWS::EC2::Instance'")
+
+        def get_item(instance_id, instance_type):
+            return json.dumps(dict(
+                resourceId=instance_id, supplementaryConfiguration={},
+                configuration=json.dumps(
+                    {'instanceId': instance_id, 'instanceType': instance_type,
+                     'launchTime': '2020-01-01T00:00:00.000Z'})))
+
+        stubber.add_response(
+            'select_resource_config',
+            {'Results': [get_item('i-1', 't2.micro'), get_item('i-2', 'm5.large')],
+             'NextToken': 'abc'},
+            {'Expression': expr})
+        stubber.add_response(
+            'select_resource_config',
+            {'Results': [get_item('i-3', 't2.micro')]},
+            {'Expression': expr, 'NextToken': 'abc'})
+        stubber.activate()
+
+        p = self.load_policy({
+            'name': 'x', 'resource': 'ec2', 'source': 'config',
+            'filters': [
+                {'InstanceType': 't2.micro'},
+                {'type': 'instance-uptime', 'days': 1},
+                {'InstanceId': 'i-3'}]})
+        manager = p.resource_manager
+        self.assertEqual(manager.get_stream_filters(), manager.filters[:1])
+        manager.stream_chunk_size = 1
+        streamed = []
+        self.patch(manager, 'augment', lambda resources: streamed.extend(resources) or resources)
+        with mock.patch.object(manager, 'check_resource_limit') as check_limit, \
+                mock.patch.object(
+                    manager, 'filter_resources', wraps=manager.filter_resources) as filtered:
+            resources = manager.resources()
+        self.assertEqual([r['InstanceId'] for r in resources], ['i-3'])
+        # each resource is augmented and filtered as it arrives, and the
+        # limit is checked against the whole population.
+        self.assertEqual([r['InstanceId'] for r in streamed], ['i-1', 'i-2', 'i-3'])
+        self.assertEqual(
+            [c.kwargs['filters'] for c in filtered.call_args_list[:3]],
+            [manager.filters[:1]] * 3)
+        check_limit.assert_called_once_with(1, 3)
+        stubber.assert_no_pending_responses()
+
+    def test_config_stream_filters_cached(self):
+        config = self._get_policy_config(cache=True)
+        p = self.load_policy({
+            'name': 'x', 'resource': 'ec2', 'source': 'config',
+            'filters': [{'InstanceType': 't2.micro'}]}, config=config)
+        # the cache holds the full population
+        self.assertEqual(p.resource_manager.get_stream_filters(), [])
+
+    def test_config_listed_resources_error(self):
+        client, stubber = self.get_stubbed_client()
+        stubber.add_response(
+            'list_discovered_resources',
+            {'resourceIdentifiers': [{'resourceId': 'i-%d' % i} for i in range(3)]},
+            {'resourceType': 'AWS::EC2::Instance'})
+        stubber.activate()
+
+        p = self.load_policy({'name': 'x', 'resource': 'ec2', 'source': 'config'})
+        source = p.resource_manager.source
+        source.batch_size = 1
+        self.patch(p.resource_manager, 'executor_factory', MainThreadExecutor)
+        fetched = []
+
+        def get_resource_set(client, ids):
+            fetched.extend(ids)
+            if ids == ['i-1']:
+                raise ClientError({'Error': {'Code': 'AccessDenied'}}, 'BatchGetResourceConfig')
+            return [{'InstanceId': i} for i in ids]
+
+        self.patch(source, 'get_resource_set', get_resource_set)
+        with self.assertRaises(ClientError):
+            source.get_listed_resources(client)
+        # every batch is fetched before the error is raised
+        self.assertEqual(sorted(fetched), ['i-0', 'i-1', 'i-2'])
+
+    def test_config_aggregator_id_expressions(self):
+        p = self.load_policy({
+            'name': 'x', 'resource': 'ec2', 'source': 'config-aggregator',
+            'query': [{'aggregator': 'org'}]})
+        source = p.resource_manager.source
+        source.batch_size = 2
+        self.assertEqual(
+            list(source.get_id_expressions('select 1', ['a', 'b', 'c'])),
+            ["select 1 AND resourceId IN ('a', 'b')", "select 1 AND resourceId IN ('c')"])
+        source.batch_size = 100
+        source.expression_size = 43
+        self.assertEqual(
+            list(source.get_id_expressions('select 1', ['aaaa', 'bbbb', 'cccc'])),
+            ["select 1 AND resourceId IN ('aaaa', 'bbbb')",
+             "select 1 AND resourceId IN ('cccc')"])
+
+    def test_config_aggregator_source(self):
+        _, stubber = self.get_stubbed_client()
+        expr = ("select resourceId, accountId, awsRegion, configuration, "
+                "supplementaryConfiguration where resourceType = 'AWS::EC2::Instance' "
+                "AND configuration.instanceType = 't2.micro'")
+        stubber.add_response(
+            'select_aggregate_resource_config',
+            {'Results': [json.dumps(self.get_item(
+                'i-1', accountId='111111111111', awsRegion='us-east-1'))],
+             'NextToken': 'abc'},
+            {'Expression': expr, 'ConfigurationAggregatorName': 'org'})
+        stubber.add_response(
+            'select_aggregate_resource_config',
+            {'Results': [json.dumps(self.get_item(
+                'i-2', accountId='222222222222', awsRegion='us-west-2'))]},
+            {'Expression': expr, 'ConfigurationAggregatorName': 'org', 'NextToken': 'abc'})
+        stubber.activate()
+
+        p = self.load_policy({
+            'name': 'x', 'resource': 'ec2', 'source': 'config-aggregator',
+            'query': [{'aggregator': 'org'},
+                      {'clause': "configuration.instanceType = 't2.micro'"}]})
+        self.assertIn(
+            'config:SelectAggregateResourceConfig', p.resource_manager.get_permissions())
+        resources = p.resource_manager.source.resources()
+        self.assertEqual(
+            [(r['InstanceId'], r['c7n:account-id'], r['c7n:region']) for r in resources],
+            [('i-1', '111111111111', 'us-east-1'), ('i-2', '222222222222', 'us-west-2')])
+        stubber.assert_no_pending_responses()
+
+    def test_config_aggregator_cache_key(self):
+        _, stubber = self.get_stubbed_client()
+        expr = ("select resourceId, accountId, awsRegion, configuration, "
+                "supplementaryConfiguration where resourceType = 'AWS::EC2::Instance'")
+        for aggregator, account_id in (('org-a', '111111111111'), ('org-b', '222222222222')):
+            stubber.add_response(
+                'select_aggregate_resource_config',
+                {'Results': [json.dumps(self.get_item(
+                    'i-1', accountId=account_id, awsRegion='us-east-1'))]},
+                {'Expression': expr, 'ConfigurationAggregatorName': aggregator})
+        stubber.activate()
+
+        config = self._get_policy_config(cache=True)
+        accounts = []
+        for aggregator in ('org-a', 'org-b', 'org-a'):
+            p = self.load_policy({
+                'name': 'x', 'resource': 'ec2', 'source': 'config-aggregator',
+                'query': [{'aggregator': aggregator}]}, config=config)
+            accounts.extend(r['c7n:account-id'] for r in p.resource_manager.resources())
+        # each aggregator is fetched once, and served from its own cache entry
+        self.assertEqual(accounts, ['111111111111', '222222222222', '111111111111'])
+        stubber.assert_no_pending_responses()
+
+    def test_config_aggregator_validate(self):
+        with self.assertRaises(PolicyValidationError) as e:
+            self.load_policy({
+                'name': 'x', 'resource': 'ec2', 'source': 'config-aggregator',
+                'query': [{'clause': "configuration.instanceType = 't2.micro'"}]})
+        self.assertIn('requires an aggregator', str(e.exception))
+        with self.assertRaises(PolicyValidationError) as e:
+            self.load_policy({
+                'name': 'x', 'resource': 'ec2', 'source': 'config-aggregator',
+                'query': [{'aggregator': 'org'}], 'actions': ['stop']})
+        self.assertIn('does not support actions', str(e.exception))
+
 
 class QueryResourceManagerTest(BaseTest):
 
@@ -164,3 +462,99 @@ class QueryResourceManagerTest(BaseTest):
         self.assertEqual(len(resources), 1)
         resources = p.resource_manager.get_resources(["igw-5bce113f"])
         self.assertEqual(resources, [])
+
+    def test_get_resources_cache_update(self):
+        session_factory = self.replay_flight_data("test_query_manager_get")
+        p = self.load_policy(
+            {"name": "igw-check", "resource": "internet-gateway"},
+            session_factory=session_factory,
+        )
+        cache = p.resource_manager._cache = mock.MagicMock()
+        cache.get_resources.return_value = None
+        resources = p.resource_manager.get_resources(["igw-2e65104a"])
+        self.assertEqual(len(resources), 1)
+        cache.update_resources.assert_called_once_with(
+            p.resource_manager.get_cache_key(None), resources, "InternetGatewayId")
+        # fetches bypassing the cache leave it untouched
+        p.resource_manager.get_resources(["igw-5bce113f"], cache=False)
+        self.assertEqual(cache.update_resources.call_count, 1)
+        self.assertEqual(cache.get_resources.call_count, 1)
+
+
+class ChildResourceQueryTest(BaseTest):
+
+    class resource_type(TypeInfo):
+        service = 'kids'
+        enum_spec = ('list_children', 'Children', None)
+        parent_spec = ('parent', 'ParentId', True)
+        id = 'Id'
+
+    def get_query(self, children):
+        calls = []
+
+        def list_children(ParentId):
+            calls.append(ParentId)
+            response = children[ParentId]
+            if isinstance(response, Exception):
+                raise response
+            if ParentId == 'b' and calls.count('b') == 1:
+                raise ClientError({'Error': {'Code': 'Throttling'}}, 'ListChildren')
+            return {'Children': [{'Id': c} for c in response]}
+
+        client = mock.MagicMock()
+        client.can_paginate.return_value = False
+        client.list_children.side_effect = list_children
+        manager = mock_manager()
+        manager.resource_type = self.resource_type
+        manager.get_client.return_value = client
+        manager.retry = get_retry(('Throttling',), min_delay=0.01)
+        return ChildResourceQuery(None, manager), manager, calls
+
+    def test_child_query_fan_out(self):
+        q, manager, calls = self.get_query({
+            'a': ['a1', 'a2'], 'b': ['b1'],
+            'c': ClientError({'Error': {'Code': 'NoSuchParent'}}, 'ListChildren'),
+            'd': ['d1']})
+        resources = q.filter(manager, parent_ids=['a', 'b', 'c', 'd'])
+        self.assertEqual(
+            [(r['Id'], r['c7n:parent-id']) for r in resources],
+            [('a1', 'a'), ('a2', 'a'), ('b1', 'b'), ('d1', 'd')])
+        self.assertEqual(sorted(calls), ['a', 'b', 'b', 'c', 'd'])
+
+    def test_child_query_capture_parent(self):
+        q, manager, _ = self.get_query({'a': ['a1'], 'b': ['b1']})
+        q.capture_parent_id = True
+        resources = q.filter(manager, parent_ids=['a', 'b'])
+        self.assertEqual(
+            [(p, r['Id']) for p, r in resources], [('a', 'a1'), ('b', 'b1')])
+
+    def test_child_query_error(self):
+        q, manager, calls = self.get_query({
+            'a': ['a1'],
+            'b': ClientError({'Error': {'Code': 'AccessDenied'}}, 'ListChildren')})
+        self.patch(ChildResourceQuery, 'executor_factory', MainThreadExecutor)
+        with self.assertRaises(ClientError):
+            q.filter(manager, parent_ids=['a', 'b'])
+        self.assertEqual(calls, ['a', 'b'])
+
+    def test_child_query_by_parent(self):
+        q, manager, calls = self.get_query({'a': ['a1'], 'b': ['b1', 'b2']})
+        children = q.get_children_by_parent(manager, ['a', 'b'], {})
+        self.assertEqual(
+            {k: [r['Id'] for r in v] for k, v in children.items()},
+            {'a': ['a1'], 'b': ['b1', 'b2']})
+        # b is retried after throttling
+        self.assertEqual(sorted(calls), ['a', 'b', 'b'])
+
+    def test_child_query_parent_ids(self):
+        q, manager, calls = self.get_query({'a': ['a1']})
+        parents = manager.get_resource_manager.return_value = mock_manager(
+            cache='memory', cache_period=5)
+        parents.resource_type.id = 'Id'
+        parents.resources.return_value = [{'Id': 'a'}]
+        self.addCleanup(query.parent_id_index.clear)
+        self.assertEqual(q.get_parent_ids('parent'), ['a'])
+        self.assertEqual(q.get_parent_ids('parent'), ['a'])
+        self.assertEqual(parents.resources.call_count, 1)
+        self.assertEqual([r['Id'] for r in q.filter(manager)], ['a1'])
+        self.assertEqual(calls, ['a'])
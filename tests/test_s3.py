@@ -1390,6 +1390,90 @@ class S3Test(BaseTest):
                 'Retention': '2', 'Retention2': '3', 'test': 'test'})
         self.assertTrue("CreationDate" in resources[0])
 
+    def test_bucket_augment_filter_keys(self):
+        self.patch(s3.S3, "executor_factory", MainThreadExecutor)
+        # no recorded responses for policy or acl augments.
+        self.patch(s3, "S3_AUGMENT_TABLE", [
+            ('get_bucket_tagging', 'Tags', [], 'TagSet'),
+            ('get_bucket_policy', 'Policy', None, 'Policy'),
+            ('get_bucket_acl', 'Acl', None, None)])
+        session_factory = self.replay_flight_data("test_s3_get_resources")
+        p = self.load_policy(
+            {"name": "bucket-fetch", "resource": "s3",
+             "filters": [{"tag:Env": "Dev"}]},
+            session_factory=session_factory)
+        self.assertEqual(p.resource_manager.get_augment_keys(), {'Location', 'Tags'})
+        self.assertEqual(
+            p.resource_manager.get_cache_key(None)['augment'], ['Location', 'Tags'])
+        resources = p.resource_manager.resources()
+        self.assertEqual(len(resources), 1)
+        self.assertEqual(len(resources[0]['Tags']), 6)
+        self.assertNotIn('Policy', resources[0])
+        # buckets fetched by id are fully augmented
+        with mock.patch.object(
+                s3, 'assemble_bucket', side_effect=lambda item, keys: item[1]) as assemble:
+            p.resource_manager.get_resources(['c7n-codebuild'], cache=False)
+        self.assertEqual(assemble.call_args[1], {'keys': None})
+        self.assertEqual(p.resource_manager.get_augment_keys(), {'Location', 'Tags'})
+
+    def test_bucket_augment_unknown_dependencies(self):
+        # filters and actions without known dependencies get the full augment
+        unknown_filters = set(s3.filters.keys()).difference(s3.S3_AUGMENT_DEPENDENCIES)
+        unknown_filters.discard('value')
+        unknown_actions = set(s3.actions.keys()).difference(s3.S3_AUGMENT_DEPENDENCIES)
+        self.assertIn('is-log-target', unknown_filters)
+        p = self.load_policy({"name": "s3-keys", "resource": "s3", "filters": [{"Name": "abc"}]})
+        manager = p.resource_manager
+        for f in unknown_filters:
+            manager.filters = [s3.filters[f]({'type': f}, manager)]
+            self.assertEqual(manager.get_augment_keys(), None, f)
+        manager.filters = []
+        for a in unknown_actions:
+            manager.actions = [s3.actions[a]({'type': a}, manager)]
+            self.assertEqual(manager.get_augment_keys(), None, a)
+
+        p = self.load_policy({
+            "name": "s3-keys", "resource": "s3",
+            "filters": [{"Name": "abc"}, {"type": "is-log-target"}]})
+        with mock.patch.object(
+                s3, 'assemble_bucket', side_effect=lambda item, keys: item[1]) as assemble:
+            p.resource_manager.source.augment([{'Name': 'abc'}])
+        self.assertEqual(assemble.call_args[1], {'keys': None})
+
+    def test_bucket_augment_keys(self):
+
+        def get_keys(**data):
+            p = self.load_policy(dict(name="s3-keys", resource="s3", **data))
+            return p.resource_manager.get_augment_keys()
+
+        self.assertEqual(get_keys(), None)
+        self.assertEqual(
+            get_keys(filters=[
+                {"or": [
+                    {"Versioning.Status": "Enabled"},
+                    {"type": "has-statement", "statement_ids": ["Deny"]}]},
+                {"Name": "abc"},
+                {"type": "bucket-encryption", "state": False}],
+                actions=[{"type": "mark-for-op", "op": "delete", "days": 1}]),
+            {'Location', 'Versioning', 'Policy', 'Tags'})
+        self.assertEqual(get_keys(filters=[{"type": "is-log-target"}]), None)
+        self.assertEqual(get_keys(filters=[{"Unknown": "abc"}]), None)
+        self.assertEqual(
+            get_keys(filters=[{"type": "value", "key": "length(Tags)", "value": 1}]), None)
+        self.assertEqual(
+            get_keys(filters=[{"Name": "abc"}], actions=[
+                {"type": "invoke-lambda", "function": "process"}]), None)
+        self.assertEqual(
+            get_keys(filters=[{"tag:Env": "Dev"}], actions=[
+                {"type": "notify", "to": ["a@example.com"],
+                 "transport": {"type": "sqs", "queue": "abc"}}]), None)
+        self.assertEqual(
+            self.load_policy({
+                "name": "s3-config", "resource": "s3", "source": "config",
+                "filters": [{"Name": "abc"}]}).resource_manager.get_cache_key(None).get(
+                    'augment', 'absent'),
+            'absent')
+
     def test_multipart_large_file(self):
         self.patch(s3.S3, "executor_factory", MainThreadExecutor)
         self.patch(s3.EncryptExtantKeys, "executor_factory", MainThreadExecutor)
@@ -7,11 +7,15 @@ import time
 from freezegun import freeze_time
 from mock import MagicMock, call
 
-from c7n.tags import universal_retry, coalesce_copy_user_tags
-from c7n.exceptions import PolicyExecutionError, PolicyValidationError
+from c7n.config import Bag
+from c7n.tags import (
+    TagIndex, UniversalTag, UniversalUntag, tag_index, universal_augment, universal_retry,
+    coalesce_copy_user_tags)
+from c7n.exceptions import ClientError, PolicyExecutionError, PolicyValidationError
+from c7n import utils
 from c7n.utils import yaml_load
 
-from .common import BaseTest
+from .common import BaseTest, mock_manager
 
 import pytest
 from pytest_terraform import terraform
@@ -603,3 +607,109 @@ class CopyRelatedResourceTag(BaseTest):
             ]
         }
         self.assertRaises(PolicyValidationError, self.load_policy, policy)
+
+
+class TagIndexTest(BaseTest):
+
+    def get_manager(self, service, arn_type, **config):
+        manager = mock_manager(bulk_tags=True, region='us-east-1', **config)
+        manager.get_model.return_value = Bag(
+            service=service, arn_service=None, arn_type=arn_type, universal_taggable=True,
+            id='Id')
+        return manager
+
+    def get_client(self):
+        def paginate(ResourceTypeFilters, ResourcesPerPage):
+            if 'bad:thing' in ResourceTypeFilters:
+                raise ClientError(
+                    {'Error': {'Code': 'InvalidParameterException'}}, 'GetResources')
+            return [{'ResourceTagMappingList': [
+                {'ResourceARN': 'arn:aws:%s/%d' % (t, idx),
+                 'Tags': [{'Key': 'App', 'Value': t}]}
+                for t in ResourceTypeFilters for idx in range(2)]}]
+
+        client = MagicMock()
+        client.meta.region_name = 'us-east-1'
+        client.get_paginator.return_value.paginate.side_effect = paginate
+        return client
+
+    def test_tag_index(self):
+        index = TagIndex()
+        index.add_types([
+            Bag(service='sqs', arn_service=None, arn_type='', universal_taggable=True),
+            Bag(service='ec2', arn_service=None, arn_type='instance',
+                universal_taggable=False),
+            Bag(service='bad', arn_service=None, arn_type='thing',
+                universal_taggable=object())])
+        self.assertEqual(index.types, {'sqs', 'bad:thing'})
+
+        client = self.get_client()
+        tags = index.get(self.get_manager('lambda', 'function'), client)
+        self.assertEqual(
+            sorted(tags), ['arn:aws:lambda:function/0', 'arn:aws:lambda:function/1',
+                           'arn:aws:sqs/0', 'arn:aws:sqs/1'])
+        self.assertIsNone(index.get(self.get_manager('bad', 'thing'), client))
+        self.assertIs(index.get(self.get_manager('sqs', ''), client), tags)
+        # batched call, then a call per type on error
+        self.assertEqual(
+            [c.kwargs['ResourceTypeFilters'] for c in
+             client.get_paginator.return_value.paginate.call_args_list],
+            [['bad:thing', 'lambda:function', 'sqs'], ['bad:thing'],
+             ['lambda:function'], ['sqs']])
+
+    def test_tag_index_prunes_expired(self):
+        index = TagIndex()
+        client = self.get_client()
+        manager = self.get_manager('sqs', '', cache_period=10)
+        index.get(manager, client)
+        index.indexes[(manager.config.account_id, 'us-east-1')]['created'] -= 11 * 60
+
+        # reading any account drops the expired ones and their locks
+        index.get(self.get_manager('sqs', '', cache_period=10, account_id='123'), client)
+        self.assertEqual(list(index.indexes), [('123', 'us-east-1')])
+        self.assertEqual(list(index.locks), [('123', 'us-east-1')])
+
+    def test_universal_augment_bulk(self):
+        client = self.get_client()
+        self.patch(utils, 'local_session', lambda factory: Bag(client=lambda *a, **kw: client))
+        self.addCleanup(tag_index.clear)
+        manager = self.get_manager('sqs', '')
+        manager.region = 'us-east-1'
+        manager.resource_type = manager.get_model.return_value
+        manager.get_arns.side_effect = lambda resources: [
+            'arn:aws:sqs/%d' % r['Id'] for r in resources]
+        resources = universal_augment(manager, [{'Id': 1}, {'Id': 2}, {'Id': 3, 'Tags': []}])
+        self.assertEqual(resources, [
+            {'Id': 1, 'Tags': [{'Key': 'App', 'Value': 'sqs'}]},
+            {'Id': 2, 'Tags': []},
+            {'Id': 3, 'Tags': []}])
+        client.get_resources.assert_not_called()
+
+    def test_tag_index_invalidated_by_tag_actions(self):
+        client = self.get_client()
+        client.tag_resources.return_value = {}
+        client.untag_resources.return_value = {}
+        client.get_resources.return_value = {'ResourceTagMappingList': [
+            {'ResourceARN': 'arn:aws:sqs/0', 'Tags': [{'Key': 'Env', 'Value': 'dev'}]}]}
+        self.patch(utils, 'local_session', lambda factory: Bag(client=lambda *a, **kw: client))
+        self.addCleanup(tag_index.clear)
+        manager = self.get_manager('sqs', '')
+        manager.region = 'us-east-1'
+        manager.resource_type = manager.get_model.return_value
+        manager.get_arns.side_effect = lambda resources: [
+            'arn:aws:sqs/%d' % r['Id'] for r in resources]
+
+        self.assertEqual(
+            universal_augment(manager, [{'Id': 0}])[0]['Tags'], [{'Key': 'App', 'Value': 'sqs'}])
+        UniversalTag({'tags': {'Env': 'dev'}}, manager).process([{'Id': 0}])
+        self.assertEqual(
+            universal_augment(manager, [{'Id': 0}])[0]['Tags'], [{'Key': 'Env', 'Value': 'dev'}])
+        client.get_resources.assert_called_once_with(ResourceARNList=['arn:aws:sqs/0'])
+        # refetched tags are served from the index again
+        universal_augment(manager, [{'Id': 0}])
+        self.assertEqual(client.get_resources.call_count, 1)
+
+        client.get_resources.return_value = {'ResourceTagMappingList': []}
+        UniversalUntag({'tags': ['Env']}, manager).process([{'Id': 0}])
+        self.assertEqual(universal_augment(manager, [{'Id': 0}])[0]['Tags'], [])
+        self.assertEqual(client.get_resources.call_count, 2)
@@ -9,6 +9,7 @@ from unittest import mock
 
 from botocore.exceptions import ClientError
 from dateutil.parser import parse as parse_date
+from dateutil.tz import tzutc
 
 from c7n import query
 from c7n import utils
@@ -196,6 +197,14 @@ class UtilTest(BaseTest):
                      'userName': [
                          {'anything-but': 'deputy'}]}}})
 
+    def test_file_lock(self):
+        path = os.path.join(self.get_temp_dir(), 'x.lock')
+        with utils.file_lock(path):
+            self.assertTrue(os.path.exists(path))
+        with mock.patch.object(utils, 'fcntl', None):
+            with utils.file_lock(os.path.join(self.get_temp_dir(), 'y.lock')):
+                pass
+
     def test_local_session_region(self):
         policies = [
             self.load_policy(
@@ -296,6 +305,39 @@ class UtilTest(BaseTest):
         IPV4_list2 = utils.IPv4List([n3, n4])
         self.assertFalse(a1 in IPV4_list2)
 
+    def test_ipv4_list_other_versions(self):
+        ipv4_list = utils.IPv4List([
+            utils.IPv4Network(u"10.0.0.0/8"), ipaddress.ip_address(u"192.168.1.1")])
+        self.assertFalse(ipaddress.ip_network(u"2001:db8::/32") in ipv4_list)
+        self.assertFalse(ipaddress.ip_address(u"::1") in ipv4_list)
+        self.assertFalse(None in ipv4_list)
+        self.assertTrue(ipaddress.ip_network(u"10.1.0.0/16") in ipv4_list)
+
+    def test_cidr_set(self):
+        cidrs = utils.CidrSet([
+            u"10.0.0.0/8", u"10.0.1.0/24", u"172.16.0.0/12", u"2001:db8::/32"])
+        self.assertEqual(len(cidrs), 4)
+        self.assertTrue(cidrs.supernet_of(u"10.2.0.0/16"))
+        self.assertTrue(cidrs.supernet_of(ipaddress.ip_address(u"172.16.3.4")))
+        self.assertTrue(cidrs.supernet_of(u"2001:db8:1::/48"))
+        self.assertFalse(cidrs.supernet_of(u"0.0.0.0/0"))
+        self.assertFalse(cidrs.supernet_of(u"11.0.0.0/8"))
+
+        self.assertTrue(cidrs.subnet_of(u"10.0.0.0/16"))
+        self.assertTrue(cidrs.subnet_of(u"0.0.0.0/0"))
+        self.assertTrue(cidrs.subnet_of(u"2001::/16"))
+        self.assertFalse(cidrs.subnet_of(u"10.0.2.0/24"))
+        self.assertFalse(cidrs.subnet_of(u"192.168.0.0/16"))
+
+        self.assertTrue(cidrs.overlaps(u"10.0.2.0/24"))
+        self.assertTrue(cidrs.overlaps(u"0.0.0.0/0"))
+        self.assertFalse(cidrs.overlaps(u"192.168.0.0/16"))
+        self.assertFalse(cidrs.overlaps(u"2002::/16"))
+
+    def test_parse_cidr_cached(self):
+        self.assertIs(utils.parse_cidr(u"10.0.0.0/16"), utils.parse_cidr(u"10.0.0.0/16"))
+        self.assertIsNone(utils.parse_cidr(u"10.0.0.1/16"))
+
     def test_chunks(self):
         self.assertEqual(
             list(utils.chunks(range(100), size=50)),
@@ -414,6 +456,27 @@ class UtilTest(BaseTest):
         for k in r:
             assert r[k].strftime('%Y/%m/%d') == '2021/01/05'
 
+    def test_camel_case_implicit_iso_dates(self):
+        dates = ['2021-01-05T13:43:26.749Z', '2021-01-05T13:43:26+00:00',
+                 '2021-01-05 13:43:26', 'Tue, 05 Jan 2021 13:43:26 GMT']
+        for d in dates:
+            r = utils.camelResource({'createTime': d}, implicitDate=True)
+            self.assertEqual(r['CreateTime'], utils.parse_date(d))
+            self.assertEqual(r['CreateTime'].tzinfo, tzutc())
+        r = utils.camelResource({'updateDate': 'never'}, implicitDate=True)
+        self.assertEqual(r, {'UpdateDate': 'never'})
+
+    def test_camel_case_in_place(self):
+        d = {'name': 'a', 'tags': {'env': 'dev'}}
+        r = utils.camelResource(d)
+        self.assertIs(r, d)
+        self.assertEqual(d, {'Name': 'a', 'Tags': {'Env': 'dev'}})
+
+    def test_camel_case_collision(self):
+        # renamed keys take precedence regardless of order
+        self.assertEqual(utils.camelResource({'Name': 'a', 'name': 'b'}), {'Name': 'b'})
+        self.assertEqual(utils.camelResource({'name': 'b', 'Name': 'a'}), {'Name': 'b'})
+
     def test_camel_case(self):
         d = {
             "zebraMoon": [{"instanceId": 123}, "moon"],
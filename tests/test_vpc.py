@@ -3,10 +3,12 @@
 import logging
 import time
 from .common import BaseTest, functional, event_data, load_data
+from unittest import mock
 from unittest.mock import MagicMock
 
 from botocore.exceptions import ClientError as BotoClientError
 from c7n.exceptions import PolicyValidationError
+from c7n.filters.related import usage_index
 from c7n.resources.aws import shape_validate
 from pytest_terraform import terraform
 
@@ -2015,9 +2017,9 @@ class SecurityGroupTest(BaseTest):
             {"name": "sg-used", "resource": "security-group", "filters": ["used"]},
         )
         used = p.resource_manager.filters[0]
-        used.nics = load_data('ram-producer-view-consumer-eni.json')['NetworkInterfaces']
+        nics = load_data('ram-producer-view-consumer-eni.json')['NetworkInterfaces']
 
-        group_enis = used._get_eni_attributes()
+        group_enis = used._get_eni_attributes(used.get_nic_refs(nics))
         assert set(group_enis) == {'sg-123', 'sg-456', 'sg-789'}
 
     def test_used(self):
@@ -2036,6 +2038,21 @@ class SecurityGroupTest(BaseTest):
         self.assertIn("vpc_endpoint", resources[0]["c7n:InterfaceTypes"])
         self.assertIn("ec2", resources[0]["c7n:InterfaceResourceTypes"])
 
+    def test_used_shares_indexed_nics(self):
+        factory = self.replay_flight_data("test_security_group_used")
+        self.addCleanup(usage_index.clear)
+        policies = [self.load_policy(
+            {"name": "sg-used-%d" % i, "resource": "security-group", "filters": ["used"]},
+            session_factory=factory, cache=True) for i in range(2)]
+        resources = policies[0].run()
+        eni_manager = policies[1].resource_manager.get_resource_manager('eni')
+        with mock.patch.object(
+                eni_manager.__class__, 'resources', side_effect=AssertionError) as eni_fetch:
+            self.assertEqual(
+                [r['c7n:InterfaceTypes'] for r in policies[1].run()],
+                [r['c7n:InterfaceTypes'] for r in resources])
+        eni_fetch.assert_not_called()
+
     def test_unused_ecs(self):
         factory = self.replay_flight_data("test_security_group_ecs_unused")
         p = self.load_policy(
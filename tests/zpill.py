@@ -16,6 +16,8 @@ import placebo
 from botocore.response import StreamingBody
 from placebo import pill
 
+from c7n.executor import MainThreadExecutor
+from c7n.query import ChildResourceQuery
 from c7n.testing import CustodianTestCore
 
 # Custodian Test Account. This is used only for testing.
@@ -279,8 +281,14 @@ class PillTest(CustodianTestCore):
     def cleanUp(self):
         self.pill = None
 
+    def serialize_child_queries(self):
+        # placebo matches responses by call order, so parents are
+        # queried in order when recording or replaying.
+        self.patch(ChildResourceQuery, 'executor_factory', MainThreadExecutor)
+
     def record_flight_data(self, test_case, zdata=False, augment=False, region=None):
         self.recording = True
+        self.serialize_child_queries()
         test_dir = os.path.join(self.placebo_dir, test_case)
         if not (zdata or augment):
             if os.path.exists(test_dir):
@@ -342,6 +350,7 @@ class PillTest(CustodianTestCore):
             self.recording = True
             return lambda region=region, assume=None: boto3.Session(region_name=region)
 
+        self.serialize_child_queries()
         if not zdata:
             test_dir = os.path.join(self.placebo_dir, test_case)
             if not os.path.exists(test_dir):
@@ -82,6 +82,11 @@ def _parser():
     parser.add_argument("--cert", help="Path to TLS certifciate")
     parser.add_argument("--ca-cert", help="Path to the CA certificate")
     parser.add_argument("--cert-key", help="Path to the certificate's private key")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Maximum number of admission requests to evaluate concurrently",
+    )
     return parser
 
 
@@ -133,6 +138,7 @@ def cli():
             cert_path=args.cert,
             cert_key_path=args.cert_key,
             ca_cert_path=args.ca_cert,
+            workers=args.workers,
         )
 
 
@@ -1,10 +1,17 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 import base64
+import copy
+from collections import deque
+from contextlib import contextmanager
 import http.server
 import json
 import os
+import queue
+import socketserver
 import tempfile
+import threading
+import time
 
 from c7n.config import Config
 from c7n.loader import DirectoryLoader
@@ -18,28 +25,158 @@ log = logging.getLogger("c7n_kube.server")
 log.setLevel(logging.DEBUG)
 
 
-class AdmissionControllerServer(http.server.HTTPServer):
+class PolicyIndex:
+    """
+    Index of admission policies by the resource they match, so a request
+    only evaluates policies for its resource and operation.
+    """
+
+    def __init__(self, policy_collection):
+        self.policy_collection = policy_collection
+        self.resources = {}
+        self.wildcard = []
+        for idx, p in enumerate(policy_collection.policies):
+            match_values = p.get_execution_mode().get_match_values()
+            entry = (idx, p, match_values.get("operations"))
+            if not match_values.get("resources"):
+                self.wildcard.append(entry)
+                continue
+            # subresource matching is handled by the policy's mode
+            resource = match_values["resources"][0].split("/", 1)[0]
+            self.resources.setdefault(resource, []).append(entry)
+
+    @property
+    def policies(self):
+        return self.policy_collection.policies
+
+    def get_policies(self, request):
+        try:
+            resource = request["request"]["resource"]["resource"]
+            operation = request["request"]["operation"]
+        except (KeyError, TypeError):
+            return list(self.policies)
+        entries = sorted(self.resources.get(resource, []) + self.wildcard, key=lambda e: e[0])
+        return [p for _, p, ops in entries if not ops or "*" in ops or operation in ops]
+
+
+class LatencyStats:
+    """
+    Request latency percentiles over a window of recent requests.
+    """
+
+    def __init__(self, window=1000):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.policy_count = 0
+        self.lock = threading.Lock()
+
+    def record(self, duration, policy_count):
+        with self.lock:
+            self.samples.append(duration)
+            self.count += 1
+            self.policy_count += policy_count
+
+    def get_percentile(self, samples, percentile):
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * percentile))]
+
+    def render(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count, policy_count = self.count, self.policy_count
+        lines = [
+            "# TYPE c7n_admission_request_latency_seconds summary",
+        ]
+        for q in (0.5, 0.99):
+            lines.append(
+                'c7n_admission_request_latency_seconds{quantile="%s"} %f'
+                % (q, self.get_percentile(samples, q))
+            )
+        lines.extend(
+            [
+                "c7n_admission_request_latency_seconds_count %d" % count,
+                "# TYPE c7n_admission_policies_evaluated_total counter",
+                "c7n_admission_policies_evaluated_total %d" % policy_count,
+            ]
+        )
+        return "\n".join(lines) + "\n"
+
+
+class AdmissionControllerServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
     """
     Admission Controller Server
+
+    Requests are handled concurrently, each evaluating policies from its
+    own copy of the policy collection. Copies are made as concurrent
+    requests need them, up to `workers`.
     """
 
-    def __init__(self, policy_dir, on_exception="warn", *args, **kwargs):
+    daemon_threads = True
+
+    def __init__(self, policy_dir, on_exception="warn", workers=None, *args, **kwargs):
         self.policy_dir = policy_dir
         self.on_exception = on_exception
+        self.max_workers = workers or min(32, (os.cpu_count() or 1) + 4)
         temp_dir = tempfile.TemporaryDirectory()
         self.directory_loader = DirectoryLoader(Config.empty(output_dir=temp_dir.name))
-        policy_collection = self.directory_loader.load_directory(os.path.abspath(self.policy_dir))
-        self.policy_collection = policy_collection.filter(modes=["k8s-admission"])
+        self.policy_collection = self.directory_loader.load_directory(
+            os.path.abspath(self.policy_dir)
+        ).filter(modes=["k8s-admission"])
+        self.policy_pool = queue.Queue()
+        self.policy_pool.put(PolicyIndex(self.policy_collection))
+        self.pool_size = 1
+        self.pool_lock = threading.Lock()
+        self.stats = LatencyStats()
         log.info(f"Loaded {len(self.policy_collection)} policies")
         super().__init__(*args, **kwargs)
 
+    def copy_policy_index(self):
+        policy_data = {"policies": [copy.deepcopy(p.data) for p in self.policy_collection]}
+        return PolicyIndex(
+            self.policy_collection.from_data(policy_data, self.policy_collection.options)
+        )
+
+    @contextmanager
+    def get_policy_index(self):
+        try:
+            index = self.policy_pool.get_nowait()
+        except queue.Empty:
+            with self.pool_lock:
+                grow = self.pool_size < self.max_workers
+                if grow:
+                    self.pool_size += 1
+            if not grow:
+                index = self.policy_pool.get()
+            else:
+                try:
+                    index = self.copy_policy_index()
+                except Exception:
+                    # release the slot, so a failed copy doesn't shrink the pool
+                    with self.pool_lock:
+                        self.pool_size -= 1
+                    raise
+        try:
+            yield index
+        finally:
+            self.policy_pool.put(index)
+
 
 class AdmissionControllerHandler(http.server.BaseHTTPRequestHandler):
     def run_policies(self, req):
+        start = time.monotonic()
+        with self.server.get_policy_index() as index:
+            policies = index.get_policies(req)
+            try:
+                return self.run_policy_set(req, policies)
+            finally:
+                self.server.stats.record(time.monotonic() - start, len(policies))
+
+    def run_policy_set(self, req, policies):
         failed_policies = []
         warn_policies = []
         patches = []
-        for p in self.server.policy_collection.policies:
+        for p in policies:
             # fail_message and warning_message are set on exception
             warning_message = None
             deny_message = None
@@ -96,8 +233,15 @@ class AdmissionControllerHandler(http.server.BaseHTTPRequestHandler):
 
     def do_GET(self):
         """
-        Returns application/json list of your policies
+        Returns application/json list of your policies, or request metrics
+        at /metrics
         """
+        if self.path == "/metrics":
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(self.server.stats.render().encode("utf-8"))
+            return
         self.send_response(200)
         self.end_headers()
         result = []
@@ -177,6 +321,7 @@ def init(
     cert_path=None,
     cert_key_path=None,
     ca_cert_path=None,
+    workers=None,
 ):
     use_tls = any((cert_path, cert_key_path))
     if use_tls and not (cert_path and cert_key_path):
@@ -189,6 +334,7 @@ def init(
         RequestHandlerClass=AdmissionControllerHandler,
         policy_dir=policy_dir,
         on_exception=on_exception,
+        workers=workers,
     )
     if use_tls:
         import ssl
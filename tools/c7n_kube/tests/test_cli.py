@@ -109,6 +109,7 @@ class TestK8sCli(KubeTest):
         patched_args.cert = None
         patched_args.cert_key = None
         patched_args.ca_cert = None
+        patched_args.workers = 1
         patched_args.host = "localhost"
         patched_parser.return_value.parse_args.return_value = patched_args
         cli()
@@ -120,4 +121,5 @@ class TestK8sCli(KubeTest):
             cert_path=None,
             cert_key_path=None,
             ca_cert_path=None,
+            workers=1,
         )
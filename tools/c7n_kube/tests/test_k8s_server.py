@@ -6,11 +6,12 @@ import tempfile
 import threading
 import time
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 import requests
 
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 
 from c7n_kube.server import AdmissionControllerServer, AdmissionControllerHandler, init
 
@@ -320,6 +321,7 @@ class TestServer(KubeTest):
                     RequestHandlerClass=AdmissionControllerHandler,
                     policy_dir="policies",
                     on_exception="warn",
+                    workers=None,
                 )
                 patched.return_value.serve_forever.assert_called_once()
 
@@ -382,23 +384,27 @@ class TestServer(KubeTest):
                         ],
                     },
                 },
+                {
+                    "name": "test-admission-pod-2",
+                    "resource": "k8s.pod",
+                    "mode": {
+                        "type": "k8s-admission",
+                        "on-match": "warn",
+                        "operations": [
+                            "CREATE",
+                        ],
+                    },
+                },
             ]
         }
-        with self._server(policies) as (server, port):
-            server.policy_collection = MagicMock()
-            server.policy_collection.policies = []
+        errors = {"test-admission-pod": "foo", "test-admission-pod-2": "bar"}
 
-            mock_policy_1 = MagicMock()
-            mock_policy_1.name = "test-admission-pod"
-            mock_policy_1.push.side_effect = Exception("foo")
-
-            mock_policy_2 = MagicMock()
-            mock_policy_2.name = "test-admission-pod-2"
-            mock_policy_2.push.side_effect = Exception("bar")
-
-            server.policy_collection.policies.append(mock_policy_1)
-            server.policy_collection.policies.append(mock_policy_2)
+        def push(policy, req):
+            raise Exception(errors[policy.name])
 
+        with patch("c7n.policy.Policy.push", autospec=True, side_effect=push), self._server(
+            policies
+        ) as (_, port):
             event = self.get_event("create_pod")
             res = requests.post(f"http://localhost:{port}", json=event)
             self.assertEqual(res.status_code, 200)
@@ -425,23 +431,27 @@ class TestServer(KubeTest):
                         ],
                     },
                 },
+                {
+                    "name": "test-admission-pod-2",
+                    "resource": "k8s.pod",
+                    "mode": {
+                        "type": "k8s-admission",
+                        "on-match": "warn",
+                        "operations": [
+                            "CREATE",
+                        ],
+                    },
+                },
             ]
         }
-        with self._server(policies, on_exception="deny") as (server, port):
-            server.policy_collection = MagicMock()
-            server.policy_collection.policies = []
-
-            mock_policy_1 = MagicMock()
-            mock_policy_1.name = "test-admission-pod"
-            mock_policy_1.push.side_effect = Exception("foo")
+        errors = {"test-admission-pod": "foo", "test-admission-pod-2": "bar"}
 
-            mock_policy_2 = MagicMock()
-            mock_policy_2.name = "test-admission-pod-2"
-            mock_policy_2.push.side_effect = Exception("bar")
-
-            server.policy_collection.policies.append(mock_policy_1)
-            server.policy_collection.policies.append(mock_policy_2)
+        def push(policy, req):
+            raise Exception(errors[policy.name])
 
+        with patch("c7n.policy.Policy.push", autospec=True, side_effect=push), self._server(
+            policies, on_exception="deny"
+        ) as (_, port):
             event = self.get_event("create_pod")
             res = requests.post(f"http://localhost:{port}", json=event)
             self.assertEqual(res.status_code, 200)
@@ -460,3 +470,110 @@ class TestServer(KubeTest):
                     },
                 ],
             )
+
+    def test_server_policy_index(self):
+        policies = {
+            "policies": [
+                {
+                    "name": "test-admission-deployment",
+                    "resource": "k8s.deployment",
+                    "mode": {"type": "k8s-admission", "operations": ["CREATE"]},
+                },
+                {
+                    "name": "test-admission-pod-update",
+                    "resource": "k8s.pod",
+                    "mode": {"type": "k8s-admission", "operations": ["UPDATE"]},
+                },
+                {
+                    "name": "test-admission-pod",
+                    "resource": "k8s.pod",
+                    "mode": {"type": "k8s-admission", "operations": ["CREATE", "UPDATE"]},
+                },
+            ]
+        }
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(f"{temp_dir}/policy.yaml", "w+") as f:
+                json.dump(policies, f)
+            server = MockAdmissionControllerServer(
+                server_address=("localhost", 8080),
+                RequestHandlerClass=AdmissionControllerHandler,
+                policy_dir=temp_dir,
+                workers=2,
+            )
+        with server.get_policy_index() as index:
+            self.assertEqual(
+                [p.name for p in index.get_policies(self.get_event("create_pod"))],
+                ["test-admission-pod"],
+            )
+            self.assertEqual(len(index.get_policies({})), 3)
+
+        # a failed copy releases its slot in the pool
+        with server.get_policy_index():
+            with patch.object(server, "copy_policy_index", side_effect=ValueError("copy")):
+                with self.assertRaises(ValueError):
+                    with server.get_policy_index():
+                        pass
+            self.assertEqual(server.pool_size, 1)
+            with server.get_policy_index() as index:
+                self.assertEqual(len(index.get_policies({})), 3)
+            self.assertEqual(server.pool_size, 2)
+
+    def test_server_concurrent_requests(self):
+        policies = {
+            "policies": [
+                {
+                    "name": "test-admission-pod",
+                    "resource": "k8s.pod",
+                    "mode": {"type": "k8s-admission", "operations": ["CREATE"]},
+                }
+            ]
+        }
+        # both requests must be evaluating policies at once to pass the barrier
+        barrier = threading.Barrier(2, timeout=5)
+        pushed = []
+
+        def push(policy, req):
+            barrier.wait()
+            pushed.append(policy)
+            return []
+
+        event = self.get_event("create_pod")
+        with patch("c7n.policy.Policy.push", autospec=True, side_effect=push), self._server(
+            policies
+        ) as (_, port):
+            with ThreadPoolExecutor(max_workers=2) as w:
+                responses = list(
+                    w.map(
+                        lambda _: requests.post(f"http://localhost:{port}", json=event),
+                        range(2),
+                    )
+                )
+        for res in responses:
+            self.assertEqual(res.status_code, 200)
+            self.assertTrue(res.json()["response"]["allowed"])
+            self.assertEqual(res.json()["response"]["warnings"], [])
+        # each request evaluated its own copy of the policy
+        self.assertIsNot(pushed[0], pushed[1])
+
+    def test_server_metrics(self):
+        policies = {
+            "policies": [
+                {
+                    "name": "test-admission",
+                    "resource": "k8s.pod",
+                    "mode": {
+                        "type": "k8s-admission",
+                        "on-match": "allow",
+                        "operations": ["CREATE"],
+                    },
+                }
+            ]
+        }
+        with self._server(policies) as ((_, port)):
+            event = self.get_event("create_pod")
+            requests.post(f"http://localhost:{port}", json=event)
+            res = requests.get(f"http://localhost:{port}/metrics")
+            self.assertEqual(res.status_code, 200)
+            self.assertIn("c7n_admission_request_latency_seconds_count 1", res.text)
+            self.assertIn('c7n_admission_request_latency_seconds{quantile="0.99"}', res.text)
+            self.assertIn("c7n_admission_policies_evaluated_total 1", res.text)
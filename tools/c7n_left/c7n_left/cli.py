@@ -97,6 +97,17 @@ def dump(directory, var_file, output_file, output_query):
     help="Use a jmespath expression to filter json output",
 )
 @click.option("--summary", default="policy", type=click.Choice(summary_options.keys()))
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Cache parsed sources and results, only changed resources are re-evaluated",
+)
+@click.option(
+    "--workers",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of processes to evaluate policies with",
+)
 def run(
     format,
     policy_dir,
@@ -108,6 +119,8 @@ def run(
     summary,
     filters,
     warn_on,
+    cache_dir=None,
+    workers=1,
     reporter=None,
 ):
     """evaluate policies against IaC sources.
@@ -127,6 +140,8 @@ def run(
         summary=summary,
         warn_on=warn_on,
         filters=filters,
+        cache_dir=cache_dir,
+        workers=workers,
     )
     policies = config.exec_filter.filter_policies(load_policies(policy_dir, config))
     if not policies:
@@ -165,6 +180,8 @@ def get_config(
     filters=None,
     warn_on=None,
     format='terraform',
+    cache_dir=None,
+    workers=1,
 ):
     config = Config.empty(
         source_dir=directory and Path(directory),
@@ -177,6 +194,8 @@ def get_config(
         filters=filters,
         warn_on=warn_on,
         format=format,
+        cache_dir=cache_dir and Path(cache_dir),
+        workers=workers,
     )
     config["exec_filter"] = ExecutionFilter.parse(config.filters)
     config["warn_filter"] = ExecutionFilter.parse(config.warn_on, severity_direction='gte')
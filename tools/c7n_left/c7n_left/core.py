@@ -2,10 +2,16 @@
 # SPDX-License-Identifier: Apache-2.0
 #
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 import fnmatch
+import hashlib
+import json
 import logging
+import multiprocessing
 import operator
 import os
+from pathlib import Path
+import traceback
 
 from c7n.actions import ActionRegistry
 from c7n.cache import NullCache
@@ -34,7 +40,7 @@ class IACSourceProvider(Provider):
     def initialize_policies(self, policies, options):
         return policies
 
-    def parse(self, source_dir, var_files):
+    def parse(self, source_dir, var_files, cache_dir=None):
         """Return the resource graph for the provider"""
 
 
@@ -221,12 +227,171 @@ class ExecutionFilter:
         return resources
 
 
+class ResultCache:
+    """Policy evaluation results from a prior run keyed by resource fingerprint.
+
+    A resource's cached result for a policy is reused when its
+    fingerprint, which covers its own content and that of the
+    resources it references, is unchanged from the prior run. Policies
+    using graph traversal are always evaluated.
+    """
+
+    def __init__(self, cache_dir, source_dir, fingerprints):
+        source_key = hashlib.sha256(str(Path(source_dir).absolute()).encode("utf8")).hexdigest()
+        self.path = Path(cache_dir) / f"results-{source_key}.json"
+        self.fingerprints = fingerprints
+        self.prior_fingerprints = {}
+        self.policies = {}
+        self.updated = set()
+
+    def load(self):
+        if not self.path.exists():
+            return
+        with open(self.path) as fh:
+            data = json.load(fh)
+        self.prior_fingerprints = data["fingerprints"]
+        self.policies = data["policies"]
+
+    def save(self, policies):
+        # drop results of policies which were removed or changed
+        policy_keys = {self.get_policy_key(p) for p in policies}
+        for key in list(self.policies):
+            if key not in policy_keys:
+                self.policies.pop(key)
+        for entry in self.policies.values():
+            for path in list(entry):
+                if path not in self.updated and not self.is_current(path):
+                    entry.pop(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w") as fh:
+            json.dump({"fingerprints": self.fingerprints, "policies": self.policies}, fh)
+
+    def is_current(self, path):
+        fingerprint = self.fingerprints.get(path)
+        return fingerprint is not None and fingerprint == self.prior_fingerprints.get(path)
+
+    @staticmethod
+    def get_policy_key(policy):
+        return hashlib.sha256(
+            json.dumps(policy.data, sort_keys=True, default=str).encode("utf8")
+        ).hexdigest()
+
+    @staticmethod
+    def is_cacheable(policy):
+        working = list(policy.resource_manager.filters)
+        while working:
+            f = working.pop()
+            if isinstance(f, Traverse):
+                return False
+            working.extend(getattr(f, "filters", ()))
+        return True
+
+    def filter_resources(self, policy, manager, resources, event):
+        # results are tracked by position, as resource paths aren't unique.
+        entry = self.policies.setdefault(self.get_policy_key(policy), {})
+        matched = {}
+        pending = []
+        for idx, r in enumerate(resources):
+            if r.id in entry and (r.id in self.updated or self.is_current(r.id)):
+                matched[idx] = entry[r.id]
+            else:
+                pending.append((idx, r))
+        if pending:
+            found = manager.filter_resources([r for _, r in pending], event)
+            found_ids = {id(r) for r in found}
+            self.update(policy, [r for _, r in pending], found)
+            matched.update({idx: id(r) in found_ids for idx, r in pending})
+        log.debug(
+            "policy:%s evaluated %d of %d resources", policy.name, len(pending), len(resources)
+        )
+        return [r for idx, r in enumerate(resources) if matched[idx]]
+
+    def update(self, policy, resources, matched):
+        entry = self.policies.setdefault(self.get_policy_key(policy), {})
+        found = {id(r) for r in matched}
+        for r in resources:
+            # resources with duplicate paths have no fingerprint, and
+            # aren't cached.
+            if self.fingerprints.get(r.id) is None:
+                entry.pop(r.id, None)
+                continue
+            entry[r.id] = id(r) in found
+            self.updated.add(r.id)
+
+
+class PolicyTypeIndex:
+    """Policies by the resource types they match.
+
+    Policy resource types without glob characters are indexed
+    directly, matches for a given type are computed once and
+    returned in policy order.
+    """
+
+    def __init__(self, policies):
+        self.policies = list(policies)
+        self.exact = defaultdict(set)
+        self.patterns = []
+        self.matches = {}
+        for idx, p in enumerate(policies):
+            rtypes = p.resource_type
+            if isinstance(rtypes, str):
+                rtypes = [rtypes]
+            elif not isinstance(rtypes, list):
+                rtypes = []
+            for rt in rtypes:
+                pattern = rt.split(".", 1)[-1]
+                if any(c in pattern for c in "*?["):
+                    self.patterns.append((pattern, idx))
+                else:
+                    self.exact[pattern].add(idx)
+
+    def get(self, rtype):
+        if rtype not in self.matches:
+            positions = set(self.exact.get(rtype, ()))
+            positions.update(
+                idx for pattern, idx in self.patterns if fnmatch.fnmatch(rtype, pattern)
+            )
+            self.matches[rtype] = [self.policies[idx] for idx in sorted(positions)]
+        return self.matches[rtype]
+
+
+# state shared with forked evaluation worker processes
+_evaluation_state = {}
+
+
+class EvaluationError(Exception):
+    """A policy error in an evaluation worker, with its formatted traceback."""
+
+
+def evaluate_work(idx):
+    """Evaluate the policies for a resource type in a worker process.
+
+    Returns the positions of matched resources for each policy, or the
+    formatted traceback of the error evaluating it, as exceptions may
+    not be picklable.
+    """
+    runner, graph, event, work = _evaluation_state["runner"]
+    rtype, resources, policies = work[idx]
+    matches = []
+    for p in policies:
+        p_event = runner.get_policy_event(graph, resources, event, rtype)
+        try:
+            matched = {id(r) for r in p.get_execution_mode().filter_resources(p_event)}
+        except Exception:
+            matches.append(traceback.format_exc())
+            continue
+        matches.append([i for i, r in enumerate(resources) if id(r) in matched])
+    return matches
+
+
 class CollectionRunner:
     def __init__(self, policies, options, reporter):
         self.policies = policies
         self.options = options
         self.reporter = reporter
         self.provider = None
+        self.result_cache = None
+        self.policy_index = PolicyTypeIndex(policies)
 
     def run(self) -> bool:
         # return value is used to signal process exit code.
@@ -237,7 +402,14 @@ class CollectionRunner:
             log.warning("no %s source files found" % provider.type)
             return True
 
-        graph = self.provider.parse(self.options.source_dir, self.options.var_files)
+        graph = self.provider.parse(
+            self.options.source_dir, self.options.var_files, self.options.get("cache_dir")
+        )
+        if self.options.get("cache_dir"):
+            self.result_cache = ResultCache(
+                self.options.cache_dir, self.options.source_dir, graph.get_fingerprints()
+            )
+            self.result_cache.load()
 
         for p in self.policies:
             p.expand_variables(p.get_variables())
@@ -246,34 +418,92 @@ class CollectionRunner:
         self.reporter.on_execution_started(self.policies, graph)
         # consider inverting this order to allow for results grouped by policy
         # at the moment, we're doing results grouped by resource.
+        work = self.get_work(graph)
+        workers = self.options.get("workers") or 1
+        if workers > 1 and len(work) > 1 and "fork" in multiprocessing.get_all_start_methods():
+            outcomes = self.evaluate_parallel(graph, event, work, workers)
+        else:
+            outcomes = self.evaluate(graph, event, work)
+
         found = False
+        for p, rtype, resources, result_set, error in outcomes:
+            if error is not None:
+                found = True
+                self.reporter.on_policy_error(error, p, rtype, resources)
+            if result_set:
+                self.reporter.on_results(p, result_set)
+            if result_set and (
+                not self.options.warn_filter or not self.options.warn_filter.filter_policies((p,))
+            ):
+                found = True
+        if self.result_cache:
+            self.result_cache.save(self.policies)
+        self.reporter.on_execution_ended()
+        return found
+
+    def get_work(self, graph):
+        work = []
         for rtype, resources in graph.get_resources_by_type():
             if self.options.exec_filter:
                 resources = self.options.exec_filter.filter_resources(rtype, resources)
             if not resources:
                 continue
-            for p in self.policies:
-                if not self.match_type(rtype, p):
-                    continue
-                result_set = []
+            policies = self.policy_index.get(rtype)
+            if policies:
+                work.append((rtype, resources, policies))
+        return work
+
+    def evaluate(self, graph, event, work):
+        for rtype, resources, policies in work:
+            for p in policies:
+                result_set, error = [], None
                 try:
                     result_set = self.run_policy(p, graph, resources, event, rtype)
                 except Exception as e:
-                    found = True
-                    self.reporter.on_policy_error(e, p, rtype, resources)
-                if result_set:
-                    self.reporter.on_results(p, result_set)
-                if result_set and (
-                    not self.options.warn_filter
-                    or not self.options.warn_filter.filter_policies((p,))
-                ):
-                    found = True
-        self.reporter.on_execution_ended()
-        return found
-
-    def run_policy(self, policy, graph, resources, event, resource_type):
+                    error = e
+                yield p, rtype, resources, result_set, error
+
+    def evaluate_parallel(self, graph, event, work, workers):
+        # policy filtering is evaluated in forked worker processes
+        # sharded by resource type, with results resolved and reported
+        # in the parent in the same order as serial evaluation.
+        _evaluation_state["runner"] = (self, graph, event, work)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("fork")
+            ) as executor:
+                # submit the largest shards first to balance the pool
+                order = sorted(
+                    range(len(work)), key=lambda i: len(work[i][1]) * len(work[i][2]), reverse=True
+                )
+                futures = {idx: executor.submit(evaluate_work, idx) for idx in order}
+                for idx, (rtype, resources, policies) in enumerate(work):
+                    for p, matched in zip(policies, futures[idx].result()):
+                        result_set, error = [], None
+                        if isinstance(matched, str):
+                            error = EvaluationError(matched)
+                        else:
+                            try:
+                                result_set = self.run_policy(
+                                    p, graph, resources, event, rtype, matched
+                                )
+                            except Exception as e:
+                                error = e
+                        yield p, rtype, resources, result_set, error
+        finally:
+            _evaluation_state.pop("runner", None)
+
+    def get_policy_event(self, graph, resources, event, resource_type, matched=None):
         event = dict(event)
         event.update({"graph": graph, "resources": resources, "resource_type": resource_type})
+        if self.result_cache:
+            event["result_cache"] = self.result_cache
+        if matched is not None:
+            event["matched"] = matched
+        return event
+
+    def run_policy(self, policy, graph, resources, event, resource_type, matched=None):
+        event = self.get_policy_event(graph, resources, event, resource_type, matched)
         self.reporter.on_policy_start(policy, event)
         return policy.push(event)
 
@@ -288,15 +518,7 @@ class CollectionRunner:
 
     @staticmethod
     def match_type(rtype, p):
-        if isinstance(p.resource_type, str):
-            return fnmatch.fnmatch(rtype, p.resource_type.split(".", 1)[-1])
-        found = False
-        if isinstance(p.resource_type, list):
-            for pr in p.resource_type:
-                if fnmatch.fnmatch(rtype, pr.split(".", 1)[-1]):
-                    found = True
-                    break
-        return found
+        return bool(PolicyTypeIndex([p]).get(rtype))
 
 
 class IACSourceMode(PolicyExecutionMode):
@@ -305,13 +527,30 @@ class IACSourceMode(PolicyExecutionMode):
         return self.policy.resource_manager
 
     def run(self, event, ctx):
+        if event.get("matched") is not None:
+            resources = self.get_matched(event)
+        else:
+            resources = self.filter_resources(event)
+        return self.as_results(resources, event)
+
+    def filter_resources(self, event):
         if not self.policy.is_runnable(event):
             return []
-
         resources = event["resources"]
         resources = self.manager.augment(resources, event)
-        resources = self.manager.filter_resources(resources, event)
-        return self.as_results(resources, event)
+        result_cache = event.get("result_cache")
+        if result_cache and result_cache.is_cacheable(self.policy):
+            return result_cache.filter_resources(self.policy, self.manager, resources, event)
+        return self.manager.filter_resources(resources, event)
+
+    def get_matched(self, event):
+        """Resolve resources matched by a worker process."""
+        resources = self.manager.augment(event["resources"], event)
+        matched = [resources[idx] for idx in event["matched"]]
+        result_cache = event.get("result_cache")
+        if result_cache and result_cache.is_cacheable(self.policy):
+            result_cache.update(self.policy, resources, matched)
+        return matched
 
     def as_results(self, resources, event):
         return ResultSet([PolicyResourceResult(r, self.policy) for r in resources])
@@ -419,3 +658,6 @@ class ResourceGraph:
 
     def resolve_refs(self, resource, target_type):
         raise NotImplementedError()
+
+    def get_fingerprints(self):
+        raise NotImplementedError()
@@ -15,8 +15,9 @@ from rich.console import Console
 from rich.syntax import Syntax
 from rich.table import Table
 from rich.text import Text
+from rich.traceback import Traceback
 
-from .core import CollectionRunner, PolicyMetadata
+from .core import PolicyMetadata, PolicyTypeIndex
 from .utils import SEVERITY_LEVELS
 from c7n.output import OutputRegistry
 from c7n.utils import jmespath_search, filter_empty
@@ -101,7 +102,10 @@ class RichCli(Output):
 
     def on_policy_error(self, exception, policy, rtype, resources):
         self.console.print(f"[red]error[/red] policy:{policy.name} resource:{rtype}")
-        self.console.print_exception()
+        # errors are reported after evaluation, outside of their except block.
+        self.console.print(
+            Traceback.from_exception(type(exception), exception, exception.__traceback__)
+        )
 
     def on_vars_discovered(self, var_type, var_map, var_path=None):
         if var_type != "uninitialized" and var_map:
@@ -163,6 +167,7 @@ class Summary(Output):
         type_policies = Counter()
 
         resource_count = 0
+        policy_index = PolicyTypeIndex(policies)
 
         for rtype, resources in graph.get_resources_by_type():
             if self.config.exec_filter:
@@ -174,12 +179,13 @@ class Summary(Output):
 
             resource_count += len(resources)
             type_counts[rtype] = len(resources)
-            for p in policies:
-                if not CollectionRunner.match_type(rtype, p):
-                    unevaluated[rtype] = len(resources)
-                else:
-                    type_policies[rtype] += 1
-                    policy_resources[p.name] = len(resources)
+            matched = policy_index.get(rtype)
+            if len(matched) < len(policies):
+                unevaluated[rtype] = len(resources)
+            if matched:
+                type_policies[rtype] += len(matched)
+            for p in matched:
+                policy_resources[p.name] = len(resources)
 
         self.counter_unevaluated_by_type = unevaluated
         self.counter_resources_by_type = type_counts
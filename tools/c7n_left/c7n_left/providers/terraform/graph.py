@@ -1,6 +1,8 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 #
+import hashlib
+import json
 
 from ...core import ResourceGraph
 from .resource import TerraformResource
@@ -68,6 +70,84 @@ class TerraformGraph(ResourceGraph):
     def get_refs(self, resource, target_type):
         return self.resolver.resolve_refs(resource, (target_type,))
 
+    def get_fingerprints(self):
+        """Content hash of each block and the blocks it depends on.
+
+        Block ids are generated per parse, so references are normalized
+        to the path of the referenced block. A fingerprint covers the
+        blocks referencing it and every block reachable through its own
+        references. Provider blocks are folded into every fingerprint as
+        they augment resources at evaluation. Blocks with an ambiguous
+        path get no fingerprint.
+        """
+        id_paths = {}
+        blocks = {}
+        duplicates = set()
+        for type_name, items in self.resource_data.items():
+            for item in items:
+                path = item.get("__tfmeta", {}).get("path")
+                if not path:
+                    continue
+                if path in blocks:
+                    duplicates.add(path)
+                id_paths[item["id"]] = path
+                blocks[path] = item
+
+        def normalize(v, refs):
+            if isinstance(v, dict):
+                return {
+                    k: normalize(iv, refs)
+                    for k, iv in v.items()
+                    if k not in ("id", "src_dir", "refs")
+                }
+            elif isinstance(v, list):
+                return [normalize(iv, refs) for iv in v]
+            elif isinstance(v, str) and v in id_paths:
+                refs.add(id_paths[v])
+                return id_paths[v]
+            return v
+
+        base = {}
+        outgoing = {}
+        for path, item in blocks.items():
+            # attribute references are resolved to values, and only
+            # recorded in the block's metadata.
+            refs = outgoing[path] = {
+                id_paths[ref["id"]]
+                for ref in item["__tfmeta"].get("references", ())
+                if ref.get("id") in id_paths
+            }
+            base[path] = hashlib.sha256(
+                json.dumps(normalize(item, refs), sort_keys=True, default=str).encode("utf8")
+            ).hexdigest()
+
+        provider_digest = "".join(sorted(base[p] for p in base if p.startswith("provider.")))
+        fingerprints = {}
+        for path, item in blocks.items():
+            deps = {
+                id_paths[rid]
+                for rid in self.resolver._ref_map.get(item["id"], ())
+                if rid in id_paths
+            }
+            reachable = set()
+            working = list(outgoing[path])
+            while working:
+                ref = working.pop()
+                if ref in reachable:
+                    continue
+                reachable.add(ref)
+                working.extend(outgoing[ref])
+            deps = (deps | reachable) - {path}
+            if path in duplicates or deps & duplicates:
+                fingerprints[path] = None
+                continue
+            fingerprints[path] = hashlib.sha256(
+                "".join([base[path], provider_digest] + sorted(base[d] for d in deps)).encode(
+                    "utf8"
+                )
+            ).hexdigest()
+        return fingerprints
+
 
 class Resolver:
     def __init__(self):
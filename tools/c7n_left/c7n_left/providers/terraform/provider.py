@@ -1,7 +1,12 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 #
+import hashlib
+import json
+import os
+from pathlib import Path
 
+import tfparse
 from tfparse import load_from_path
 
 from c7n.provider import clouds
@@ -83,17 +88,23 @@ class TerraformProvider(IACSourceProvider):
             p.data["mode"] = {"type": "terraform-source"}
         return policies
 
-    def parse(self, source_dir, var_files=()):
+    def parse(self, source_dir, var_files=(), cache_dir=None):
         resolver = VariableResolver(source_dir, var_files, self.reporter)
+        parse_cache = cache_dir and ParseCache(cache_dir) or None
         with resolver.get_variables() as var_files:
-            graph = TerraformGraph(
-                load_from_path(
+            resource_data = None
+            if parse_cache:
+                cache_key = parse_cache.get_key(source_dir, var_files)
+                resource_data = parse_cache.get(source_dir, cache_key)
+            if resource_data is None:
+                resource_data = load_from_path(
                     source_dir,
                     vars_paths=var_files,
                     allow_downloads=True,
-                ),
-                source_dir,
-            )
+                )
+                if parse_cache:
+                    parse_cache.save(source_dir, cache_key, resource_data)
+            graph = TerraformGraph(resource_data, source_dir)
             graph.build()
             log.debug("Loaded %d %s resources", len(graph), self.type)
             return graph
@@ -104,6 +115,88 @@ class TerraformProvider(IACSourceProvider):
         return files
 
 
+class ParseCache:
+    """Cache of parsed terraform sources keyed by content hash.
+
+    Entries are keyed by the terraform files of the root module, the
+    variable files and TF_VAR_ environment variables in use, and the
+    tfparse version. Every other module directory the parse read from
+    is recorded with the entry and its content verified on lookup, so
+    changes to directories which aren't in use don't invalidate it.
+    """
+
+    suffixes = (".tf", ".tf.json", ".tfvars", ".tfvars.json")
+
+    def __init__(self, cache_dir):
+        self.cache_dir = Path(cache_dir)
+
+    def get_key(self, source_dir, var_files):
+        digest = hashlib.sha256()
+        digest.update(getattr(tfparse, "__version__", "").encode("utf8"))
+        digest.update(self.hash_dir(source_dir).encode("utf8"))
+        for f in sorted(self.hash_file(Path(source_dir) / f) for f in var_files):
+            digest.update(f.encode("utf8"))
+        for k, v in sorted(os.environ.items()):
+            if k.startswith("TF_VAR_"):
+                digest.update(f"{k}={v}".encode("utf8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def hash_file(cls, path):
+        with open(path, "rb") as fh:
+            return hashlib.sha256(fh.read()).hexdigest()
+
+    @classmethod
+    def hash_dir(cls, path):
+        # modules are a single directory, subdirectories are separate
+        # modules.
+        digest = hashlib.sha256()
+        for f in sorted(Path(path).iterdir()):
+            if f.name.startswith("c7n-left-") or not f.name.endswith(cls.suffixes):
+                continue
+            if f.is_file():
+                digest.update(f"{f.name}:{cls.hash_file(f)}".encode("utf8"))
+        return digest.hexdigest()
+
+    @staticmethod
+    def get_module_dirs(source_dir, resource_data):
+        root = os.path.normpath(str(source_dir))
+        dirs = set()
+        for blocks in resource_data.values():
+            for b in blocks:
+                filename = b.get("__tfmeta", {}).get("filename")
+                if filename:
+                    dirs.add(os.path.normpath(os.path.join(root, os.path.dirname(filename))))
+        dirs.discard(root)
+        return sorted(dirs)
+
+    def get_path(self, cache_key):
+        return self.cache_dir / f"parse-{cache_key}.json"
+
+    def get(self, source_dir, cache_key):
+        path = self.get_path(cache_key)
+        if not path.exists():
+            return None
+        with open(path) as fh:
+            entry = json.load(fh)
+        for module_dir, module_hash in entry["modules"].items():
+            if not os.path.isdir(module_dir) or self.hash_dir(module_dir) != module_hash:
+                return None
+        log.debug("Using cached parse of %s", source_dir)
+        return entry["resources"]
+
+    def save(self, source_dir, cache_key, resource_data):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "modules": {
+                d: self.hash_dir(d) for d in self.get_module_dirs(source_dir, resource_data)
+            },
+            "resources": resource_data,
+        }
+        with open(self.get_path(cache_key), "w") as fh:
+            json.dump(entry, fh)
+
+
 @execution.register("terraform-source")
 class TerraformSource(IACSourceMode):
     schema = type_schema("terraform-source")
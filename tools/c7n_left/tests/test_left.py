@@ -1,6 +1,7 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 #
+from io import StringIO
 import json
 import os
 from pathlib import Path
@@ -16,7 +17,7 @@ import jsonschema
 import pytest
 from click.testing import CliRunner
 
-from c7n.config import Config
+from c7n.config import Bag, Config
 from c7n.resources import load_resources
 
 try:
@@ -27,6 +28,7 @@ try:
         extract_mod_stack,
     )
     from c7n_left.providers.terraform.graph import Resolver
+    from c7n_left.providers.terraform.resource import TerraformResource
     from c7n_left.providers.terraform.filters import Taggable
 
     LEFT_INSTALLED = True
@@ -1721,3 +1723,290 @@ def test_selection_policy_filter(policy_env):
 
     selection = policy_env.get_selection("policy=test-a")
     assert {p.name for p in selection.filter_policies(policies)} == {"test-a"}
+
+
+def test_parse_cache(tmp_path, var_tf_setup):
+    cache_dir = tmp_path / "cache"
+    graph = TerraformProvider().parse(tmp_path / "tf", cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("parse-*.json"))) == 1
+
+    with patch("c7n_left.providers.terraform.provider.load_from_path") as load:
+        cached = TerraformProvider().parse(tmp_path / "tf", cache_dir=cache_dir)
+        assert not load.called
+    assert cached.get_fingerprints() == graph.get_fingerprints()
+
+    (tmp_path / "tf" / "terraform.tfvars").write_text('balancer_type = "network"')
+    graph = TerraformProvider().parse(tmp_path / "tf", cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("parse-*.json"))) == 2
+    resource = list(graph.get_resources_by_type("aws_alb"))[0][1][0]
+    assert resource["load_balancer_type"] == "network"
+
+
+def test_parse_cache_modules(tmp_path):
+    tf_dir = tmp_path / "tf"
+    (tf_dir / "queue").mkdir(parents=True)
+    (tf_dir / "unused").mkdir()
+    (tf_dir / "main.tf").write_text('module "queue" {\n  source = "./queue"\n}\n')
+    (tf_dir / "queue" / "main.tf").write_text('resource "aws_sqs_queue" "q" {\n  name = "q"\n}\n')
+    (tf_dir / "unused" / "main.tf").write_text('resource "aws_sns_topic" "t" {}\n')
+    cache_dir = tmp_path / "cache"
+    TerraformProvider().parse(tf_dir, cache_dir=cache_dir)
+
+    # directories which aren't in use don't invalidate the parse
+    (tf_dir / "unused" / "main.tf").write_text('resource "aws_sns_topic" "u" {}\n')
+    with patch("c7n_left.providers.terraform.provider.load_from_path") as load:
+        TerraformProvider().parse(tf_dir, cache_dir=cache_dir)
+        assert not load.called
+
+    (tf_dir / "queue" / "main.tf").write_text('resource "aws_sqs_queue" "q" {\n  name = "r"\n}\n')
+    graph = TerraformProvider().parse(tf_dir, cache_dir=cache_dir)
+    resource = list(graph.get_resources_by_type("aws_sqs_queue"))[0][1][0]
+    assert resource["name"] == "r"
+
+
+def test_graph_fingerprints(tmp_path):
+    tf_dir = tmp_path / "tf"
+    tf_dir.mkdir()
+    tf_template = """
+resource "aws_cloudwatch_log_group" "yada" {
+  name = "%s"
+}
+resource "aws_cloudwatch_log_stream" "foo" {
+  name           = "SampleLogStream1234"
+  log_group_name = aws_cloudwatch_log_group.yada.name
+}
+resource "aws_sqs_queue" "bar" {
+  name = "bar"
+}
+"""
+    (tf_dir / "main.tf").write_text(tf_template % "Yada")
+    prior = TerraformProvider().parse(tf_dir).get_fingerprints()
+    assert TerraformProvider().parse(tf_dir).get_fingerprints() == prior
+
+    (tf_dir / "main.tf").write_text(tf_template % "Yoda")
+    current = TerraformProvider().parse(tf_dir).get_fingerprints()
+    assert {p for p in current if current[p] != prior[p]} == {
+        "aws_cloudwatch_log_group.yada",
+        "aws_cloudwatch_log_stream.foo",
+    }
+
+
+def test_graph_fingerprints_transitive(tmp_path):
+    tf_dir = tmp_path / "tf"
+    tf_dir.mkdir()
+    tf_template = """
+resource "aws_kms_key" "key" {
+  description = "%s"
+}
+resource "aws_cloudwatch_log_group" "yada" {
+  name       = "yada"
+  kms_key_id = aws_kms_key.key.arn
+}
+resource "aws_cloudwatch_log_stream" "foo" {
+  name           = "SampleLogStream1234"
+  log_group_name = aws_cloudwatch_log_group.yada.name
+}
+"""
+    (tf_dir / "main.tf").write_text(tf_template % "alpha")
+    prior = TerraformProvider().parse(tf_dir).get_fingerprints()
+
+    # the stream reaches the key through the log group
+    (tf_dir / "main.tf").write_text(tf_template % "beta")
+    current = TerraformProvider().parse(tf_dir).get_fingerprints()
+    assert {p for p in current if current[p] != prior[p]} == {
+        "aws_kms_key.key",
+        "aws_cloudwatch_log_group.yada",
+        "aws_cloudwatch_log_stream.foo",
+    }
+
+
+def test_result_cache_duplicate_paths(tmp_path):
+    # blocks sharing a path are each evaluated, and never cached
+    def get_resource(path, name):
+        return TerraformResource("aws_sqs_queue", {"name": name, "__tfmeta": {"path": path}})
+
+    first = get_resource("aws_sqs_queue.dup", "first")
+    second = get_resource("aws_sqs_queue.dup", "second")
+    other = get_resource("aws_sqs_queue.other", "other")
+    fingerprints = {"aws_sqs_queue.dup": None, "aws_sqs_queue.other": "abc"}
+    cache = core.ResultCache(tmp_path / "cache", tmp_path, fingerprints)
+
+    class Manager:
+        def filter_resources(self, resources, event):
+            return [r for r in resources if r["name"] != "first"]
+
+    class Policy:
+        name = "check-sqs"
+        data = {"name": "check-sqs", "resource": "terraform.aws_sqs_queue"}
+
+    resources = [first, second, other]
+    for i in range(2):
+        assert cache.filter_resources(Policy(), Manager(), resources, None) == [second, other]
+    cache.save([Policy()])
+    assert list(cache.policies.values()) == [{"aws_sqs_queue.other": True}]
+
+
+def test_result_cache_prune_policies(tmp_path):
+    class Policy:
+        def __init__(self, name):
+            self.name = name
+            self.data = {"name": name, "resource": "terraform.aws_sqs_queue"}
+
+    fingerprints = {"aws_sqs_queue.q": "abc"}
+    cache = core.ResultCache(tmp_path / "cache", tmp_path, fingerprints)
+    resource = TerraformResource("aws_sqs_queue", {"__tfmeta": {"path": "aws_sqs_queue.q"}})
+    kept, removed = Policy("kept"), Policy("removed")
+    cache.update(kept, [resource], [resource])
+    cache.update(removed, [resource], [])
+    cache.save([kept])
+
+    cache = core.ResultCache(tmp_path / "cache", tmp_path, fingerprints)
+    cache.load()
+    assert cache.policies == {cache.get_policy_key(kept): {"aws_sqs_queue.q": True}}
+
+
+def test_incremental_results(tmp_path):
+    tf_dir = tmp_path / "tf"
+    tf_dir.mkdir()
+    tf_template = """
+resource "aws_sqs_queue" "alpha" {
+  name = "alpha"
+  %s
+}
+resource "aws_sqs_queue" "beta" {
+  name = "beta"
+}
+"""
+    (tf_dir / "main.tf").write_text(tf_template % "")
+    (tmp_path / "policy.json").write_text(
+        json.dumps(
+            {
+                "policies": [
+                    {
+                        "name": "check-sqs",
+                        "resource": "terraform.aws_sqs_queue",
+                        "filters": [{"kms_master_key_id": "absent"}],
+                    }
+                ]
+            }
+        )
+    )
+
+    def run():
+        config = cli.get_config(tf_dir, tmp_path, cache_dir=tmp_path / "cache")
+        policies = policy_core.load_policies(config.policy_dir, config)
+        reporter = ResultsReporter()
+        with patch.object(
+            TerraformResourceManager,
+            "filter_resources",
+            autospec=True,
+            side_effect=TerraformResourceManager.filter_resources,
+        ) as filter_resources:
+            core.CollectionRunner(policies, config, reporter).run()
+        evaluated = set()
+        for call in filter_resources.call_args_list:
+            evaluated.update(r["name"] for r in call.args[1])
+        return {r.resource["name"] for r in reporter.results}, evaluated
+
+    assert run() == ({"alpha", "beta"}, {"alpha", "beta"})
+    assert run() == ({"alpha", "beta"}, set())
+
+    (tf_dir / "main.tf").write_text(tf_template % 'kms_master_key_id = "alias/sqs"')
+    assert run() == ({"beta"}, {"alpha"})
+    assert run() == ({"beta"}, set())
+
+
+def test_policy_type_index(policy_env):
+    for name, rtype in (
+        ("a", "terraform.aws_*"),
+        ("b", "terraform.aws_sqs_queue"),
+        ("c", ["terraform.aws_sqs_queue", "terraform.google_*"]),
+        ("d", "terraform.google_compute_*"),
+    ):
+        policy_env.write_policy({"name": name, "resource": rtype})
+    index = core.PolicyTypeIndex(policy_env.get_policies())
+    assert [p.name for p in index.get("aws_sqs_queue")] == ["a", "b", "c"]
+    assert [p.name for p in index.get("google_compute_instance")] == ["c", "d"]
+    assert [p.name for p in index.get("google_storage_bucket")] == ["c"]
+    assert index.get("azurerm_resource_group") == []
+
+
+def test_match_type(policy_env):
+    policy_env.write_policy(
+        {"name": "a", "resource": ["terraform.aws_sqs_queue", "terraform.google_*"]}
+    )
+    [p] = policy_env.get_policies()
+    assert core.CollectionRunner.match_type("aws_sqs_queue", p)
+    assert core.CollectionRunner.match_type("google_compute_instance", p)
+    assert not core.CollectionRunner.match_type("aws_sns_topic", p)
+
+
+def test_parallel_evaluation(tmp_path):
+    policies = [
+        {
+            "name": "check-tags",
+            "resource": ["terraform.aws_*"],
+            "filters": [{"tag:Env": "absent"}],
+        },
+        {
+            "name": "check-queue",
+            "resource": "terraform.aws_sqs_queue",
+            "filters": [{"type": "value", "key": "name", "value": "^q", "op": "regex"}],
+        },
+        {
+            "name": "check-error",
+            "resource": "terraform.aws_sqs_queue",
+            "filters": [{"boom": "present"}],
+        },
+    ]
+    (tmp_path / "policy.json").write_text(json.dumps({"policies": policies}))
+    tf_dir = tmp_path / "tf"
+    tf_dir.mkdir()
+    (tf_dir / "main.tf").write_text(
+        "\n".join(
+            f'resource "{rtype}" "r{idx}" {{\n  name = "q{idx}"\n}}'
+            for idx in range(6)
+            for rtype in ("aws_sqs_queue", "aws_sns_topic", "aws_cloudwatch_log_group")
+        )
+    )
+    get_resource_value = core.LeftValueFilter.get_resource_value
+
+    class Unpicklable(Exception):
+        def __reduce__(self):
+            raise TypeError("unpicklable")
+
+    def get_value(self, k, i):
+        if k == "boom":
+            raise Unpicklable(k)
+        return get_resource_value(self, k, i)
+
+    def run(workers):
+        config = cli.get_config(tf_dir, tmp_path, workers=workers)
+        reporter = ResultsReporter()
+        with patch.object(
+            core.LeftValueFilter, "get_resource_value", autospec=True, side_effect=get_value
+        ):
+            core.CollectionRunner(
+                policy_core.load_policies(config.policy_dir, config), config, reporter
+            ).run()
+        errors.extend(e for e, _, _, _ in reporter.errors)
+        return [(r.policy.name, r.resource.id) for r in reporter.results], [
+            (p.name, rtype) for _, p, rtype, _ in reporter.errors
+        ]
+
+    errors = []
+    serial = run(1)
+    assert len(serial[0]) == 24
+    assert serial[1] == [("check-error", "aws_sqs_queue")]
+    with patch.object(core.CollectionRunner, "evaluate", side_effect=AssertionError):
+        assert run(4) == serial
+    # worker errors are returned as formatted tracebacks
+    assert isinstance(errors[1], core.EvaluationError)
+    assert "Unpicklable: boom" in str(errors[1])
+
+    # errors are reported outside of their except block
+    output_file = StringIO()
+    cli_output = output.RichCli(None, Config.empty(output_file=output_file))
+    for e in errors:
+        cli_output.on_policy_error(e, Bag(name="check-error"), "aws_sqs_queue", [])
+    assert output_file.getvalue().count("Unpicklable: boom") == 2
@@ -144,6 +144,7 @@ CONFIG_SCHEMA = {
         "cross_accounts": {"type": "object"},
         "ses_region": {"type": "string"},
         "ses_role": {"type": "string"},
+        "templates_bytecode_cache": {"type": "string"},
         "redis_host": {"type": "string"},
         "redis_port": {"type": "integer"},
         "datadog_api_key": {"type": "string"},  # TODO: encrypt with KMS?
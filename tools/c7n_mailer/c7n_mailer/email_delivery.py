@@ -19,6 +19,8 @@ from .utils_email import get_mimetext_message, is_email
 
 
 class EmailDelivery:
+    smtp_delivery = None
+
     def __init__(self, config, session, logger):
         self.config = config
         self.logger = logger
@@ -28,6 +30,12 @@ class EmailDelivery:
             self.aws_ses = self.get_ses_session()
         self.ldap_lookup = self.get_ldap_connection()
 
+    def get_smtp_delivery(self):
+        # the smtp connection is reused across messages
+        if self.smtp_delivery is None:
+            self.smtp_delivery = SmtpDelivery(self.config, self.session, self.logger)
+        return self.smtp_delivery
+
     def get_ses_session(self):
         if self.config.get("ses_role", False):
             creds = self.session.client("sts").assume_role(
@@ -233,7 +241,7 @@ class EmailDelivery:
         try:
             # if smtp_server is set in mailer.yml, send through smtp
             if "smtp_server" in self.config:
-                delivery = SmtpDelivery(self.config, self.session, self.logger)
+                delivery = self.get_smtp_delivery()
                 for emails, mimetext_msg in emails_to_mimetext_map.items():
                     delivery.send_message(message=mimetext_msg, to_addrs=list(emails))
             elif "sendgrid_api_key" in self.config:
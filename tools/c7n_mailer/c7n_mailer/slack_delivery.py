@@ -52,6 +52,7 @@ class SlackDelivery:
                             "slack_template",
                             "slack_default",
                             self.config["templates_folders"],
+                            bytecode_cache=self.config.get("templates_bytecode_cache"),
                         )
                 self.logger.debug(
                     "Generating messages for recipient list produced by resource owner resolution."
@@ -65,6 +66,7 @@ class SlackDelivery:
                     "slack_template",
                     "slack_default",
                     self.config["templates_folders"],
+                    bytecode_cache=self.config.get("templates_bytecode_cache"),
                 )
             elif target.startswith("slack://webhook/#") and self.config.get("slack_webhook"):
                 webhook_target = self.config.get("slack_webhook")
@@ -76,6 +78,7 @@ class SlackDelivery:
                     "slack_template",
                     "slack_default",
                     self.config["templates_folders"],
+                    bytecode_cache=self.config.get("templates_bytecode_cache"),
                 )
                 self.logger.debug(
                     "Generating message for webhook %s." % self.config.get("slack_webhook")
@@ -91,6 +94,7 @@ class SlackDelivery:
                         "slack_template",
                         "slack_default",
                         self.config["templates_folders"],
+                        bytecode_cache=self.config.get("templates_bytecode_cache"),
                     )
             elif target.startswith("slack://#"):
                 resolved_addrs = target.split("slack://#", 1)[1]
@@ -102,6 +106,7 @@ class SlackDelivery:
                     "slack_template",
                     "slack_default",
                     self.config["templates_folders"],
+                    bytecode_cache=self.config.get("templates_bytecode_cache"),
                 )
             elif target.startswith("slack://tag/") and "Tags" in resource_list[0]:
                 tag_name = target.split("tag/", 1)[1]
@@ -130,6 +135,7 @@ class SlackDelivery:
                     "slack_template",
                     "slack_default",
                     self.config["templates_folders"],
+                    bytecode_cache=self.config.get("templates_bytecode_cache"),
                 )
                 self.logger.debug("Generating message for specified Slack channel.")
         return slack_messages
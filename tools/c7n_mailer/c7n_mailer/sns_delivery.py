@@ -36,6 +36,7 @@ class SnsDelivery:
             "template",
             "default",
             self.config["templates_folders"],
+            bytecode_cache=self.config.get("templates_bytecode_cache"),
         )
         return {"topic": policy_sns_address, "subject": subject, "sns_message": rendered_jinja_body}
 
@@ -14,6 +14,19 @@ from c7n_mailer.target import MessageTargetMixin
 
 DATA_MESSAGE = "maidmsg/1.0"
 
+# each worker process of a parallel run keeps its own processor, so email
+# delivery and its connections are reused across the messages it handles.
+_worker_processor = None
+
+
+def _init_worker(processor):
+    global _worker_processor
+    _worker_processor = processor
+
+
+def _process_sqs_message(sqs_message):
+    return _worker_processor.process_sqs_message(sqs_message)
+
 
 class MailerSqsQueueIterator:
     # Copied from custodian to avoid runtime library dependency
@@ -96,7 +109,9 @@ class MailerSqsQueueProcessor(MessageTargetMixin):
         if parallel:
             import multiprocessing
 
-            process_pool = multiprocessing.Pool(processes=self.max_num_processes)
+            process_pool = multiprocessing.Pool(
+                processes=self.max_num_processes, initializer=_init_worker, initargs=(self,)
+            )
         for sqs_message in sqs_messages:
             self.logger.debug(
                 "Message id: %s received %s"
@@ -109,7 +124,7 @@ class MailerSqsQueueProcessor(MessageTargetMixin):
                 warning_msg = "Unknown sqs_message or sns format %s" % (sqs_message["Body"][:50])
                 self.logger.warning(warning_msg)
             if parallel:
-                process_pool.apply_async(self.process_sqs_message, args=sqs_message)
+                process_pool.apply_async(_process_sqs_message, args=(sqs_message,))
             else:
                 self.process_sqs_message(sqs_message)
             self.logger.debug("Processed sqs_message")
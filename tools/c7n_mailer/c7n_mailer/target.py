@@ -8,11 +8,19 @@ from .utils import decrypt
 
 
 class MessageTargetMixin(object):
+    _email_delivery = None
+
+    def get_email_delivery(self):
+        # reused across messages, along with its ses client and smtp connection
+        if self._email_delivery is None:
+            self._email_delivery = EmailDelivery(self.config, self.session, self.logger)
+        return self._email_delivery
+
     def handle_targets(self, message, sent_timestamp, email_delivery=True, sns_delivery=False):
         # get the map of email_to_addresses to mimetext messages (with resources baked in)
         # and send any emails (to SES or SMTP) if there are email addresses found
         if email_delivery:
-            email_delivery = EmailDelivery(self.config, self.session, self.logger)
+            email_delivery = self.get_email_delivery()
             email_delivery.send_c7n_email(message)
 
         # this sections gets the map of sns_to_addresses to rendered_jinja messages
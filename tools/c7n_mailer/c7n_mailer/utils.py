@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 import functools
 import json
 import os
+import threading
 import time
 import yaml
 
@@ -60,8 +61,32 @@ def get_processor(mailer_config, logger):
     return processor
 
 
-def get_jinja_env(template_folders):
-    env = jinja2.Environment(trim_blocks=True, autoescape=False)  # nosec nosemgrep
+JINJA_CACHE_SIZE = 400
+
+_jinja_envs = {}
+_jinja_lock = threading.Lock()
+
+
+def get_jinja_env(template_folders, bytecode_cache=None):
+    """Get the jinja environment for a set of template folders.
+
+    Environments are shared across the process, so each template is
+    compiled once and kept in the environment's template cache. Compiled
+    templates can also be kept on disk in a bytecode cache directory, to
+    skip compilation on a cold start.
+    """
+    key = (tuple(template_folders), bytecode_cache)
+    with _jinja_lock:
+        env = _jinja_envs.get(key)
+        if env is None:
+            env = _jinja_envs[key] = create_jinja_env(template_folders, bytecode_cache)
+    return env
+
+
+def create_jinja_env(template_folders, bytecode_cache=None):
+    env = jinja2.Environment(  # nosec nosemgrep
+        trim_blocks=True, autoescape=False, cache_size=JINJA_CACHE_SIZE
+    )
     env.filters["yaml_safe"] = functools.partial(yaml.safe_dump, default_flow_style=False)
     env.filters["date_time_format"] = date_time_format
     env.filters["get_date_time_delta"] = get_date_time_delta
@@ -73,13 +98,23 @@ def get_jinja_env(template_folders):
     env.globals["get_resource_tag_value"] = get_resource_tag_value
     env.globals["search"] = jmespath.search
     env.loader = jinja2.FileSystemLoader(template_folders)
+    if bytecode_cache:
+        os.makedirs(bytecode_cache, exist_ok=True)
+        env.bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache)
     return env
 
 
 def get_rendered_jinja(
-    target, sqs_message, resources, logger, specified_template, default_template, template_folders
+    target,
+    sqs_message,
+    resources,
+    logger,
+    specified_template,
+    default_template,
+    template_folders,
+    bytecode_cache=None,
 ):
-    env = get_jinja_env(template_folders)
+    env = get_jinja_env(template_folders, bytecode_cache)
     mail_template = sqs_message["action"].get(specified_template, default_template)
     if not os.path.isabs(mail_template):
         mail_template = "%s.j2" % mail_template
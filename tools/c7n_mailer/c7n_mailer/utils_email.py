@@ -105,7 +105,14 @@ def set_mimetext_headers(
 
 def get_mimetext_message(config, logger, message, resources, to_addrs):
     body = get_rendered_jinja(
-        to_addrs, message, resources, logger, "template", "default", config["templates_folders"]
+        to_addrs,
+        message,
+        resources,
+        logger,
+        "template",
+        "default",
+        config["templates_folders"],
+        bytecode_cache=config.get("templates_bytecode_cache"),
     )
 
     email_format = message["action"].get("template_format", None)
@@ -202,6 +202,15 @@ class EmailTest(unittest.TestCase):
             # Check the mock has been called only once
             self.assertEqual(smtp_instance.sendmail.call_count, 2)
 
+    def test_smtp_connection_reused(self):
+        SQS_MESSAGE = copy.deepcopy(SQS_MESSAGE_1)
+        with patch("smtplib.SMTP") as mock_smtp:
+            self.email_delivery.send_c7n_email(SQS_MESSAGE)
+            self.email_delivery.send_c7n_email(SQS_MESSAGE)
+            # one connection is made, and used for both messages
+            self.assertEqual(mock_smtp.call_count, 1)
+            self.assertEqual(mock_smtp.return_value.sendmail.call_count, 2)
+
     def test_emails_resource_mapping_multiples(self):
         SQS_MESSAGE = copy.deepcopy(SQS_MESSAGE_1)
         SQS_MESSAGE["action"].pop("priority_header", None)
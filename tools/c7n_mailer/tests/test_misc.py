@@ -51,6 +51,40 @@ class AWSMailerTests(unittest.TestCase):
         mailer_sqs_queue_processor.process_sqs_message(SQS_MESSAGE_1_ENCODED)
         assert mock_sns_delivery.called
 
+    @patch("c7n_mailer.target.EmailDelivery")
+    @patch("c7n_mailer.sns_delivery.SnsDelivery")
+    def test_sqs_queue_processor_parallel(self, mock_sns_delivery, mock_email_delivery):
+        processor = sqs_queue_processor.MailerSqsQueueProcessor(
+            MAILER_CONFIG, boto3.Session(region_name="us-east-1"), logging.getLogger("c7n_mailer")
+        )
+        processor.max_num_processes = 2
+        self.addCleanup(sqs_queue_processor._init_worker, None)
+
+        class Pool:
+            # runs tasks inline, in a single worker initialized as by multiprocessing
+            def __init__(self, processes, initializer, initargs):
+                initializer(*initargs)
+
+            def apply_async(self, func, args):
+                func(*args)
+
+            def close(self):
+                pass
+
+            def join(self):
+                pass
+
+        messages = [dict(SQS_MESSAGE_1_ENCODED, MessageId=str(i)) for i in range(2)]
+        with patch("multiprocessing.Pool", Pool), patch.object(
+            sqs_queue_processor.MailerSqsQueueIterator, "__iter__", return_value=iter(messages)
+        ), patch.object(sqs_queue_processor.MailerSqsQueueIterator, "ack"):
+            processor.run(parallel=True)
+
+        self.assertIs(sqs_queue_processor._worker_processor, processor)
+        # the worker's email delivery is reused across its messages
+        self.assertEqual(mock_email_delivery.call_count, 1)
+        self.assertEqual(mock_email_delivery.return_value.send_c7n_email.call_count, 2)
+
     def test_azure_queue_processor(self):
         processor = azure_queue_processor.MailerAzureQueueProcessor(
             MAILER_CONFIG_AZURE, logging.getLogger("c7n_mailer")
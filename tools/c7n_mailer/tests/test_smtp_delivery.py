@@ -119,3 +119,29 @@ class SmtpDeliveryTest(unittest.TestCase):
         d = SmtpDelivery(config, MagicMock(), MagicMock())
         d._smtp_connection.quit.side_effect = smtplib.SMTPServerDisconnected
         del d
+
+    @patch("smtplib.SMTP")
+    def test_send_message_reconnect(self, mock_smtp):
+        config = {
+            "smtp_server": "server",
+            "smtp_port": 25,
+            "smtp_ssl": False,
+            "smtp_username": None,
+            "smtp_password": None,
+        }
+        d = SmtpDelivery(config, MagicMock(), MagicMock())
+        message_mock = MagicMock()
+        message_mock.__getitem__.side_effect = lambda x: "t@test.com" if x == "From" else None
+        message_mock.as_string.return_value = "mock_text"
+        mock_smtp.return_value.sendmail.side_effect = [smtplib.SMTPServerDisconnected, {}]
+        d.send_message(message_mock, ["test1@test.com"])
+
+        mock_smtp.assert_has_calls(
+            [
+                call("server", 25),
+                call().sendmail("t@test.com", ["test1@test.com"], "mock_text"),
+                call("server", 25),
+                call().sendmail("t@test.com", ["test1@test.com"], "mock_text"),
+            ]
+        )
+        self.assertEqual(mock_smtp.call_count, 2)
@@ -6,6 +6,7 @@ import builtins
 from datetime import datetime
 from importlib import reload
 import os
+import tempfile
 from time import sleep
 import unittest
 import jinja2
@@ -368,6 +369,22 @@ class OtherTests(unittest.TestCase):
         env = utils.get_jinja_env(MAILER_CONFIG["templates_folders"])
         self.assertEqual(env.__class__, jinja2.environment.Environment)
 
+    def test_get_jinja_env_shared(self):
+        env = utils.get_jinja_env(MAILER_CONFIG["templates_folders"])
+        self.assertIs(env, utils.get_jinja_env(list(MAILER_CONFIG["templates_folders"])))
+        self.assertEqual(env.cache.capacity, utils.JINJA_CACHE_SIZE)
+        self.assertIsNone(env.bytecode_cache)
+
+    def test_get_jinja_env_bytecode_cache(self):
+        self.addCleanup(utils._jinja_envs.clear)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_dir = os.path.join(tmp, "templates")
+            env = utils.get_jinja_env(MAILER_CONFIG["templates_folders"], cache_dir)
+            self.assertIsNot(env, utils.get_jinja_env(MAILER_CONFIG["templates_folders"]))
+            self.assertIsInstance(env.bytecode_cache, jinja2.FileSystemBytecodeCache)
+            env.get_template("example.jinja")
+            self.assertTrue(os.listdir(cache_dir))
+
     def test_get_rendered_jinja(self):
         # Jinja paths must always be forward slashes regardless of operating system
         template_abs_filename = os.path.abspath(
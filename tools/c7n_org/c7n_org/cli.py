@@ -6,6 +6,7 @@
 import csv
 from collections import Counter
 from datetime import timedelta, datetime
+import json
 import logging
 import os
 import time
@@ -23,14 +24,20 @@ from botocore.exceptions import ClientError
 import click
 import jsonschema
 
-from c7n.credentials import assumed_session, SessionFactory
+from c7n.credentials import (
+    api_rate_limiter, assumed_session, credential_cache, shared_data_loader, SessionFactory)
 from c7n.executor import MainThreadExecutor
 from c7n.exceptions import InvalidOutputConfig
+from c7n.filters.metrics import metric_data
+from c7n.filters.related import related_index, usage_index
 from c7n.config import Config
 from c7n.policy import PolicyCollection
+from c7n.query import parent_id_index
 from c7n.provider import get_resource_class, clouds as cloud_providers
 from c7n.reports.csvout import Formatter, fs_record_set, record_set, strip_output_path
 from c7n.resources import load_available
+from c7n.resources.aws import arn_cache
+from c7n.tags import tag_index
 from c7n.utils import (
     CONN_CACHE, dumps, filter_empty, format_string_values, get_policy_provider, join_output_path)
 
@@ -609,14 +616,130 @@ def _update(old, new):
     return old
 
 
+def _api_rate(ctx, param, value):
+    if value is None:
+        return value
+    try:
+        api_rate_limiter.parse_budgets(value)
+    except ValueError:
+        raise click.BadParameter(
+            'values must be of the form `20,ec2=10,s3=50` with positive rates')
+    return value
+
+
+# per process state of warmed workers, see init_worker
+worker_state = {}
+
+
+def init_worker(policies_config, api_rate=None):
+    """Warm a worker process for executing policies across accounts.
+
+    Providers and the resource modules for the policies are imported
+    once per worker, and botocore's service model and endpoint data
+    is loaded once and shared by all sessions within the worker. The
+    policies are retained so work items only need to carry the account
+    and region.
+    """
+    logging.getLogger('custodian.output').setLevel(logging.ERROR + 1)
+    if api_rate:
+        api_rate_limiter.configure(api_rate)
+    load_available()
+    loader = shared_data_loader.enable()
+    loader.load_data('endpoints')
+
+    services = set()
+    for p in policies_config.get('policies', ()):
+        try:
+            resource_class = get_resource_class(p['resource'])
+        except (KeyError, ValueError):
+            continue
+        service = getattr(resource_class.resource_type, 'service', None)
+        if get_policy_provider(p) == 'aws' and isinstance(service, str):
+            services.add(service)
+    for service in services:
+        try:
+            loader.load_service_model(service, 'service-2')
+        except Exception:
+            log.debug("unable to preload service model %s", service)
+    worker_state['policies_config'] = policies_config
+
+
+def get_work_units(accounts, policies_config, regions, split_resources=False):
+    """Split an org run into units of work.
+
+    A unit is an account and region, and when splitting by resources,
+    the names of the policies for one resource type. Returns a list of
+    (key, account, region, policy_names) tuples.
+    """
+    groups = [('*', None)]
+    if split_resources:
+        resource_policies = OrderedDict()
+        for p in policies_config['policies']:
+            rtype = p['resource']
+            if isinstance(rtype, list):
+                rtype = ','.join(rtype)
+            resource_policies.setdefault(rtype, []).append(p['name'])
+        groups = list(resource_policies.items())
+
+    units = []
+    for a in accounts:
+        for r in resolve_regions(regions or a.get('regions', ()), a):
+            for rtype, policy_names in groups:
+                units.append(("%s/%s/%s" % (a['name'], r, rtype), a, r, policy_names))
+    return units
+
+
+def load_timings(timing_file):
+    if not timing_file or not os.path.exists(timing_file):
+        return {}
+    with open(timing_file) as fh:
+        return json.load(fh)
+
+
+def schedule_work_units(units, timings):
+    """Order units by historical runtime, longest first.
+
+    Units without history are scheduled first as their runtime is
+    unknown. Pool workers take the next pending unit as they become
+    idle, so ordering long units first shortens the tail of the run.
+    """
+    return sorted(units, key=lambda u: timings.get(u[0], float('inf')), reverse=True)
+
+
+def run_work_unit(*args, **kw):
+    st = time.time()
+    cache_stats = credential_cache.stats()
+    policy_counts, success = run_account(*args, **kw)
+    cache_stats = Counter({
+        k: v - cache_stats[k] for k, v in credential_cache.stats().items()})
+    return policy_counts, success, time.time() - st, cache_stats
+
+
+def clear_run_indexes():
+    """Clear the resource indexes and metric data shared across the policies of a run."""
+    for index in (
+            related_index, usage_index, parent_id_index, arn_cache, tag_index, metric_data):
+        index.clear()
+
+
 def run_account(account, region, policies_config, output_path,
-                cache_period, cache_path, metrics, dryrun, debug):
+                cache_period, cache_path, metrics, dryrun, debug, policy_names=None):
     """Execute a set of policies on an account.
+
+    If `policies_config` is None the policies of the warmed worker
+    process are used, `policy_names` optionally restricts execution to
+    a subset of the policies.
     """
     logging.getLogger('custodian.output').setLevel(logging.ERROR + 1)
     CONN_CACHE.session = None
     CONN_CACHE.time = None
     load_available()
+    if policies_config is None:
+        policies_config = worker_state['policies_config']
+    if policy_names:
+        policies_config = dict(
+            policies_config,
+            policies=[p for p in policies_config['policies'] if p['name'] in policy_names])
 
     output_path = join_output_path(output_path, account['name'], region)
 
@@ -649,54 +772,72 @@ def run_account(account, region, policies_config, output_path,
     success = True
     st = time.time()
 
-    with environ(**env_vars):
-        for p in policies:
-            # Extend policy execution conditions with account information
-            p.conditions.env_vars['account'] = account
-            # Variable expansion and non schema validation (not optional)
-            p.expand_variables(p.get_variables(account.get('vars', {})))
-            p.validate()
-            log.debug(
-                "Running policy:%s account:%s region:%s",
-                p.name, account['name'], region)
-            try:
-                resources = p.run()
-                policy_counts[p.name] = resources and len(resources) or 0
-                if not resources:
-                    continue
-                if not config.dryrun and p.execution_mode != 'pull':
-                    log.info("Ran account:%s region:%s policy:%s provisioned time:%0.2f",
-                             account['name'], region, p.name, time.time() - st)
-                    continue
-                log.info(
-                    "Ran account:%s region:%s policy:%s matched:%d time:%0.2f",
-                    account['name'], region, p.name, len(resources),
-                    time.time() - st)
-            except ClientError as e:
-                success = False
-                if e.response['Error']['Code'] == 'AccessDenied':
-                    log.warning('Access denied api:%s policy:%s account:%s region:%s',
-                                e.operation_name, p.name, account['name'], region)
-                    return policy_counts, success
-                log.error(
-                    "Exception running policy:%s account:%s region:%s error:%s",
-                    p.name, account['name'], region, e)
-                continue
-            except Exception as e:
-                success = False
-                log.error(
-                    "Exception running policy:%s account:%s region:%s error:%s",
-                    p.name, account['name'], region, e)
-                if not debug:
+    try:
+        with environ(**env_vars):
+            for p in policies:
+                # Extend policy execution conditions with account information
+                p.conditions.env_vars['account'] = account
+                # Variable expansion and non schema validation (not optional)
+                p.expand_variables(p.get_variables(account.get('vars', {})))
+                p.validate()
+                log.debug(
+                    "Running policy:%s account:%s region:%s",
+                    p.name, account['name'], region)
+                try:
+                    resources = p.run()
+                    policy_counts[p.name] = resources and len(resources) or 0
+                    if not resources:
+                        continue
+                    if not config.dryrun and p.execution_mode != 'pull':
+                        log.info("Ran account:%s region:%s policy:%s provisioned time:%0.2f",
+                                 account['name'], region, p.name, time.time() - st)
+                        continue
+                    log.info(
+                        "Ran account:%s region:%s policy:%s matched:%d time:%0.2f",
+                        account['name'], region, p.name, len(resources),
+                        time.time() - st)
+                except ClientError as e:
+                    success = False
+                    if e.response['Error']['Code'] == 'AccessDenied':
+                        log.warning('Access denied api:%s policy:%s account:%s region:%s',
+                                    e.operation_name, p.name, account['name'], region)
+                        return policy_counts, success
+                    log.error(
+                        "Exception running policy:%s account:%s region:%s error:%s",
+                        p.name, account['name'], region, e)
                     continue
-                import traceback, pdb, sys
-                traceback.print_exc()
-                pdb.post_mortem(sys.exc_info()[-1])
-                raise
+                except Exception as e:
+                    success = False
+                    log.error(
+                        "Exception running policy:%s account:%s region:%s error:%s",
+                        p.name, account['name'], region, e)
+                    if not debug:
+                        continue
+                    import traceback, pdb, sys
+                    traceback.print_exc()
+                    pdb.post_mortem(sys.exc_info()[-1])
+                    raise
+    finally:
+        # run indexes are only shared within a unit, warm workers
+        # shouldn't keep the resources of every account they handled.
+        clear_run_indexes()
 
     return policy_counts, success
 
 
+def report_timings(unit_timings, timings, timing_file, count=10):
+    """Log the slowest units of work and persist unit runtimes."""
+    slowest = sorted(unit_timings.items(), key=lambda i: i[1], reverse=True)
+    for key, elapsed in slowest[:count]:
+        log.info("Slowest unit:%s time:%0.2f", key, elapsed)
+    if not timing_file:
+        return
+    timings = dict(timings)
+    timings.update(unit_timings)
+    with open(timing_file, 'w') as fh:
+        json.dump(timings, fh, indent=2, sort_keys=True)
+
+
 def initialize_provider_output(policies_config, output_dir, regions):
     """allow the provider an opportunity to initialize the output config.
     """
@@ -739,9 +880,21 @@ def initialize_provider_output(policies_config, output_dir, regions):
 @click.option("--dryrun", default=False, is_flag=True)
 @click.option('--debug', default=False, is_flag=True)
 @click.option('-v', '--verbose', default=False, help="Verbose", is_flag=True)
+@click.option('--split-resources', default=False, is_flag=True,
+              help="Schedule each resource type in an account region as a unit of work")
+@click.option('--timing-file', type=click.Path(dir_okay=False), default=None,
+              help="Unit runtimes, used to schedule the longest units first")
+@click.option('--credential-cache', 'credential_cache_path',
+              type=click.Path(file_okay=False), default=None,
+              envvar='C7N_CREDENTIAL_CACHE',
+              help="Directory to share assumed role credentials across workers")
+@click.option('--api-rate', default=None, callback=_api_rate,
+              help=("Api calls per second per worker for each account, region and "
+                    "service, adapted down on throttling, ie. '20,ec2=10,s3=50'"))
 def run(config, use, output_dir, accounts, not_accounts, tags, region,
         policy, policy_tags, cache_period, cache_path, metrics,
-        dryrun, debug, verbose, metrics_uri):
+        dryrun, debug, verbose, metrics_uri, split_resources=False, timing_file=None,
+        credential_cache_path=None, api_rate=None):
     """run a custodian policy across accounts"""
     accounts_config, custodian_config, executor = init(
         config, use, debug, verbose, accounts, tags, policy, policy_tags=policy_tags,
@@ -766,23 +919,40 @@ def run(config, use, output_dir, accounts, not_accounts, tags, region,
 
     output_dir = initialize_provider_output(custodian_config, output_dir, region)
 
-    with executor(max_workers=WORKER_COUNT) as w:
+    if credential_cache_path:
+        # workers inherit the cache location via the environment
+        os.environ['C7N_CREDENTIAL_CACHE'] = credential_cache_path
+        credential_cache.configure(credential_cache_path)
+    cache_stats = Counter()
+
+    timings = load_timings(timing_file)
+    unit_timings = {}
+    units = schedule_work_units(
+        get_work_units(
+            accounts_config['accounts'], custodian_config, region, split_resources),
+        timings)
+
+    # workers are warmed with the policies once, and then only receive
+    # the account, region and policy names for each unit of work.
+    with executor(max_workers=WORKER_COUNT,
+                  initializer=init_worker,
+                  initargs=(custodian_config, api_rate)) as w:
         futures = {}
-        for a in accounts_config['accounts']:
-            for r in resolve_regions(region or a.get('regions', ()), a):
-                futures[w.submit(
-                    run_account,
-                    a, r,
-                    custodian_config,
-                    output_dir,
-                    cache_period,
-                    cache_path,
-                    metrics,
-                    dryrun,
-                    debug)] = (a, r)
+        for key, a, r, policy_names in units:
+            futures[w.submit(
+                run_work_unit,
+                a, r,
+                None,
+                output_dir,
+                cache_period,
+                cache_path,
+                metrics,
+                dryrun,
+                debug,
+                policy_names)] = (key, a, r)
 
         for f in as_completed(futures):
-            a, r = futures[f]
+            key, a, r = futures[f]
             if f.exception():
                 if debug:
                     raise
@@ -791,7 +961,9 @@ def run(config, use, output_dir, accounts, not_accounts, tags, region,
                     a['name'], r, f.exception())
                 continue
 
-            account_region_pcounts, account_region_success = f.result()
+            account_region_pcounts, account_region_success, elapsed, unit_stats = f.result()
+            unit_timings[key] = elapsed
+            cache_stats.update(unit_stats)
             for p in account_region_pcounts:
                 policy_counts[p] += account_region_pcounts[p]
 
@@ -799,6 +971,11 @@ def run(config, use, output_dir, accounts, not_accounts, tags, region,
                 success = False
 
     log.info("Policy resource counts %s" % policy_counts)
+    if credential_cache_path:
+        log.info(
+            "Credential cache hits:%d misses:%d",
+            cache_stats['hits'], cache_stats['misses'])
+    report_timings(unit_timings, timings, timing_file)
 
     if not success:
         sys.exit(1)
@@ -1,12 +1,14 @@
 # Copyright The Cloud Custodian Authors.
 # SPDX-License-Identifier: Apache-2.0
 import copy
+import json
 from unittest import mock
 import os
 
 import pytest
 import yaml
 
+from c7n.credentials import credential_cache, shared_data_loader
 from c7n.testing import TestUtils
 from click.testing import CliRunner
 
@@ -180,9 +182,140 @@ class OrgTest(TestUtils):
             catch_exceptions=False)
 
         self.assertEqual(result.exit_code, 0)
+        lines = log_output.getvalue().strip().splitlines()
         self.assertEqual(
-            log_output.getvalue().strip(),
+            lines[0],
             "Policy resource counts Counter({'compute': 96, 'serverless': 48})")
+        # followed by the slowest units of work
+        self.assertEqual(len(lines), 5)
+        self.assertTrue(all(line.startswith('Slowest unit:') for line in lines[1:]))
+
+    def test_run_account_clears_run_indexes(self):
+        run_dir = self.setup_run_dir()
+        policy = mock.MagicMock()
+        policy.name = 'compute'
+        policy.run.side_effect = ValueError('boom')
+        self.patch(
+            org.PolicyCollection, 'from_data', classmethod(lambda cls, data, config: [policy]))
+        for index in (
+                org.related_index, org.usage_index, org.parent_id_index, org.arn_cache):
+            index.entries['key'] = (0, {})
+        org.tag_index.indexes['key'] = {}
+        org.metric_data.save('key', [])
+
+        counts, success = org.run_account(
+            {'name': 'dev', 'account_id': '112233445566'}, 'us-east-1',
+            {'policies': []}, os.path.join(run_dir, 'output'), 0,
+            os.path.join(run_dir, 'cache'), False, False, False)
+        self.assertEqual(counts, {})
+        self.assertFalse(success)
+        for index in (
+                org.related_index, org.usage_index, org.parent_id_index, org.arn_cache):
+            self.assertEqual(index.entries, {})
+        self.assertEqual(org.tag_index.indexes, {})
+        self.assertEqual(org.metric_data.data, {})
+
+    def test_cli_run_warm_worker(self):
+        run_dir = self.setup_run_dir()
+        run_account = mock.MagicMock()
+        run_account.return_value = ({'compute': 1}, True)
+        self.patch(org, 'run_account', run_account)
+        self.patch(org, 'worker_state', {})
+        loader = mock.MagicMock()
+        self.patch(shared_data_loader, 'enable', lambda: loader)
+        self.change_cwd(run_dir)
+        runner = CliRunner()
+        result = runner.invoke(
+            org.cli,
+            ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+             '--debug', '-s', 'output', '--cache-path', 'cache'],
+            catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(
+            [p['name'] for p in org.worker_state['policies_config']['policies']],
+            ['compute', 'serverless'])
+        # work items only carry the account and region
+        self.assertEqual(
+            {c.args[2] for c in run_account.call_args_list}, {None})
+        self.assertEqual(
+            sorted(c.args for c in loader.load_service_model.call_args_list),
+            [('ec2', 'service-2'), ('lambda', 'service-2')])
+
+    def test_cli_run_split_resources(self):
+        run_dir = self.setup_run_dir()
+        run_account = mock.MagicMock()
+        run_account.return_value = ({'compute': 1}, True)
+        self.patch(org, 'run_account', run_account)
+        self.change_cwd(run_dir)
+        with open('timings.json', 'w') as fh:
+            json.dump({'qa/us-west-2/aws.lambda': 120, 'dev/us-east-1/aws.ec2': 10}, fh)
+
+        runner = CliRunner()
+        result = runner.invoke(
+            org.cli,
+            ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+             '--debug', '-s', 'output', '--cache-path', 'cache',
+             '--split-resources', '--timing-file', 'timings.json'],
+            catch_exceptions=False)
+        self.assertEqual(result.exit_code, 0)
+
+        calls = [(c.args[0]['name'], c.args[1], c.args[-1])
+                 for c in run_account.call_args_list]
+        self.assertEqual(len(calls), 8)
+        # units without history first, then longest first.
+        self.assertEqual(calls[-2:], [
+            ('qa', 'us-west-2', ['serverless']),
+            ('dev', 'us-east-1', ['compute'])])
+
+        with open('timings.json') as fh:
+            timings = json.load(fh)
+        self.assertEqual(len(timings), 8)
+        self.assertIn('dev/us-west-2/aws.ec2', timings)
+
+    def test_cli_run_invalid_api_rate(self):
+        run_dir = self.setup_run_dir()
+        run_account = mock.MagicMock()
+        self.patch(org, 'run_account', run_account)
+        self.change_cwd(run_dir)
+        runner = CliRunner()
+        for rate in ('ec2=fast', '20,s3=0'):
+            result = runner.invoke(
+                org.cli,
+                ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+                 '-s', 'output', '--api-rate', rate])
+            self.assertEqual(result.exit_code, 2)
+            self.assertIn("Invalid value for '--api-rate'", result.output)
+        self.assertFalse(run_account.called)
+
+    def test_report_timings_without_file(self):
+        log_output = self.capture_logging('c7n_org')
+        org.report_timings(
+            {'dev/us-east-1/aws.ec2': 3.0, 'qa/us-west-2/aws.lambda': 12.5}, {}, None, count=1)
+        self.assertEqual(
+            log_output.getvalue().strip(),
+            'Slowest unit:qa/us-west-2/aws.lambda time:12.50')
+
+    def test_cli_run_credential_cache(self):
+        run_dir = self.setup_run_dir()
+        run_account = mock.MagicMock()
+        run_account.return_value = ({}, True)
+        self.patch(org, 'run_account', run_account)
+        self.patch(credential_cache, 'path', None)
+        self.change_cwd(run_dir)
+        log_output = self.capture_logging('c7n_org')
+        runner = CliRunner()
+        with mock.patch.dict(os.environ):
+            result = runner.invoke(
+                org.cli,
+                ['run', '-c', 'accounts.yml', '-u', 'policies.yml',
+                 '--debug', '-s', 'output', '--cache-path', 'cache',
+                 '--credential-cache', 'creds'],
+                catch_exceptions=False)
+            self.assertEqual(os.environ['C7N_CREDENTIAL_CACHE'], 'creds')
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(credential_cache.path, 'creds')
+        self.assertIn(
+            "Credential cache hits:0 misses:0", log_output.getvalue())
 
     def test_filter_policies(self):
         d = {'policies': [
@@ -0,0 +1,91 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Micro benchmark of security group cidr matching against large allow lists."""
+import copy
+import ipaddress
+import random
+import time
+from unittest import mock
+
+import click
+
+from c7n import utils
+from c7n.resources.vpc import SecurityGroup
+
+
+def get_cidrs(count, prefixes=(8, 12, 16, 20, 24, 28, 32)):
+    cidrs = set()
+    while len(cidrs) < count:
+        prefix = random.choice(prefixes)
+        address = random.getrandbits(32) >> (32 - prefix) << (32 - prefix)
+        cidrs.add(str(ipaddress.IPv4Network((address, prefix))))
+    return sorted(cidrs)
+
+
+def get_groups(count, rules, cidrs):
+    groups = []
+    for idx in range(count):
+        groups.append({
+            'GroupId': 'sg-%08x' % idx,
+            'OwnerId': '123456789012',
+            'IpPermissions': [{
+                'IpProtocol': 'tcp',
+                'FromPort': 443,
+                'ToPort': 443,
+                'IpRanges': [{'CidrIp': random.choice(cidrs)} for r in range(rules)],
+                'Ipv6Ranges': [],
+                'UserIdGroupPairs': [],
+                'PrefixListIds': []}]})
+    return groups
+
+
+class LinearIPv4List:
+    """The prior linear scan containment, for comparison."""
+
+    def __init__(self, ipv4_list):
+        self.ipv4_list = ipv4_list
+
+    def __contains__(self, other):
+        if other is None:
+            return False
+        in_networks = any([other in y_elem for y_elem in self.ipv4_list
+          if isinstance(y_elem, utils.IPv4Network)])
+        in_addresses = any([other == y_elem for y_elem in self.ipv4_list
+          if isinstance(y_elem, ipaddress.IPv4Address)])
+        return any([in_networks, in_addresses])
+
+
+def run(groups, allowed):
+    f = SecurityGroup.filter_registry.factory({
+        'type': 'ingress',
+        'Cidr': {'value': allowed, 'op': 'not-in', 'value_type': 'cidr'}},
+        mock.MagicMock())
+    groups = copy.deepcopy(groups)
+    t = time.perf_counter()
+    results = f.process(groups)
+    return time.perf_counter() - t, len(results)
+
+
+@click.command()
+@click.option('-g', '--groups', default=2000, help='Number of synthetic security groups')
+@click.option('-r', '--rules', default=20, help='Cidr rules per security group')
+@click.option('-a', '--allowed', default=5000, help='Number of allow listed cidrs')
+@click.option('--rounds', default=3)
+def main(groups, rules, allowed, rounds):
+    """Compare cidr allow list matching with a prefix index versus a linear scan."""
+    allowed = get_cidrs(allowed)
+    groups = get_groups(groups, rules, get_cidrs(rules * 10) + allowed[:rules])
+    for r in range(rounds):
+        utils._parse_cidr.cache_clear()
+        with mock.patch.object(utils, 'IPv4List', LinearIPv4List):
+            linear, lcount = run(groups, allowed)
+        utils._parse_cidr.cache_clear()
+        indexed, icount = run(groups, allowed)
+        assert lcount == icount
+        click.echo(
+            'round:%d matched:%d linear:%0.3fs indexed:%0.3fs speedup:%0.2fx' % (
+                r, icount, linear, indexed, linear / indexed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Micro benchmark of config item decoding over recorded config payloads."""
+import glob
+import json
+import os
+import time
+import tracemalloc
+from unittest import mock
+
+import click
+from dateutil.parser import ParserError
+
+from c7n import utils
+
+
+PLACEBO_DIR = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, 'tests', 'data', 'placebo')
+
+
+def get_items(placebo_dir):
+    items = []
+    for path in glob.glob(os.path.join(placebo_dir, '*', 'config.SelectResourceConfig_*.json')):
+        with open(path) as fh:
+            items.extend(json.load(fh)['data'].get('Results', ()))
+    for path in glob.glob(os.path.join(placebo_dir, '*', 'config.BatchGetResourceConfig_*.json')):
+        with open(path) as fh:
+            items.extend(
+                json.dumps(i, default=str) for i in
+                json.load(fh)['data'].get('baseConfigurationItems', ()))
+    return items
+
+
+def legacy_camel(obj, implicitDate=False, implicitTitle=True):
+    """The prior normalizer, for comparison."""
+    if not isinstance(obj, dict):
+        return obj
+    for k in list(obj.keys()):
+        v = obj.pop(k)
+        if implicitTitle:
+            ok = "%s%s" % (k[0].upper(), k[1:])
+        else:
+            ok = k
+        obj[ok] = v
+        if implicitDate:
+            kn = k.lower()
+            if isinstance(v, (str, int)) and ('time' in kn or 'date' in kn):
+                try:
+                    dv = utils.parse_date(v)
+                except ParserError:
+                    dv = None
+                if dv:
+                    obj[ok] = dv
+        if isinstance(v, dict):
+            legacy_camel(v, implicitDate, implicitTitle)
+        elif isinstance(v, list):
+            for e in v:
+                legacy_camel(e, implicitDate, implicitTitle)
+    return obj
+
+
+def decode(items):
+    for r in items:
+        item = json.loads(r)
+        config = item['configuration']
+        if isinstance(config, str):
+            config = json.loads(config)
+        yield utils.camelResource(config, implicitDate=True)
+
+
+def run(items, keep=None):
+    """Decode the items, materializing the population as prior config
+    sources did, or with keep, streaming it in chunks and retaining that
+    fraction of each, as a selective leading filter would."""
+    tracemalloc.start()
+    t = time.perf_counter()
+    if keep is None:
+        count = len(list(decode(items)))
+    else:
+        retained = []
+        for resource_set in utils.chunks(decode(items), 1000):
+            retained.extend(resource_set[:int(len(resource_set) * keep)])
+        count = len(retained)
+    elapsed = time.perf_counter() - t
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, count
+
+
+@click.command()
+@click.option('-c', '--copies', default=200, help='Copies of the recorded items to decode')
+@click.option('-r', '--rounds', default=3)
+@click.option('-k', '--keep', default=0.01, help='Fraction of a streamed population retained')
+@click.option('--placebo-dir', default=PLACEBO_DIR, type=click.Path(exists=True))
+def main(copies, rounds, keep, placebo_dir):
+    """Compare config item decoding with the prior and current normalizer,
+    and materialized with streamed peak memory."""
+    items = get_items(placebo_dir) * copies
+    click.echo('items:%d' % len(items))
+    for r in range(rounds):
+        with mock.patch.object(utils, 'camelResource', legacy_camel):
+            legacy, lpeak, _ = run(items)
+        current, cpeak, _ = run(items)
+        streamed, speak, _ = run(items, keep)
+        click.echo(
+            'round:%d legacy:%0.3fs peak:%0.1fmb current:%0.3fs peak:%0.1fmb speedup:%0.2fx '
+            'streamed:%0.3fs peak:%0.1fmb' % (
+                r, legacy, lpeak / 2 ** 20, current, cpeak / 2 ** 20, legacy / current,
+                streamed, speak / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# Copyright The Cloud Custodian Authors.
+# SPDX-License-Identifier: Apache-2.0
+"""Micro benchmark of compiled versus per resource value filter evaluation."""
+import copy
+import random
+import time
+from unittest import mock
+
+import click
+
+from c7n.filters.core import ValueFilter
+from c7n.resources.ec2 import filters
+
+
+FILTERS = [
+    {'State.Name': 'running'},
+    {'tag:Env': 'present'},
+    {'type': 'value', 'key': 'InstanceType', 'value': ['m5.large', 't3.micro'], 'op': 'in'},
+    {'or': [
+        {'type': 'value', 'key': 'CpuOptions.CoreCount', 'value': 4, 'op': 'gte'},
+        {'not': [{'tag:Owner': 'absent'}]}]},
+]
+
+
+def get_resources(count):
+    resources = []
+    for idx in range(count):
+        resources.append({
+            'InstanceId': 'i-%08x' % idx,
+            'InstanceType': random.choice(('m5.large', 't3.micro', 'c5.xlarge')),
+            'State': {'Name': random.choice(('running', 'stopped'))},
+            'CpuOptions': {'CoreCount': random.choice((1, 2, 4, 8))},
+            'Tags': [{'Key': k, 'Value': 'x'} for k in ('Env', 'Owner', 'App')
+                     if random.random() > 0.3]})
+    return resources
+
+
+def run(resources, data):
+    f = filters.factory({'and': data})
+    resources = copy.deepcopy(resources)
+    t = time.perf_counter()
+    results = f.process(resources)
+    return time.perf_counter() - t, len(results)
+
+
+@click.command()
+@click.option('-c', '--count', default=100000, help='Number of synthetic resources')
+@click.option('-r', '--rounds', default=3)
+def main(count, rounds):
+    """Compare filter evaluation with and without compiled value filters."""
+    resources = get_resources(count)
+    for r in range(rounds):
+        with mock.patch.object(ValueFilter, 'compile', return_value=None):
+            interpreted, icount = run(resources, FILTERS)
+        compiled, ccount = run(resources, FILTERS)
+        assert icount == ccount
+        click.echo(
+            'round:%d matched:%d interpreted:%0.3fs compiled:%0.3fs speedup:%0.2fx' % (
+                r, ccount, interpreted, compiled, interpreted / compiled))
+
+
+if __name__ == '__main__':
+    main()